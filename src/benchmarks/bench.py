@@ -0,0 +1,282 @@
+"""
+Benchmarks of the extraction pipeline and the drawing simulation, compared against a committed baseline.
+
+Every stage keeps the median wall time of --repeat runs (fewer for the drawing, which takes about a second). Wall
+times are compared relative to a reference workload timed before and after each image (reference_seconds of every
+stage), so the baseline transfers across machines of a similar kind and the speed drift of a shared machine during a
+run mostly cancels out. A timing regression is only reported if it reproduces when its image is benchmarked again
+(--retries). The baseline still comes from one machine: regenerate it with `make update_bench_baseline` after an
+intended change or when moving the comparison to other hardware.
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.scara_simmulation.headless import ADAPTIVE_MAX_DT, simulate_drawing
+
+# segment_extractor uses script-style imports, so its directory has to be on sys.path (last, to not shadow anything)
+EXTRACTOR_DIR = str(Path(__file__).resolve().parents[1] / "segment_extractor")
+if EXTRACTOR_DIR not in sys.path:
+    sys.path.append(EXTRACTOR_DIR)
+
+from io_img import load_img
+from local_search import optimize_tour, pen_up_distance
+from processing import chain_edges, get_edges, simplify_segments
+from sorting import EndpointDistances, greedy_tsp, kdtree_tsp
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+SIZES = (512, 1024, 2048)
+REAL_IMAGES = (Path(__file__).resolve().parents[2] / "imgs" / "smile.jpg",)
+REPEAT = 7
+# A drawing takes about a second, so it is timed fewer times
+DRAWING_REPEAT = 3
+# Timings below this are dominated by scheduling noise and are not compared
+NOISE_FLOOR = 0.05
+# Times an image with a timing regression is benchmarked again before the regression is reported
+RETRIES = 2
+
+
+def synthetic_line_art(size: int, seed: int = 0) -> np.ndarray:
+    """Grayscale line drawing (circles, ellipses, polylines and lines on white). Deterministic for a seed."""
+    rng = np.random.default_rng(seed)
+    img = np.full((size, size), 255, dtype=np.uint8)
+    n_shapes = size // 16
+    for _ in range(n_shapes):
+        kind = rng.integers(4)
+        thickness = int(rng.integers(1, 4))
+        if kind == 0:
+            center = tuple(int(v) for v in rng.integers(0, size, 2))
+            cv2.circle(img, center, int(rng.integers(4, size // 6)), 0, thickness)
+        elif kind == 1:
+            center = tuple(int(v) for v in rng.integers(0, size, 2))
+            axes = tuple(int(v) for v in rng.integers(4, size // 6, 2))
+            cv2.ellipse(img, center, axes, float(rng.uniform(0, 180)), 0, 360, 0, thickness)
+        elif kind == 2:
+            points = np.cumsum(rng.integers(-size // 10, size // 10, (int(rng.integers(3, 12)), 2)), axis=0)
+            points += rng.integers(0, size, 2)
+            cv2.polylines(img, [points.astype(np.int32)], False, 0, thickness)
+        else:
+            p1, p2 = (tuple(int(v) for v in rng.integers(0, size, 2)) for _ in range(2))
+            cv2.line(img, p1, p2, 0, thickness)
+    return img
+
+
+def measure(func, *args, repeat: int = REPEAT, **kwargs) -> tuple[object, dict]:
+    """Median wall time of repeat calls, then the tracemalloc peak (in MB) of one extra call. The median is steadier
+    than the best time, which depends on how lucky the fastest call was. tracemalloc sees Python and numpy
+    allocations, not the ones made inside OpenCV."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"seconds": float(np.median(times)), "peak_mb": peak / 2 ** 20}
+
+
+def bench_image(name: str, img: np.ndarray, repeat: int = REPEAT, drawing: bool = True) -> dict[str, dict]:
+    """Every pipeline stage on one image (with the app defaults), then a headless drawing of the result."""
+    results = {}
+
+    edges, results["canny"] = measure(get_edges, img, 20, 50, repeat=repeat)
+    results["canny"]["points"] = int(np.count_nonzero(edges))
+
+    for method in ("kdtree", "raster"):
+        # raster (the app default) goes last, its segments feed the next stages
+        segments, stats = measure(chain_edges, edges, 5, method, repeat=repeat)
+        stats.update(segments=len(segments), points=segments.n_points)
+        results[f"chain_{method}"] = stats
+
+    simple, results["simplify"] = measure(simplify_segments, segments, 2., True, repeat=repeat)
+    results["simplify"].update(segments=len(simple), points=simple.n_points)
+
+    weights = EndpointDistances.from_segments(simple)
+    for tsp in (kdtree_tsp, greedy_tsp):
+        path, stats = measure(tsp, weights, repeat=repeat)
+        stats["pen_up_distance"] = pen_up_distance(simple.take(path))
+        results[tsp.__name__] = stats
+
+    tour, results["optimize_tour"] = measure(optimize_tour, simple, path, 1.0, repeat=repeat)
+    results["optimize_tour"]["pen_up_distance"] = tour.pen_up_after
+    sorted_segments = tour.apply(simple)
+
+    if drawing:
+        # Adaptive steps with the feed-forward controller finish the drawing in a few thousand ticks
+        drawing_result, stats = measure(simulate_drawing, sorted_segments.to_json(), dt=ADAPTIVE_MAX_DT, adaptive=True,
+                                        controller="feedforward", repeat=min(repeat, DRAWING_REPEAT))
+        stats.update({k: drawing_result.summary()[k] for k in ("ticks", "total_time", "pen_up_distance", "finished")})
+        results["drawing"] = stats
+
+    return {f"{name}/{stage}": stats for stage, stats in results.items()}
+
+
+def reference_workload() -> float:
+    """Fixed mix of numpy and pure Python work, the unit in which wall times are compared."""
+    rng = np.random.default_rng(0)
+    values = rng.random(500_000)
+    np.sort(values)
+    np.cumsum(values)
+    return sum(v * v for v in values[:200_000].tolist())
+
+
+def suite_images(sizes: tuple[int, ...] = SIZES, real: bool = True) -> dict[str, tuple[np.ndarray, bool]]:
+    """Benchmarked images by name, with whether their drawing is simulated."""
+    # Drawing is only simulated for the smallest synthetic image, it takes seconds on the bigger ones
+    images = {f"synthetic_{size}": (synthetic_line_art(size), size == min(sizes)) for size in sizes}
+    if real:
+        images.update({path.stem: (load_img(str(path)), True) for path in REAL_IMAGES if path.exists()})
+    return images
+
+
+def bench_image_with_reference(name: str, img: np.ndarray, repeat: int = REPEAT, drawing: bool = True) -> dict[str, dict]:
+    """bench_image, with the reference workload timed before and after the image stored in every stage
+    (reference_seconds, the average of both timings). The speed of a shared machine drifts during a run, so each
+    stage is compared in units of a reference measured around it rather than once for the whole run."""
+    references = [measure(reference_workload, repeat=repeat)[1]["seconds"]]
+    results = bench_image(name, img, repeat, drawing)
+    references.append(measure(reference_workload, repeat=repeat)[1]["seconds"])
+    for stats in results.values():
+        stats["reference_seconds"] = float(np.mean(references))
+    return results
+
+
+def run_suite(sizes: tuple[int, ...] = SIZES, repeat: int = REPEAT, real: bool = True) -> dict:
+    results = {}
+    for name, (img, drawing) in suite_images(sizes, real).items():
+        results.update(bench_image_with_reference(name, img, repeat, drawing))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "reference_seconds": float(np.median([stats["reference_seconds"] for stats in results.values()])),
+        },
+        "results": results,
+    }
+
+
+@dataclass(frozen=True)
+class Regression:
+    key: str
+    metric: str
+    expected: float
+    actual: float
+
+    def __str__(self) -> str:
+        if self.metric in ("points", "segments"):
+            return f"{self.key} {self.metric}: {self.expected} -> {self.actual}"
+        return (f"{self.key} {self.metric}: {self.expected:.4g} -> {self.actual:.4g} "
+                f"(+{self.actual / max(self.expected, 1e-12) - 1:.0%})")
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.25, noise_floor: float = NOISE_FLOOR) -> list[Regression]:
+    """Regressions of current against baseline: any wall time (in units of the reference workload timed around the
+    stage, when both runs have one), peak memory or pen-up distance that grew by more than threshold (relative), and
+    any changed point or segment count. Timings under noise_floor seconds in both runs are ignored."""
+    regressions = []
+    for key, stats in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_mb", "pen_up_distance"):
+            if metric not in stats or metric not in base:
+                continue
+            expected = base[metric]
+            if metric == "seconds" and stats.get("reference_seconds") and base.get("reference_seconds"):
+                # Baseline seconds expressed on the current machine
+                expected *= stats["reference_seconds"] / base["reference_seconds"]
+            if metric == "seconds" and max(stats[metric], expected) < noise_floor:
+                continue
+            if stats[metric] > expected * (1 + threshold):
+                regressions.append(Regression(key, metric, expected, stats[metric]))
+        for metric in ("points", "segments"):
+            if metric in stats and metric in base and stats[metric] != base[metric]:
+                regressions.append(Regression(key, metric, base[metric], stats[metric]))
+    return regressions
+
+
+def rerun_slow_images(report: dict, regressions: list[Regression], sizes: tuple[int, ...] = SIZES,
+                      repeat: int = REPEAT, real: bool = True):
+    """Benchmarks again the images with a timing regression, keeping for every stage the run that was fastest
+    relative to its reference workload. Other metrics are deterministic or not affected by load, so they are kept."""
+    slow = {r.key.split("/")[0] for r in regressions if r.metric == "seconds"}
+    for name, (img, drawing) in suite_images(sizes, real).items():
+        if name in slow:
+            for key, stats in bench_image_with_reference(name, img, repeat, drawing).items():
+                kept = report["results"][key]
+                if stats["seconds"] / stats["reference_seconds"] < kept["seconds"] / kept["reference_seconds"]:
+                    kept.update(seconds=stats["seconds"], reference_seconds=stats["reference_seconds"])
+
+
+def print_table(report: dict):
+    print(f"{'benchmark':36} {'seconds':>10} {'peak MB':>9}  quality")
+    for key, stats in report["results"].items():
+        quality = ", ".join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}"
+                            for k, v in stats.items() if k not in ("seconds", "peak_mb", "reference_seconds"))
+        print(f"{key:36} {stats['seconds']:10.4f} {stats['peak_mb']:9.1f}  {quality}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the extraction pipeline and the drawing simulation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="synthetic image sizes (px)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per stage (the median is kept)")
+    parser.add_argument("--no-real", action="store_true", help="skip the real images")
+    parser.add_argument("--out", default="bench.json", help="results file")
+    parser.add_argument("--baseline", default=str(BASELINE), help="baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative increase flagged as a regression")
+    parser.add_argument("--noise-floor", type=float, default=NOISE_FLOOR, help="timings below this are not compared (s)")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="reruns of the images with a timing regression before reporting it")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    sizes = tuple(args.sizes)
+    report = run_suite(sizes, args.repeat, real=not args.no_real)
+    print_table(report)
+    print(f"reference workload: {report['meta']['reference_seconds']:.4f} s")
+
+    if args.update_baseline or not Path(args.baseline).exists():
+        for path in (args.out, args.baseline) if args.update_baseline else (args.out,):
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}" if args.update_baseline
+              else f"No baseline at {args.baseline}, nothing to compare")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold, args.noise_floor)
+    for _ in range(args.retries):
+        if not any(r.metric == "seconds" for r in regressions):
+            break
+        print(f"Timing regressions in {len(regressions)} stages, benchmarking their images again")
+        rerun_slow_images(report, regressions, sizes, args.repeat, real=not args.no_real)
+        regressions = compare(report, baseline, args.threshold, args.noise_floor)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for line in regressions:
+        print(f"REGRESSION  {line}", file=sys.stderr)
+    print(f"{len(regressions)} regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
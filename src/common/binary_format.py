@@ -0,0 +1,138 @@
+"""
+Binary segment file format (.segb). All values are little-endian.
+
+    header   64 bytes: magic b"SEGB", u16 version, u8 float size (4 or 8), u8 reserved,
+             u64 n_segments, u64 n_points, u64 coords position, u64 offsets position, zero padding
+    coords   n_points * 2 floats (x, y), float32 or float64
+    offsets  n_segments + 1 u64, segment i is coords[offsets[i]:offsets[i+1]]
+
+The offsets table goes after the coordinates so the file can be written in a single streaming pass. Only numpy is
+used, so both the extractor and the simulator can read it (memory-mapped, without parsing).
+"""
+import json
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b"SEGB"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBQQQQ")
+HEADER_SIZE = 64
+SUFFIX = ".segb"
+
+
+def is_binary_segment_file(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _float_dtype(size: int) -> np.dtype:
+    if size not in (4, 8):
+        raise ValueError(f"Unsupported float size: {size}")
+    return np.dtype(f"<f{size}")
+
+
+class SegmentWriter:
+    """Streams segments to a binary file, one (k, 2) array at a time."""
+    def __init__(self, path: str, dtype=np.float32):
+        self.path = path
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        _float_dtype(self.dtype.itemsize)
+        self._file = open(path, "wb")
+        self._file.write(b"\0" * HEADER_SIZE)
+        self._offsets = [0]
+
+    def write(self, segment: np.ndarray):
+        coords = np.ascontiguousarray(segment, dtype=self.dtype).reshape(-1, 2)
+        self._file.write(coords.tobytes())
+        self._offsets.append(self._offsets[-1] + len(coords))
+
+    def write_all(self, coords: np.ndarray, offsets: np.ndarray):
+        """Writes many packed segments at once."""
+        offsets = np.asarray(offsets, dtype=np.int64)
+        self._file.write(np.ascontiguousarray(coords, dtype=self.dtype).reshape(-1, 2).tobytes())
+        self._offsets.extend((offsets[1:] + self._offsets[-1]).tolist())
+
+    def close(self):
+        if self._file.closed:
+            return
+        n_points = self._offsets[-1]
+        coords_position = HEADER_SIZE
+        offsets_position = coords_position + n_points * 2 * self.dtype.itemsize
+        self._file.write(np.asarray(self._offsets, dtype="<u8").tobytes())
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.dtype.itemsize, 0, len(self._offsets) - 1,
+                                     n_points, coords_position, offsets_position))
+        self._file.close()
+
+    def __enter__(self) -> "SegmentWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_segments(path: str, coords: np.ndarray, offsets: np.ndarray, dtype=np.float32):
+    with SegmentWriter(path, dtype) as writer:
+        writer.write_all(coords, offsets)
+
+
+def read_segments(path: str, mmap: bool = True) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the (N, 2) coordinates and (M + 1,) offsets. With mmap they are read-only views of the file."""
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path} is too short to be a segment file")
+    magic, version, float_size, _, n_segments, n_points, coords_position, offsets_position = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a segment file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported segment file version: {version}")
+    dtype = _float_dtype(float_size)
+
+    if mmap:
+        coords = np.memmap(path, dtype=dtype, mode="r", offset=coords_position, shape=(n_points, 2)) if n_points else np.zeros((0, 2), dtype)
+        offsets = np.memmap(path, dtype="<u8", mode="r", offset=offsets_position, shape=(n_segments + 1,))
+    else:
+        with open(path, "rb") as f:
+            f.seek(coords_position)
+            coords = np.fromfile(f, dtype=dtype, count=n_points * 2).reshape(-1, 2)
+            f.seek(offsets_position)
+            offsets = np.fromfile(f, dtype="<u8", count=n_segments + 1)
+    return coords, offsets.astype(np.int64)
+
+
+def iter_segments(path: str) -> list[np.ndarray]:
+    """Every segment as a (k, 2) view of the memory-mapped file."""
+    coords, offsets = read_segments(path)
+    return [coords[start:end] for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def json_to_binary(json_path: str, binary_path: str, dtype=np.float64):
+    """Converts the JSON format. float64 (the JSON precision) keeps it lossless."""
+    with open(json_path, "r") as f:
+        json_obj = json.load(f)
+    with SegmentWriter(binary_path, dtype) as writer:
+        for segment in json_obj:
+            writer.write(np.asarray(segment, dtype=np.float64))
+
+
+def binary_to_json(binary_path: str, json_path: str):
+    coords, offsets = read_segments(binary_path)
+    flat = coords.astype(np.float64).tolist()
+    with open(json_path, "w") as f:
+        json.dump([flat[start:end] for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())], f)
+
+
+if __name__ == "__main__":
+    usage = "usage: python -m src.common.binary_format (to-binary|to-json) INPUT OUTPUT"
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-binary", "to-json"):
+        sys.exit(usage)
+    if sys.argv[1] == "to-binary":
+        json_to_binary(sys.argv[2], sys.argv[3])
+    else:
+        binary_to_json(sys.argv[2], sys.argv[3])
@@ -0,0 +1,171 @@
+"""
+Timers, counters and optional profiling of pipeline stages. Disabled by default.
+
+Functions decorated with @instrumented only check a flag when instrumentation is disabled. Once enabled (enable(),
+the session() context manager, or SEGMENT_INSTRUMENTATION=1 in the environment), every call records its duration
+and, with an items function, the number of items it produced. report() returns the per-stage breakdown as a dict.
+Durations are inclusive: a stage calling another instrumented stage also contains its time.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+class _Stage:
+    __slots__ = ("calls", "seconds", "items")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.items = 0
+
+
+_enabled = os.environ.get("SEGMENT_INSTRUMENTATION", "") not in ("", "0")
+_stages: dict[str, _Stage] = {}
+_counters: dict[str, int] = {}
+_lock = threading.Lock()
+_profiler: cProfile.Profile | None = None
+_started = time.perf_counter()
+_stopped: float | None = None
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(profile: bool = False):
+    """Starts recording. With profile, a cProfile capture also runs until disable()."""
+    global _enabled, _profiler, _stopped
+    _enabled = True
+    _stopped = None
+    if profile and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def disable():
+    global _enabled, _stopped
+    _enabled = False
+    _stopped = time.perf_counter()
+    if _profiler is not None:
+        _profiler.disable()
+
+
+def reset():
+    """Forgets every recorded stage, counter and profile."""
+    global _profiler, _started, _stopped
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+    if _profiler is not None:
+        _profiler.disable()
+    _profiler = None
+    _started = time.perf_counter()
+    _stopped = None if _enabled else _started
+
+
+def _record(name: str, seconds: float, items: int):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = _Stage()
+        stage.calls += 1
+        stage.seconds += seconds
+        stage.items += items
+
+
+def count(name: str, n: int = 1):
+    """Adds n to a counter (no-op when disabled)."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+@contextmanager
+def timer(name: str, items: int = 0):
+    """Times a block as a stage (no-op when disabled)."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - start, items)
+
+
+def instrumented(name: str = None, items: Callable[[object], int] = None):
+    """Decorator recording every call of a function as the stage name (default: module.qualname).
+    items(result) gives the number of items the call produced."""
+    def decorator(func):
+        stage = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            n = 0
+            if items is not None and result is not None:
+                n = items(result)
+            _record(stage, time.perf_counter() - start, n)
+            return result
+
+        return wrapper
+    return decorator
+
+
+def report(top: int = 20) -> dict:
+    """Per-stage calls, total and mean seconds, calls and items per second, counters, and the top entries of the
+    profile (by cumulative time) when profiling."""
+    with _lock:
+        stages = {
+            name: {
+                "calls": s.calls,
+                "seconds": s.seconds,
+                "mean_seconds": s.seconds / s.calls,
+                "calls_per_second": s.calls / s.seconds if s.seconds > 0 else 0.0,
+                "items": s.items,
+                "items_per_second": s.items / s.seconds if s.seconds > 0 else 0.0,
+            }
+            for name, s in sorted(_stages.items(), key=lambda kv: -kv[1].seconds)
+        }
+        counters = dict(_counters)
+
+    profile = None
+    if _profiler is not None:
+        stream = io.StringIO()
+        pstats.Stats(_profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+        profile = stream.getvalue()
+    wall_seconds = (_stopped if _stopped is not None else time.perf_counter()) - _started
+    return {"wall_seconds": wall_seconds, "stages": stages, "counters": counters, "profile": profile}
+
+
+def format_report(run_report: dict) -> str:
+    """Plain-text table of a report()."""
+    lines = [f"{'stage':48} {'calls':>8} {'seconds':>10} {'calls/s':>12} {'items':>10} {'items/s':>12}"]
+    for name, s in run_report["stages"].items():
+        lines.append(f"{name:48} {s['calls']:8d} {s['seconds']:10.4f} {s['calls_per_second']:12.1f} "
+                     f"{s['items']:10d} {s['items_per_second']:12.1f}")
+    for name, value in run_report["counters"].items():
+        lines.append(f"{name:48} {value:8d}")
+    lines.append(f"wall time {run_report['wall_seconds']:.4f} s")
+    return "\n".join(lines)
+
+
+@contextmanager
+def session(profile: bool = False):
+    """Records a fresh run: resets, enables, and disables again on exit. Yields nothing, call report() after."""
+    reset()
+    enable(profile)
+    try:
+        yield
+    finally:
+        disable()
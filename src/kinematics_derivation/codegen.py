@@ -0,0 +1,127 @@
+"""
+Generates vectorized NumPy kinematics kernels from a chain of rz / tx / tz factors.
+
+Every kernel takes (N, n_joints) joint values plus the chain parameters and returns a batch: the transform (N,4,4),
+the position (N,3), the Jacobian (N,3,n_joints) and, for square Jacobians, its inverse. Common subexpressions of
+each kernel are computed once (sympy.cse), and the generated code is checked against the symbolic expressions on
+random inputs before it is written.
+
+    python codegen.py -o ../scara_kinematics/kernels.py
+"""
+import argparse
+import sys
+
+import numpy as np
+import sympy as sp
+from sympy.printing.numpy import NumPyPrinter
+
+from utils import rz_ccw, tx, tz
+
+_printer = NumPyPrinter()
+
+
+def derive(chain: list[sp.Matrix], q: list[sp.Symbol]) -> dict[str, sp.Matrix]:
+    """Symbolic transform, position, Jacobian and (if square and invertible) inverse Jacobian of a chain."""
+    transform = sp.simplify(sp.prod(chain, start=sp.eye(4)))
+    position = sp.simplify(transform @ sp.Matrix([0, 0, 0, 1]))[:3, :]
+    jacobian = sp.simplify(position.jacobian(q))
+    derived = {"transform": transform, "position": position, "jacobian": jacobian}
+    if jacobian.is_square and sp.simplify(jacobian.det()) != 0:
+        derived["inverse_jacobian"] = sp.simplify(jacobian.inv())
+    return derived
+
+
+def _kernel_source(name: str, matrix: sp.Matrix, q: list[sp.Symbol], params: list[sp.Symbol], doc: str) -> str:
+    """Source of one batch kernel. A position (3x1) is returned as (N,3), every other matrix as (N,rows,cols)."""
+    entries = [(i, j) for i in range(matrix.rows) for j in range(matrix.cols) if matrix[i, j] != 0]
+    replacements, reduced = sp.cse([matrix[i, j] for i, j in entries], symbols=sp.numbered_symbols("x"))
+
+    args = ", ".join(["q"] + [str(p) for p in params])
+    lines = [
+        f"def {name}({args}):",
+        f'    """{doc}"""',
+        "    q = numpy.asarray(q, dtype=float)",
+        f"    {', '.join(str(s) for s in q)}{',' if len(q) == 1 else ''} = {', '.join(f'q[:, {k}]' for k in range(len(q)))}",
+    ]
+    lines += [f"    {symbol} = {_printer.doprint(expr)}" for symbol, expr in replacements]
+
+    is_vector = matrix.cols == 1
+    shape = f"(len(q), {matrix.rows})" if is_vector else f"(len(q), {matrix.rows}, {matrix.cols})"
+    lines.append(f"    out = numpy.zeros({shape})")
+    for (i, j), expr in zip(entries, reduced):
+        index = f"[:, {i}]" if is_vector else f"[:, {i}, {j}]"
+        lines.append(f"    out{index} = {_printer.doprint(expr)}")
+    lines.append("    return out")
+    return "\n".join(lines)
+
+
+def generate_module(chain_description: str, derived: dict[str, sp.Matrix], q: list[sp.Symbol], params: list[sp.Symbol]) -> str:
+    """Source of a module with one kernel per derived matrix."""
+    docs = {
+        "transform": "(N,4,4) homogeneous transforms.",
+        "position": "(N,3) end-effector positions.",
+        "jacobian": "(N,3,n) Jacobians of the position.",
+        "inverse_jacobian": "(N,n,3) inverse Jacobians (inf / nan at singular configurations).",
+    }
+    header = [
+        f'"""Kinematics kernels of {chain_description}.',
+        "",
+        'Generated by kinematics_derivation/codegen.py, do not edit."""',
+        "import numpy",
+        "",
+        f"CHAIN = {chain_description!r}",
+        f"JOINTS = {tuple(str(s) for s in q)!r}",
+        f"PARAMS = {tuple(str(s) for s in params)!r}",
+    ]
+    kernels = [_kernel_source(name, matrix, q, params, docs[name]) for name, matrix in derived.items()]
+    return "\n".join(header) + "\n\n\n" + "\n\n\n".join(kernels) + "\n"
+
+
+def self_check(source: str, derived: dict[str, sp.Matrix], q: list[sp.Symbol], params: list[sp.Symbol],
+               n: int = 200, seed: int = 0, rtol: float = 1e-9):
+    """Evaluates the generated kernels and the symbolic matrices (lambdified without cse) on random inputs.
+    Raises RuntimeError on any mismatch."""
+    namespace = {}
+    exec(compile(source, "<generated kernels>", "exec"), namespace)
+
+    rng = np.random.default_rng(seed)
+    q_values = rng.uniform(-np.pi, np.pi, (n, len(q)))
+    param_values = rng.uniform(0.5, 2.0, len(params))
+    for name, matrix in derived.items():
+        generated = namespace[name](q_values, *param_values)
+        reference_fn = sp.lambdify(list(q) + list(params), matrix, modules="numpy", cse=False)
+        reference = np.array([np.asarray(reference_fn(*row, *param_values), dtype=float) for row in q_values])
+        reference = reference.reshape(generated.shape)
+        finite = np.isfinite(reference)
+        if not np.allclose(generated[finite], reference[finite], rtol=rtol, atol=rtol):
+            error = np.abs(generated[finite] - reference[finite]).max()
+            raise RuntimeError(f"Generated {name} does not match the symbolic result (max error {error:.3g})")
+
+
+def scara_chain() -> tuple[str, list[sp.Matrix], list[sp.Symbol], list[sp.Symbol]]:
+    """The chain of ScaraKinematics: Rz(q1)Tx(a1)Rz(q2)Tx(a2)Tz(q3), with counter-clockwise rotations."""
+    a1, a2, q1, q2, q3 = sp.symbols("a1 a2 q1 q2 q3")
+    chain = [rz_ccw(q1), tx(a1), rz_ccw(q2), tx(a2), tz(q3)]
+    return "Rz(q1)Tx(a1)Rz(q2)Tx(a2)Tz(q3)", chain, [q1, q2, q3], [a1, a2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate NumPy kinematics kernels of the SCARA chain")
+    parser.add_argument("-o", "--out", default="-", help="output module (default: stdout)")
+    args = parser.parse_args()
+
+    description, chain, q, params = scara_chain()
+    derived = derive(chain, q)
+    source = generate_module(description, derived, q, params)
+    self_check(source, derived, q, params)
+
+    if args.out == "-":
+        sys.stdout.write(source)
+    else:
+        with open(args.out, "w") as f:
+            f.write(source)
+        print(f"{', '.join(derived)} kernels of {description} checked and written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
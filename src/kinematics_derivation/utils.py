@@ -17,6 +17,12 @@ def rz(theta: sp.Symbol):
     mat[:3, :3] = sp.rot_axis3(theta)
     return mat
 
+def rz_ccw(theta: sp.Symbol):
+    """Counter-clockwise rotation (rz rotates the frame instead), the convention of ScaraKinematics"""
+    mat = sp.eye(4)
+    mat[:3, :3] = sp.rot_ccw_axis3(theta)
+    return mat
+
 if __name__ == "__main__":
     a1, a2, q1, q2, q3 = sp.symbols("a1 a2 q1 q2 q3")
     q = [q1, q2, q3]
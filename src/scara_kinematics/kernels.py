@@ -0,0 +1,74 @@
+"""Kinematics kernels of Rz(q1)Tx(a1)Rz(q2)Tx(a2)Tz(q3).
+
+Generated by kinematics_derivation/codegen.py, do not edit."""
+import numpy
+
+CHAIN = 'Rz(q1)Tx(a1)Rz(q2)Tx(a2)Tz(q3)'
+JOINTS = ('q1', 'q2', 'q3')
+PARAMS = ('a1', 'a2')
+
+
+def transform(q, a1, a2):
+    """(N,4,4) homogeneous transforms."""
+    q = numpy.asarray(q, dtype=float)
+    q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2]
+    x0 = q1 + q2
+    x1 = numpy.cos(x0)
+    x2 = numpy.sin(x0)
+    out = numpy.zeros((len(q), 4, 4))
+    out[:, 0, 0] = x1
+    out[:, 0, 1] = -x2
+    out[:, 0, 3] = a1*numpy.cos(q1) + a2*x1
+    out[:, 1, 0] = x2
+    out[:, 1, 1] = x1
+    out[:, 1, 3] = a1*numpy.sin(q1) + a2*x2
+    out[:, 2, 2] = 1
+    out[:, 2, 3] = q3
+    out[:, 3, 3] = 1
+    return out
+
+
+def position(q, a1, a2):
+    """(N,3) end-effector positions."""
+    q = numpy.asarray(q, dtype=float)
+    q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2]
+    x0 = q1 + q2
+    out = numpy.zeros((len(q), 3))
+    out[:, 0] = a1*numpy.cos(q1) + a2*numpy.cos(x0)
+    out[:, 1] = a1*numpy.sin(q1) + a2*numpy.sin(x0)
+    out[:, 2] = q3
+    return out
+
+
+def jacobian(q, a1, a2):
+    """(N,3,n) Jacobians of the position."""
+    q = numpy.asarray(q, dtype=float)
+    q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2]
+    x0 = q1 + q2
+    x1 = a2*numpy.sin(x0)
+    x2 = a2*numpy.cos(x0)
+    out = numpy.zeros((len(q), 3, 3))
+    out[:, 0, 0] = -a1*numpy.sin(q1) - x1
+    out[:, 0, 1] = -x1
+    out[:, 1, 0] = a1*numpy.cos(q1) + x2
+    out[:, 1, 1] = x2
+    out[:, 2, 2] = 1
+    return out
+
+
+def inverse_jacobian(q, a1, a2):
+    """(N,n,3) inverse Jacobians (inf / nan at singular configurations)."""
+    q = numpy.asarray(q, dtype=float)
+    q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2]
+    x0 = q1 + q2
+    x1 = numpy.cos(x0)
+    x2 = 1/(a1*numpy.sin(q2))
+    x3 = numpy.sin(x0)
+    x4 = x2/a2
+    out = numpy.zeros((len(q), 3, 3))
+    out[:, 0, 0] = x1*x2
+    out[:, 0, 1] = x2*x3
+    out[:, 1, 0] = -x4*(a1*numpy.cos(q1) + a2*x1)
+    out[:, 1, 1] = -x4*(a1*numpy.sin(q1) + a2*x3)
+    out[:, 2, 2] = 1
+    return out
@@ -1,8 +1,30 @@
+from types import ModuleType
+
 import numpy as np
 
+INVERSE_MODES = ("exact", "damped")
+
 class ScaraKinematics:
-    """SCARA Arm 3DOF. Movement: Rz(q1)Tx(a1)Rz(q2)Tx(a2)Tz(q3)"""
-    def __init__(self, a1: float, a2: float, q: np.ndarray, q_dot_max: np.ndarray = None):
+    """SCARA Arm 3DOF. Movement: Rz(q1)Tx(a1)Rz(q2)Tx(a2)Tz(q3)
+
+    inverse="exact" inverts the Jacobian in closed form (pseudo-inverse on exact singularities). inverse="damped" uses
+    damped least squares J^T (J J^T + l^2 I)^-1, with l^2 = max_damping^2 (1 - (w / w0)^2) growing as the
+    manipulability w = |det J| = a1 a2 |sin q2| falls below w0 = manipulability_threshold * a1 a2, so joint rates stay
+    bounded near the fully extended or folded arm. Both modes are closed form and never raise. Every inverse computed
+    in the singular region (w < w0, or an exact singularity for the exact mode) is counted in singular_ticks.
+
+    kernels is an optional module generated by kinematics_derivation/codegen.py (e.g. scara_kinematics.kernels): the
+    batch methods then evaluate its position / jacobian / inverse_jacobian functions instead of the hand-written ones.
+    """
+    SINGULAR_TOL = 1e-12
+    REACH_TOL = 1e-9
+
+    def __init__(self, a1: float, a2: float, q: np.ndarray, q_dot_max: np.ndarray = None, inverse: str = "exact",
+                 max_damping: float = None, manipulability_threshold: float = 0.1, kernels: ModuleType = None):
+        if inverse not in INVERSE_MODES:
+            raise ValueError(f"Unknown inverse mode: {inverse}")
+        if kernels is not None and (len(kernels.JOINTS), kernels.PARAMS) != (3, ("a1", "a2")):
+            raise ValueError(f"Kernels of {kernels.CHAIN} do not match a 3 joint chain with parameters a1, a2")
         self.__validate_input(q)
         self.q = q.copy()
 
@@ -14,6 +36,12 @@ class ScaraKinematics:
         self.a1 = a1
         self.a2 = a2
 
+        self.inverse = inverse
+        self.max_damping = 0.05 * (a1 + a2) if max_damping is None else max_damping
+        self.manipulability_threshold = manipulability_threshold
+        self.singular_ticks = 0
+        self.kernels = kernels
+
     def set_measurements(self, q1: float = None, q2: float = None, q3: float = None):
         """After doing a measurement, update the internal q state."""
         if q1 is not None:
@@ -58,18 +86,42 @@ class ScaraKinematics:
         return p_dot
 
     def get_inverse_jacobian(self, q: np.ndarray, use_pseudo: bool = True) -> np.ndarray:
-        """Returns the inverse of the Jacobian matrix at joint angles q."""
+        """Returns the inverse of the Jacobian matrix at joint angles q (damped in the singular region with
+        inverse="damped"). Without use_pseudo, exact singularities of the exact mode raise LinAlgError."""
         q = self.__get_q(q)
-        J = self.get_jacobian(q)
-        try:
-            J_inv = np.linalg.inv(J)
-        except np.linalg.LinAlgError:
-            if use_pseudo:
-                J_inv = np.linalg.pinv(J)
-                print("Jacobiano singular, usando pseudo-inversa")
-            else:
-                raise
-        return J_inv
+        q1, q2, _ = q.flatten()
+        det = self.a1 * self.a2 * np.sin(q2)
+        manipulability = abs(det)
+        w0 = self.manipulability_threshold * self.a1 * self.a2
+        if self.inverse == "exact" and manipulability < self.SINGULAR_TOL * self.a1 * self.a2:
+            return self.get_inverse_jacobian_batch(q.reshape(1, 3), use_pseudo=use_pseudo)[0]
+
+        s12, c12 = self.a2 * np.sin(q1 + q2), self.a2 * np.cos(q1 + q2)
+        j00, j01 = -self.a1 * np.sin(q1) - s12, -s12
+        j10, j11 = self.a1 * np.cos(q1) + c12, c12
+
+        if self.inverse == "damped" and manipulability < w0:
+            # J^T (J J^T + l^2 I)^-1, with J J^T + l^2 I regular for any l > 0
+            self.singular_ticks += 1
+            damping = self.max_damping ** 2 * (1 - (manipulability / w0) ** 2)
+            a00, a01, a11 = j00 ** 2 + j01 ** 2 + damping, j00 * j10 + j01 * j11, j10 ** 2 + j11 ** 2 + damping
+            det_a = a00 * a11 - a01 ** 2
+            if det_a <= self.SINGULAR_TOL * (self.a1 * self.a2) ** 2:
+                # Already counted above, so not through get_inverse_jacobian_batch
+                return self.__damped_inverse(self.get_jacobian_batch(q.reshape(1, 3)), np.array([damping]))[0]
+            b00, b01, b11 = a11 / det_a, -a01 / det_a, a00 / det_a
+            return np.array([
+                [j00 * b00 + j10 * b01, j00 * b01 + j10 * b11, 0.],
+                [j01 * b00 + j11 * b01, j01 * b01 + j11 * b11, 0.],
+                [0., 0., 1.],
+            ])
+
+        # Regular configuration: closed-form inverse of the planar block
+        return np.array([
+            [j11 / det, -j01 / det, 0.],
+            [-j10 / det, j00 / det, 0.],
+            [0., 0., 1.],
+        ])
 
     def get_q_dot(self, p_dot: np.ndarray, current_q: np.ndarray = None, normalize: bool = False) -> np.ndarray:
         """Computes joint velocities q_dot to move towards desired end-effector position."""
@@ -82,6 +134,163 @@ class ScaraKinematics:
             q_dot = self.__scale(q_dot, self.q_dot_max)
         return q_dot
 
+    def get_p_batch(self, q: np.ndarray) -> np.ndarray:
+        """Returns (N,3) end-effector positions given (N,3) joint configurations."""
+        self.__validate_batch_input(q)
+        if self.kernels is not None:
+            return self.kernels.position(q, self.a1, self.a2)
+        q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2]
+        q12 = q1 + q2
+
+        return np.column_stack((
+            self.a1 * np.cos(q1) + self.a2 * np.cos(q12),
+            self.a1 * np.sin(q1) + self.a2 * np.sin(q12),
+            q3,
+        ))
+
+    def get_jacobian_batch(self, q: np.ndarray) -> np.ndarray:
+        """Returns (N,3,3) Jacobian matrices given (N,3) joint configurations."""
+        self.__validate_batch_input(q)
+        if self.kernels is not None:
+            return self.kernels.jacobian(q, self.a1, self.a2)
+        q1, q12 = q[:, 0], q[:, 0] + q[:, 1]
+        s12 = self.a2 * np.sin(q12)
+        c12 = self.a2 * np.cos(q12)
+
+        J = np.zeros((len(q), 3, 3))
+        J[:, 0, 0] = - self.a1 * np.sin(q1) - s12
+        J[:, 0, 1] = - s12
+        J[:, 1, 0] = self.a1 * np.cos(q1) + c12
+        J[:, 1, 1] = c12
+        J[:, 2, 2] = 1
+        return J
+
+    def get_inverse_jacobian_batch(self, q: np.ndarray, use_pseudo: bool = True) -> np.ndarray:
+        """Returns (N,3,3) inverse Jacobians given (N,3) joint configurations.
+        Closed form: det(J) = a1*a2*sin(q2). Exact singularities use the pseudo-inverse (exact mode), or damped
+        least squares throughout the singular region (damped mode)."""
+        self.__validate_batch_input(q)
+        det = self.a1 * self.a2 * np.sin(q[:, 1])
+        manipulability = np.abs(det)
+
+        if self.inverse == "damped":
+            w0 = self.manipulability_threshold * self.a1 * self.a2
+            in_region = manipulability < w0
+            self.singular_ticks += int(in_region.sum())
+            damping = np.where(in_region, self.max_damping ** 2 * (1 - (manipulability / w0) ** 2), 0.)
+            return self.__damped_inverse(self.get_jacobian_batch(q), damping)
+
+        singular = manipulability < self.SINGULAR_TOL * self.a1 * self.a2
+        if singular.any():
+            if not use_pseudo:
+                raise np.linalg.LinAlgError("Singular matrix")
+            self.singular_ticks += int(singular.sum())
+
+        if self.kernels is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                J_inv = self.kernels.inverse_jacobian(q, self.a1, self.a2)
+        else:
+            J = self.get_jacobian_batch(q)
+            inv_det = 1 / np.where(singular, 1, det)
+            J_inv = np.zeros_like(J)
+            J_inv[:, 0, 0] = J[:, 1, 1] * inv_det
+            J_inv[:, 0, 1] = - J[:, 0, 1] * inv_det
+            J_inv[:, 1, 0] = - J[:, 1, 0] * inv_det
+            J_inv[:, 1, 1] = J[:, 0, 0] * inv_det
+            J_inv[:, 2, 2] = 1
+        if singular.any():
+            J_inv[singular] = self.__damped_inverse(self.get_jacobian_batch(q[singular]), np.zeros(int(singular.sum())))
+        return J_inv
+
+    def get_q_dot_batch(self, p_dot: np.ndarray, q: np.ndarray, normalize: bool = False) -> np.ndarray:
+        """Computes (N,3) joint velocities for (N,3) end-effector velocities at (N,3) joint configurations."""
+        self.__validate_batch_input(p_dot)
+        J_inv = self.get_inverse_jacobian_batch(q)
+        q_dot = np.einsum("nij,nj->ni", J_inv, p_dot)
+        if normalize and self.q_dot_max is not None:
+            ratios = np.abs(q_dot) / self.q_dot_max.reshape(1, 3)
+            scale = np.maximum(ratios.max(axis=1, keepdims=True), 1)
+            q_dot = q_dot / scale
+        return q_dot
+
+    def get_q_from_p_batch(self, p: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Closed-form inverse kinematics for (N,3) positions.
+        Returns the elbow-up (q2 >= 0) and elbow-down (q2 <= 0) (N,3) solutions and a (N,) reachable mask.
+        Points outside the reachable annulus |a1-a2| <= r <= a1+a2 get the closest pose along their direction."""
+        self.__validate_batch_input(p)
+        x, y, z = p[:, 0], p[:, 1], p[:, 2]
+
+        c2 = (x ** 2 + y ** 2 - self.a1 ** 2 - self.a2 ** 2) / (2 * self.a1 * self.a2)
+        reachable = np.abs(c2) <= 1 + self.REACH_TOL
+        c2 = np.clip(c2, -1, 1)
+        q2 = np.arccos(c2)
+        s2 = np.sin(q2)
+
+        base = np.arctan2(y, x)
+        offset = np.arctan2(self.a2 * s2, self.a1 + self.a2 * c2)
+        q_up = np.column_stack((base - offset, q2, z))
+        q_down = np.column_stack((base + offset, -q2, z))
+        return q_up, q_down, reachable
+
+    def get_q_from_p(self, p: np.ndarray, q_prev: np.ndarray = None, elbow_up: bool = True) -> tuple[np.ndarray, bool]:
+        """Closed-form inverse kinematics for a single position. Returns a (3,1) configuration and reachability.
+        With q_prev the branch (and the 2*pi turn) closest to q_prev is chosen, otherwise the elbow_up branch."""
+        self.__validate_input(p)
+        q_start = None if q_prev is None else self.__get_q(q_prev).reshape(1, 3)
+        q, reachable = self.get_q_path(p.reshape(1, 3), q_start=q_start, elbow_up=elbow_up)
+        return q.reshape(3, 1), bool(reachable[0])
+
+    def get_q_path(self, p: np.ndarray, q_start: np.ndarray = None, elbow_up: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """Inverse kinematics of a whole (N,3) polyline. Returns (N,3) joint configurations and a (N,) reachable mask.
+        The branch is chosen once (closest to q_start or elbow_up) and kept along the path, since switching branch
+        means crossing the q2 = 0 singularity. Angles are unwrapped so consecutive configurations are continuous."""
+        q_up, q_down, reachable = self.get_q_from_p_batch(p)
+        if len(p) == 0:
+            return q_up, reachable
+
+        if q_start is not None:
+            q_start = np.asarray(q_start, dtype=float).reshape(3)
+            dist_up = np.abs(self.__wrap(q_up[0, :2] - q_start[:2])).sum()
+            dist_down = np.abs(self.__wrap(q_down[0, :2] - q_start[:2])).sum()
+            elbow_up = dist_up <= dist_down
+        q = q_up if elbow_up else q_down
+
+        if q_start is not None:
+            q = np.vstack((q_start, q))
+        q[:, :2] = np.unwrap(q[:, :2], axis=0)
+        if q_start is not None:
+            q = q[1:]
+        return q, reachable
+
+    def __damped_inverse(self, J: np.ndarray, damping: np.ndarray) -> np.ndarray:
+        """J^T (J J^T + damping I)^-1 of the planar 2x2 blocks of (N,3,3) Jacobians, in closed form.
+        With zero damping on a singular block it is the pseudo-inverse (rank 1: J^T / |J|_F^2, or zero)."""
+        j00, j01, j10, j11 = J[:, 0, 0], J[:, 0, 1], J[:, 1, 0], J[:, 1, 1]
+        a00 = j00 ** 2 + j01 ** 2 + damping
+        a01 = j00 * j10 + j01 * j11
+        a11 = j10 ** 2 + j11 ** 2 + damping
+        det = a00 * a11 - a01 ** 2
+
+        regular = det > self.SINGULAR_TOL * (self.a1 * self.a2) ** 2
+        inv_det = 1 / np.where(regular, det, 1)
+        b00, b01, b11 = a11 * inv_det, -a01 * inv_det, a00 * inv_det
+
+        J_inv = np.zeros_like(J)
+        J_inv[:, 0, 0] = j00 * b00 + j10 * b01
+        J_inv[:, 0, 1] = j00 * b01 + j10 * b11
+        J_inv[:, 1, 0] = j01 * b00 + j11 * b01
+        J_inv[:, 1, 1] = j01 * b01 + j11 * b11
+        if not regular.all():
+            frobenius = (J[~regular, :2, :2] ** 2).sum(axis=(1, 2))
+            scale = np.where(frobenius > 0, 1 / np.where(frobenius > 0, frobenius, 1), 0)
+            J_inv[~regular, :2, :2] = np.swapaxes(J[~regular, :2, :2], 1, 2) * scale[:, None, None]
+        J_inv[:, 2, 2] = 1
+        return J_inv
+
+    def __wrap(self, angle: np.ndarray) -> np.ndarray:
+        """Wraps angles into [-pi, pi)."""
+        return (angle + np.pi) % (2 * np.pi) - np.pi
+
     def __get_q(self, q: np.ndarray = None) -> np.ndarray:
         """In case a method doesnt provide q, takes the class value"""
         if q is None:
@@ -96,6 +305,13 @@ class ScaraKinematics:
         if q.shape not in [(3,), (3,1)]:
             raise ValueError("q.shape should be (3,) or (3,1)")
 
+    def __validate_batch_input(self, q: np.ndarray):
+        """Checks that q is a valid batch input. (N,3) ndarray"""
+        if not isinstance(q, np.ndarray):
+            raise ValueError("q should be an ndarray")
+        if q.ndim != 2 or q.shape[1] != 3:
+            raise ValueError("q.shape should be (N,3)")
+
     def __scale(self, x: np.ndarray, max_x: np.ndarray) -> np.ndarray:
         """Scales x so that no element exceeds max_x, preserving ratios."""
         ratios = np.abs(x) / max_x
@@ -0,0 +1,140 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from .scara_kinematics import ScaraKinematics
+
+
+class WorkspaceTable:
+    """Precomputed grid over the square [-(a1+a2), a1+a2]^2 around the arm base (base frame, same units as a1, a2).
+
+    Every cell corner holds the elbow-up joint angles (q1, q2), the Jacobian condition number and whether it is
+    reachable, so joint angles, conditioning and reachability of many points become array lookups with bilinear
+    interpolation. Joint angles can be refined with a few Newton steps on the exact kinematics.
+    """
+    def __init__(self, a1: float, a2: float, resolution: float, q: np.ndarray, condition: np.ndarray, reachable: np.ndarray):
+        self.a1 = a1
+        self.a2 = a2
+        self.resolution = resolution
+        self.q = q
+        self.condition = condition
+        self.reachable = reachable
+        self.origin = -(a1 + a2)
+        self.kinematics = ScaraKinematics(a1, a2, np.zeros((3, 1)))
+
+    @classmethod
+    def build(cls, a1: float, a2: float, resolution: float = 1.0) -> "WorkspaceTable":
+        """Evaluates the closed-form IK and the Jacobian on a grid with cells of resolution units."""
+        r = a1 + a2
+        n = int(np.ceil(2 * r / resolution)) + 1
+        axis = -r + resolution * np.arange(n)
+        xs, ys = np.meshgrid(axis, axis)
+        p = np.column_stack((xs.ravel(), ys.ravel(), np.zeros(xs.size)))
+
+        kinematics = ScaraKinematics(a1, a2, np.zeros((3, 1)))
+        q_up, _, reachable = kinematics.get_q_from_p_batch(p)
+        # 2x2 Jacobian singular values in closed form: s_max * s_min = |det|, s_max^2 + s_min^2 = |J|_F^2
+        J = kinematics.get_jacobian_batch(q_up)[:, :2, :2]
+        det = np.abs(J[:, 0, 0] * J[:, 1, 1] - J[:, 0, 1] * J[:, 1, 0])
+        frobenius = (J ** 2).sum(axis=(1, 2))
+        root = np.sqrt(np.maximum(frobenius ** 2 - 4 * det ** 2, 0))
+        s_max = np.sqrt((frobenius + root) / 2)
+        s_min = np.sqrt(np.maximum((frobenius - root) / 2, 0))
+        with np.errstate(divide="ignore"):
+            condition = np.where(s_min > 0, s_max / np.where(s_min > 0, s_min, 1), np.inf)
+
+        return cls(a1, a2, resolution,
+                   q_up[:, :2].reshape(n, n, 2).astype(np.float32),
+                   condition.reshape(n, n).astype(np.float32),
+                   reachable.reshape(n, n))
+
+    def save(self, path: str):
+        np.savez_compressed(path, a1=self.a1, a2=self.a2, resolution=self.resolution,
+                            q=self.q, condition=self.condition, reachable=self.reachable)
+
+    @classmethod
+    def load(cls, path: str) -> "WorkspaceTable":
+        with np.load(path) as data:
+            return cls(float(data["a1"]), float(data["a2"]), float(data["resolution"]),
+                       data["q"], data["condition"], data["reachable"])
+
+    @classmethod
+    def load_or_build(cls, path: str, a1: float, a2: float, resolution: float = 1.0) -> "WorkspaceTable":
+        """Loads the table at path if it was built for the same geometry, otherwise builds and saves it."""
+        if Path(path).exists():
+            table = cls.load(path)
+            if (table.a1, table.a2, table.resolution) == (a1, a2, resolution):
+                return table
+        table = cls.build(a1, a2, resolution)
+        table.save(path)
+        return table
+
+    def _cells(self, p: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Lower-left cell indices, interpolation weights and an inside-the-grid mask of (N,2) points."""
+        n = self.q.shape[0]
+        u = (np.asarray(p, dtype=float)[:, :2] - self.origin) / self.resolution
+        inside = ((u >= 0) & (u <= n - 1)).all(axis=1)
+        u = np.clip(u, 0, n - 1 - 1e-9)
+        ij = np.floor(u).astype(np.intp)
+        t = u - ij
+        return ij[:, 1], ij[:, 0], t[:, 1], t[:, 0], inside
+
+    def is_reachable(self, p: np.ndarray, max_condition: float = np.inf) -> np.ndarray:
+        """(N,) mask of the (N,2) base-frame points whose four surrounding grid corners are reachable and (when
+        max_condition is given) better conditioned than max_condition. Conservative by up to one cell."""
+        row, col, _, _, inside = self._cells(p)
+        ok = inside.copy()
+        for dr in (0, 1):
+            for dc in (0, 1):
+                ok &= self.reachable[row + dr, col + dc]
+                if np.isfinite(max_condition):
+                    ok &= self.condition[row + dr, col + dc] <= max_condition
+        return ok
+
+    def get_condition(self, p: np.ndarray) -> np.ndarray:
+        """Bilinearly interpolated Jacobian condition number at (N,2) points (inf next to singular cells)."""
+        row, col, ty, tx, _ = self._cells(p)
+        c = self.condition
+        with np.errstate(invalid="ignore"):
+            return ((c[row, col] * (1 - tx) + c[row, col + 1] * tx) * (1 - ty)
+                    + (c[row + 1, col] * (1 - tx) + c[row + 1, col + 1] * tx) * ty)
+
+    def lookup_q(self, p: np.ndarray) -> np.ndarray:
+        """Bilinearly interpolated elbow-up (N,2) joint angles at (N,2) points.
+        Corners are unwrapped relative to the first one, so cells crossing the +-pi seam interpolate correctly."""
+        row, col, ty, tx, _ = self._cells(p)
+        q00 = self.q[row, col].astype(float)
+
+        def corner(dr, dc):
+            dq = self.q[row + dr, col + dc] - q00
+            return q00 + (dq + np.pi) % (2 * np.pi) - np.pi
+
+        tx, ty = tx[:, None], ty[:, None]
+        return (q00 * (1 - tx) + corner(0, 1) * tx) * (1 - ty) + (corner(1, 0) * (1 - tx) + corner(1, 1) * tx) * ty
+
+    def get_q(self, p: np.ndarray, iterations: int = 2) -> np.ndarray:
+        """Warm-started IK of (N,2) points: table lookup, then Newton steps q += J^-1 (p - f(q)). Returns (N,2)."""
+        p = np.asarray(p, dtype=float)
+        q = np.column_stack((self.lookup_q(p), np.zeros(len(p))))
+        for _ in range(iterations):
+            error = np.column_stack((p[:, :2], np.zeros(len(p)))) - self.kinematics.get_p_batch(q)
+            q += np.einsum("nij,nj->ni", self.kinematics.get_inverse_jacobian_batch(q), error)
+        return q[:, :2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a SCARA workspace lookup table")
+    parser.add_argument("a1", type=float, help="first link length")
+    parser.add_argument("a2", type=float, help="second link length")
+    parser.add_argument("--resolution", type=float, default=1.0, help="grid cell size")
+    parser.add_argument("-o", "--out", default="workspace.npz", help="output .npz file")
+    args = parser.parse_args()
+
+    table = WorkspaceTable.build(args.a1, args.a2, args.resolution)
+    table.save(args.out)
+    print(f"{table.q.shape[0]}x{table.q.shape[1]} table, {table.reachable.mean():.1%} reachable, written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
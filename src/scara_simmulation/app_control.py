@@ -6,6 +6,7 @@ import pygame
 
 from .constants import WIDTH, HEIGHT, L1, L2, CENTER, MAX_R, MAX_W1, MAX_W2
 from .models import ScaraSimulator
+from .runtime import SimulationRuntime
 
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -15,10 +16,14 @@ screen = pygame.display.set_mode((WIDTH, HEIGHT))
 clock = pygame.time.Clock()
 
 sim = ScaraSimulator(L1, L2, center=CENTER, max_w1=MAX_W1, max_w2=MAX_W2)
-is_running = False
 
 target = list(CENTER)
-sim.set_target(target)
+sim.set_target(tuple(target))
+
+# The controller runs at 1 kHz on its own thread, the loop below only handles input and rendering
+runtime = SimulationRuntime(sim, rate=1000.)
+runtime.paused = True
+runtime.start()
 
 font = pygame.font.SysFont(None, 28)
 
@@ -27,16 +32,18 @@ while True:
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            runtime.stop()
             pygame.quit()
             sys.exit()
 
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_SPACE:
-                is_running = not is_running
+                runtime.paused = not runtime.paused
             if event.key == pygame.K_r:
-                sim.reset()
                 target = list(CENTER)
-                sim.set_target(target)
+                with runtime.lock:
+                    sim.reset()
+                    sim.set_target(tuple(target))
 
     # Move target with arrows
     keys = pygame.key.get_pressed()
@@ -54,15 +61,13 @@ while True:
         target[0] = CENTER[0] + dx * MAX_R / dist
         target[1] = CENTER[1] + dy * MAX_R / dist
 
-    sim.set_target(tuple(target))
-
-    if is_running:
-        sim.update(dt)
+    with runtime.lock:
+        sim.set_target(tuple(target))
 
     screen.fill((25, 25, 25))
 
     # Draw arm
-    (x1, y1), (x2, y2) = sim.get_vertices()
+    (x1, y1), (x2, y2) = runtime.snapshot().vertices
     pygame.draw.line(screen, WHITE, CENTER, (x1, y1), 5)
     pygame.draw.line(screen, WHITE, (x1, y1), (x2, y2), 5)
     pygame.draw.circle(screen, WHITE, CENTER, 10)
@@ -73,7 +78,7 @@ while True:
     pygame.draw.circle(screen, RED, (int(target[0]), int(target[1])), 10)
 
     # UI
-    screen.blit(font.render(f"SPACE = Run/Pause  |  State: {'RUNNING' if is_running else 'STOPPED'}", True, (255,255,255)), (20,20))
+    screen.blit(font.render(f"SPACE = Run/Pause  |  State: {'STOPPED' if runtime.paused else 'RUNNING'}", True, (255,255,255)), (20,20))
     screen.blit(font.render("Arrow keys = Move target", True, (255,255,255)), (20,50))
     screen.blit(font.render("R = Reset", True, (255,255,255)), (20,80))
 
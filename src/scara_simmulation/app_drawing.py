@@ -1,13 +1,13 @@
 import sys
-import math as m
 from pathlib import Path
 
-import numpy as np
 import pygame
 
-from .utils import load_segment_img, normalize_segments, Drawer
-from .constants import WIDTH, HEIGHT, L1, L2, CENTER, MAX_R, MAX_W1, MAX_W2
+from .utils import load_segment_img, fit_segments_to_workspace, Drawer, TrajectoryDrawer
+from .trajectory import plan_trajectory
+from .constants import WIDTH, HEIGHT, L1, L2, CENTER, MAX_R, MAX_W1, MAX_W2, EPS
 from .models import ScaraSimulator
+from .runtime import SimulationRuntime
 
 
 WHITE = (255, 255, 255)
@@ -16,7 +16,33 @@ BG = (25, 25, 25)
 BLUE = (0, 0, 122)
 
 SPEED_MULT = 1.0
-EPS = 2.
+SIM_RATE = 1000.0  # Hz, simulation thread (the display runs at 60 fps)
+
+
+class TraceSurface:
+    """The drawn trace, kept on a persistent background surface. Every new pixel is drawn once (consecutive
+    duplicates are dropped), so the cost of a frame does not grow with the size of the drawing."""
+    def __init__(self, size: tuple[int, int], color: tuple[int, int, int], background: tuple[int, int, int], width: int = 3):
+        self.surface = pygame.Surface(size).convert()
+        self.surface.fill(background)
+        self.color = color
+        self.width = width
+        self.last_point: tuple[int, int] | None = None
+        self.n_points = 0
+
+    def add(self, point: tuple[float, float]):
+        """Extends the current stroke to point."""
+        pixel = (int(point[0]), int(point[1]))
+        if pixel == self.last_point:
+            return
+        if self.last_point is not None:
+            pygame.draw.line(self.surface, self.color, self.last_point, pixel, self.width)
+        self.last_point = pixel
+        self.n_points += 1
+
+    def lift(self):
+        """Ends the current stroke."""
+        self.last_point = None
 
 pygame.init()
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
@@ -24,11 +50,16 @@ pygame.display.set_caption("SCARA Drawer - non-interactive demo")
 clock = pygame.time.Clock()
 font = pygame.font.SysFont(None, 24)
 
-sim = ScaraSimulator(L1, L2, center=CENTER, max_w1=MAX_W1, max_w2=MAX_W2)
+PLANNED = "--planned" in sys.argv
+CONTROLLER = "feedforward" if "--feedforward" in sys.argv else "proportional"
+ADAPTIVE = "--adaptive" in sys.argv
+args = [a for a in sys.argv[1:] if a not in ("--planned", "--feedforward", "--adaptive")]
+
+sim = ScaraSimulator(L1, L2, center=CENTER, max_w1=MAX_W1, max_w2=MAX_W2, controller=CONTROLLER)
 
 segments = None
-if len(sys.argv) > 1:
-    path = Path(sys.argv[1])
+if args:
+    path = Path(args[0])
     if path.exists():
         try:
             segments = load_segment_img(str(path))
@@ -41,82 +72,63 @@ if segments is None:
         [[-0.5, 0.0], [0.0, -1.0], [0.5, 0.0]],
         [[0.25, -0.5], [-0.25, -0.5]],
     ]
-circunscribed_square = MAX_R / m.sqrt(2)
-x_min = CENTER[0] - circunscribed_square
-x_max = CENTER[0] + circunscribed_square
-y_min = CENTER[1] - circunscribed_square
-y_max = CENTER[1] + circunscribed_square
 
-segments_norm = normalize_segments(segments, x_min, x_max, y_min, y_max)
-drawer = Drawer(simulator=sim, segments=segments_norm, eps=EPS)
+segments_norm = fit_segments_to_workspace(segments, CENTER, MAX_R)
+if PLANNED:
+    trajectory = plan_trajectory(segments_norm, L1, L2, CENTER, q_start=sim.arm.get_q(), max_w=(MAX_W1, MAX_W2))
+    drawer = TrajectoryDrawer(simulator=sim, trajectory=trajectory)
+else:
+    drawer = Drawer(simulator=sim, segments=segments_norm, eps=EPS)
 
-trace_segments = []
-current_segment = []
+trace = TraceSurface((WIDTH, HEIGHT), BLUE, BG)
+runtime = SimulationRuntime(sim, drawer, rate=SIM_RATE, speed=SPEED_MULT, adaptive=ADAPTIVE).start()
+BUTTON_RECT = pygame.Rect(10, 120, 100, 30)
 
 running = True
-drawing_time = 0.0
 
 while running:
-    dt = clock.tick(60) / 1000.0
+    clock.tick(60)
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            if BUTTON_RECT.collidepoint(event.pos):
+                runtime.speed = min(runtime.speed * 2, 16)
 
-    drawer.update(dt * SPEED_MULT)
+    snapshot = runtime.snapshot()
+    for point in snapshot.trace:
+        if point is None:
+            trace.lift()
+        else:
+            trace.add(point)
 
-    screen.fill(BG)
-    BUTTON_RECT = pygame.Rect(10, 120, 100, 30)
+    screen.blit(trace.surface, (0, 0))
     pygame.draw.rect(screen, (100, 100, 255), BUTTON_RECT)
     screen.blit(font.render("Faster", True, WHITE), (15, 125))
 
 
-    (x1, y1), (x2, y2) = sim.get_vertices()
-    if drawer.is_drawing():
-        current_point = (int(x2), int(y2))
-        current_segment.append(current_point)
-    elif current_segment:
-        trace_segments.append(current_segment)
-        current_segment = []
-
-    for seg in trace_segments:
-        if len(seg) > 1:
-            pygame.draw.lines(screen, BLUE, False, seg, 3)
-
-    if len(current_segment) > 1:
-        pygame.draw.lines(screen, BLUE, False, current_segment, 3)
-
-    if not drawer.has_finished():
+    (x1, y1), (x2, y2) = snapshot.vertices
+    if not snapshot.has_finished:
         pygame.draw.line(screen, WHITE, CENTER, (x1, y1), 5)
         pygame.draw.line(screen, WHITE, (x1, y1), (x2, y2), 5)
         pygame.draw.circle(screen, WHITE, (int(CENTER[0]), int(CENTER[1])), 8)
         pygame.draw.circle(screen, WHITE, (int(x1), int(y1)), 6)
         pygame.draw.circle(screen, WHITE, (int(x2), int(y2)), 6)
 
-    if sim.target is not None and not drawer.has_finished():
-        tx, ty = sim.target
+    if snapshot.target is not None and not snapshot.has_finished:
+        tx, ty = snapshot.target
         pygame.draw.circle(screen, RED, (int(tx), int(ty)), 6)
 
-    status = "FINISHED" if drawer.has_finished() else ("DRAWING" if drawer.is_drawing() else "MOVING")
+    status = "FINISHED" if snapshot.has_finished else ("DRAWING" if snapshot.is_drawing else "MOVING")
     screen.blit(font.render(f"State: {status}", True, WHITE), (10, 10))
-    msg = "DRAWING" if drawer.is_drawing() else "MOVING"
+    msg = "DRAWING" if snapshot.is_drawing else "MOVING"
     screen.blit(font.render(msg, True, WHITE), (10, 60))
-    screen.blit(font.render(f"Time drawing: {drawing_time:.2f}s", True, WHITE), (10, 90))
+    screen.blit(font.render(f"Time drawing: {snapshot.time:.2f}s", True, WHITE), (10, 90))
 
     pygame.display.flip()
 
-    if not drawer.has_finished():
-        drawing_time += dt * SPEED_MULT
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            if BUTTON_RECT.collidepoint(event.pos):
-                SPEED_MULT *= 2
-                if SPEED_MULT > 16:
-                    SPEED_MULT = 16
-
 
+runtime.stop()
 pygame.quit()
 print("Demo finished.")
@@ -3,3 +3,5 @@ L1, L2 = 180, 180
 CENTER = (WIDTH // 2, HEIGHT // 2)
 MAX_R = L1 + L2
 MAX_W1, MAX_W2 = 3., 3.
+MAX_ALPHA1, MAX_ALPHA2 = 20., 20.
+EPS = 2.
@@ -0,0 +1,192 @@
+import argparse
+import json
+import math as m
+from dataclasses import dataclass, field, asdict
+
+from src.common import instrumentation
+from .utils import load_segment_img, fit_segments_to_workspace, Drawer, TrajectoryDrawer
+from .constants import L1, L2, CENTER, MAX_R, MAX_W1, MAX_W2, EPS
+from .models import ScaraSimulator, CONTROLLERS
+from .trajectory import plan_trajectory
+from .reachability import check_segments, default_table
+
+FIXED_DT = 0.001
+# Adaptive steps are limited by the distance to the target, so the largest step can be much longer than a fixed one
+ADAPTIVE_MAX_DT = 0.05
+
+
+@dataclass
+class DrawingResult:
+    """Outcome of a headless drawing run. Times are simulated seconds, distances are pixels."""
+    trace: list[list[tuple[float, float]]] = field(default_factory=list)
+    total_time: float = 0.0
+    pen_down_time: float = 0.0
+    pen_up_time: float = 0.0
+    pen_down_distance: float = 0.0
+    pen_up_distance: float = 0.0
+    tracking_error_mean: float = 0.0
+    tracking_error_max: float = 0.0
+    ticks: int = 0
+    singular_ticks: int = 0
+    target_ticks: list[int] = field(default_factory=list)
+    finished: bool = False
+
+    def summary(self) -> dict:
+        """Everything but the trace and the per-target ticks (summarized as mean and max)."""
+        result = asdict(self)
+        result.pop("trace")
+        result.pop("target_ticks")
+        result["trace_points"] = sum(len(s) for s in self.trace)
+        result["ticks_per_target_mean"] = sum(self.target_ticks) / len(self.target_ticks) if self.target_ticks else 0.0
+        result["ticks_per_target_max"] = max(self.target_ticks, default=0)
+        return result
+
+
+def _distance_to_piece(p: tuple[float, float], a: list[float], b: list[float]) -> float:
+    """Distance from p to the line piece a-b."""
+    abx, aby = b[0] - a[0], b[1] - a[1]
+    apx, apy = p[0] - a[0], p[1] - a[1]
+    length2 = abx ** 2 + aby ** 2
+    t = min(1., max(0., (apx * abx + apy * aby) / length2)) if length2 > 0 else 0.
+    return m.hypot(apx - t * abx, apy - t * aby)
+
+
+def run_headless(drawer: Drawer | TrajectoryDrawer, dt: float = 0.001, max_time: float = 3600.,
+                 adaptive: bool = False) -> DrawingResult:
+    """Steps a Drawer with a fixed dt until it finishes (or max_time simulated seconds), without any display.
+    With adaptive, dt is the largest step and the drawer chooses every step (see Drawer.step)."""
+    result = DrawingResult()
+    current_segment = []
+    error_sum = 0.0
+    error_samples = 0
+    _, (x, y) = drawer.get_vertices()
+    target = drawer.simulator.target
+    target_ticks = 0
+
+    while not drawer.has_finished() and result.total_time < max_time:
+        drawing = drawer.is_drawing()
+        if adaptive:
+            step_dt = drawer.step(dt)
+        else:
+            step_dt = dt
+            drawer.update(dt)
+
+        _, (nx, ny) = drawer.get_vertices()
+        step = m.hypot(nx - x, ny - y)
+        x, y = nx, ny
+
+        result.ticks += 1
+        result.total_time += step_dt
+        target_ticks += 1
+        if drawer.simulator.target is not target or drawer.has_finished():
+            if target is not None:
+                result.target_ticks.append(target_ticks)
+            target, target_ticks = drawer.simulator.target, 0
+        if drawing:
+            result.pen_down_time += step_dt
+            result.pen_down_distance += step
+        else:
+            result.pen_up_time += step_dt
+            result.pen_up_distance += step
+
+        if drawer.is_drawing():
+            current_segment.append((x, y))
+            piece = drawer.current_piece()
+            if piece is not None:
+                error = _distance_to_piece((x, y), *piece)
+                error_sum += error
+                error_samples += 1
+                result.tracking_error_max = max(result.tracking_error_max, error)
+        elif current_segment:
+            result.trace.append(current_segment)
+            current_segment = []
+
+    if current_segment:
+        result.trace.append(current_segment)
+    if error_samples:
+        result.tracking_error_mean = error_sum / error_samples
+    result.finished = drawer.has_finished()
+    result.singular_ticks = drawer.simulator.kinematics.singular_ticks
+    return result
+
+
+def simulate_drawing(segments: list[list[list[float, float]]], dt: float = 0.001, eps: float = EPS,
+                     max_time: float = 3600., max_w1: float = MAX_W1, max_w2: float = MAX_W2,
+                     planned: bool = False, controller: str = "proportional", adaptive: bool = False,
+                     inverse: str = "exact") -> DrawingResult:
+    """Fits segments into the workspace and draws them headless with the default arm.
+    With planned, a time-parameterized trajectory (see trajectory.plan_trajectory) is replayed instead of
+    running the point-to-point controller. With adaptive, dt is the largest step of the adaptive integrator."""
+    sim = ScaraSimulator(L1, L2, center=CENTER, max_w1=max_w1, max_w2=max_w2, controller=controller, inverse=inverse)
+    segments_norm = fit_segments_to_workspace(segments, CENTER, MAX_R)
+    if planned:
+        trajectory = plan_trajectory(segments_norm, L1, L2, CENTER, q_start=sim.arm.get_q(), max_w=(max_w1, max_w2))
+        drawer = TrajectoryDrawer(simulator=sim, trajectory=trajectory)
+    else:
+        drawer = Drawer(simulator=sim, segments=segments_norm, eps=eps)
+    return run_headless(drawer, dt=dt, max_time=max_time, adaptive=adaptive)
+
+
+def compare_controllers(segments: list[list[list[float, float]]], **kwargs) -> dict[str, dict]:
+    """Summary of the same drawing with every controller (kwargs as in simulate_drawing)."""
+    return {c: simulate_drawing(segments, controller=c, **kwargs).summary() for c in CONTROLLERS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate a SCARA drawing without display")
+    parser.add_argument("file", help="segments JSON file")
+    parser.add_argument("--dt", type=float, default=None,
+                        help=f"fixed simulation step (default {FIXED_DT}), or largest adaptive step (default {ADAPTIVE_MAX_DT}) (s)")
+    parser.add_argument("--adaptive", action="store_true", help="adaptive steps with exact target arrival times")
+    parser.add_argument("--eps", type=float, default=EPS, help="target tolerance (px)")
+    parser.add_argument("--max-time", type=float, default=3600., help="simulated time limit (s)")
+    parser.add_argument("--planned", action="store_true", help="replay a planned trajectory instead of the controller")
+    parser.add_argument("--controller", choices=CONTROLLERS, default="proportional", help="point-to-point controller")
+    parser.add_argument("--damped", action="store_true", help="damped least-squares Jacobian inverse near singularities")
+    parser.add_argument("--compare-controllers", action="store_true",
+                        help="draw with every controller and print their summaries side by side")
+    parser.add_argument("--trace", help="write the traced polylines to this JSON file")
+    parser.add_argument("--workspace", nargs="?", const="", default=None,
+                        help="reject unreachable drawings first, using this workspace table (.npz, built if missing; "
+                             "default: in SCARA_CACHE_DIR)")
+    parser.add_argument("--report", action="store_true", help="print per-stage timings of the run")
+    parser.add_argument("--profile", action="store_true", help="with --report, also capture a cProfile")
+    args = parser.parse_args()
+    if args.dt is None:
+        args.dt = ADAPTIVE_MAX_DT if args.adaptive else FIXED_DT
+
+    segments = load_segment_img(args.file)
+    if args.workspace is not None:
+        reachability = check_segments(segments, default_table(args.workspace or None))
+        if not reachability.ok:
+            raise SystemExit(f"{args.file} is out of reach: {reachability}")
+
+    if args.compare_controllers:
+        summaries = compare_controllers(segments, dt=args.dt, eps=args.eps, max_time=args.max_time, adaptive=args.adaptive,
+                                        inverse="damped" if args.damped else "exact")
+        print(f"{'':24}" + "".join(f"{c:>16}" for c in summaries))
+        for key in next(iter(summaries.values())):
+            print(f"{key:24}" + "".join(f"{s[key]:>16.6g}" for s in summaries.values()))
+        return
+
+    if args.report:
+        instrumentation.reset()
+        instrumentation.enable(profile=args.profile)
+    result = simulate_drawing(segments, dt=args.dt, eps=args.eps, max_time=args.max_time, planned=args.planned,
+                              controller=args.controller, adaptive=args.adaptive,
+                              inverse="damped" if args.damped else "exact")
+    print(json.dumps(result.summary(), indent=2))
+    if args.report:
+        instrumentation.disable()
+        run_report = instrumentation.report()
+        print(instrumentation.format_report(run_report))
+        if run_report["profile"]:
+            print(run_report["profile"])
+
+    if args.trace:
+        with open(args.trace, "w") as f:
+            json.dump(result.trace, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import math as m
 import numpy as np
 from src.scara_kinematics.scara_kinematics import ScaraKinematics
+from src.common.instrumentation import instrumented
+
+CONTROLLERS = ("proportional", "feedforward")
+# Distance (per axis) within which the effector has reached its target
+TARGET_TOLERANCE = 0.1
 
 
 class ScaraModel:
@@ -47,29 +52,108 @@ class ScaraModel:
 
 
 class ScaraSimulator:
-    """Scara 2D arm simulator using ScaraKinmeatics + ScaraModel."""
+    """Scara 2D arm simulator using ScaraKinmeatics + ScaraModel.
+
+    controller="proportional" commands an end-effector velocity equal to the position error (scaled down to the joint
+    limits), so every move slows down exponentially near its target. controller="feedforward" moves along the error
+    direction at the fastest speed the joints allow, saturated by gain * error (1/s) near the target and never
+    overshooting it within a step. With a next target (see set_target), it keeps a feed-forward speed through the
+    target in proportion to how straight the path continues, instead of stopping at every point of a stroke.
+    inverse selects how the Jacobian is inverted (see ScaraKinematics), "damped" keeps joint rates bounded near
+    the fully extended arm (the default start pose).
+    """
     def __init__(self, length_1: float, length_2: float,
                  angle_1: float = 0.0, angle_2: float = 0.0,
                  z: float = 0.0, max_w1: float = 1.0, max_w2: float = 1.0,
-                 center: tuple[float, float] = (0,0)):
-        
+                 center: tuple[float, float] = (0,0), controller: str = "proportional", gain: float = 20.,
+                 inverse: str = "exact"):
+        if controller not in CONTROLLERS:
+            raise ValueError(f"Unknown controller: {controller}")
+
         q = np.array([[angle_1], [angle_2], [z]])
         q_dot_max = np.array([[max_w1], [max_w2], [np.inf]])
 
-        self.kinematics = ScaraKinematics(length_1, length_2, q, q_dot_max=q_dot_max)
+        self.kinematics = ScaraKinematics(length_1, length_2, q, q_dot_max=q_dot_max, inverse=inverse)
         self.arm = ScaraModel(length_1, length_2, max_w1, max_w2, center=center)
         self.target: tuple[float, float] | None = None
+        self.next_target: tuple[float, float] | None = None
         self.center = np.array([[center[0]], [center[1]], [0]])
+        self.controller = controller
+        self.gain = gain
 
-    def set_target(self, pos: tuple[float, float]):
-        """Sets a new target position for the end-effector."""
+    def set_target(self, pos: tuple[float, float], next_pos: tuple[float, float] = None):
+        """Sets a new target position for the end-effector. next_pos is the following target on the path, if it
+        continues without stopping (used by the feedforward controller)."""
         self.target = pos
+        self.next_target = next_pos
 
+    @instrumented("ScaraSimulator.update")
     def update(self, dt: float = 0.016):
         """Updates the arm position towards the target using controller."""
         if self.target_is_achieved():
             return
-        
+
+        w1, w2, _ = self._joint_rates(dt)
+        self.arm.rotate(w1, w2, dt)
+
+        q1, q2 = self.arm.get_q()
+        self.kinematics.set_measurements(q1=q1, q2=q2)
+
+    @instrumented("ScaraSimulator.step_to_target")
+    def step_to_target(self, max_dt: float, eps: float = TARGET_TOLERANCE, fraction: float = 0.25, max_step: float = 4.) -> float:
+        """Adaptive update: advances by at most max_dt and returns the simulated time actually taken.
+
+        The step is as long as possible while the effector moves at most fraction of its distance to the target
+        (at least eps / 2, at most max_step pixels so the traced chords stay close to the true arcs), so long moves
+        take a few large steps and the final approach is resolved finely.
+        If the step enters the eps box around the target, it is cut at the entry time (found by bisection along the
+        step), so the arm stops exactly where a fixed-step simulation with a tiny dt would have noticed it.
+        While the commanded speed is proportional to the distance (rate k), the error decays as exp(-k t), so the
+        time returned is the exact time to cover the step rather than the Euler step length; the Euler step is
+        shortened so that this time never exceeds max_dt.
+        """
+        if self.target_is_achieved(eps):
+            return 0.0
+
+        # The step length is bounded below, so the feedforward controller does not need its overshoot cap
+        w1, w2, rate = self._joint_rates(None)
+        q1, q2 = self.arm.get_q()
+        (x1, y1), (x2, y2) = self.get_vertices()
+        # End-effector speed: |J q_dot| in closed form
+        vx = -(y2 - self.center[1, 0]) * w1 - (y2 - y1) * w2
+        vy = (x2 - self.center[0, 0]) * w1 + (x2 - x1) * w2
+        speed = m.hypot(vx, vy)
+
+        # Longest Euler step whose exact time (see below) is still within max_dt
+        dt = -m.expm1(-rate * max_dt) / rate if rate > 0 else max_dt
+        if speed > 0:
+            distance = m.hypot(self.target[0] - x2, self.target[1] - y2)
+            dt = min(dt, min(max(fraction * distance, eps / 2), max_step) / speed)
+
+        self.arm.rotate(w1, w2, dt)
+        if self.target_is_achieved(eps):
+            lo, hi = 0.0, dt
+            for _ in range(30):
+                mid = (lo + hi) / 2
+                self.arm.reset(q1, q2)
+                self.arm.rotate(w1, w2, mid)
+                if self.target_is_achieved(eps):
+                    hi = mid
+                else:
+                    lo = mid
+            self.arm.reset(q1, q2)
+            self.arm.rotate(w1, w2, hi)
+            dt = hi
+
+        q1, q2 = self.arm.get_q()
+        self.kinematics.set_measurements(q1=q1, q2=q2)
+        if rate > 0:
+            return min(-m.log1p(-min(rate * dt, 1 - 1e-12)) / rate, max_dt)
+        return dt
+
+    def _joint_rates(self, dt: float | None) -> tuple[float, float, float]:
+        """Joint rates commanded by the controller for a step of dt (None: an unbounded step), and the rate k when
+        the commanded end-effector speed is k * distance to the target (0 when it is saturated)."""
         tx, ty = self.target
         desired_p = np.array([[tx], [ty], [0]]) - self.center
 
@@ -78,13 +162,46 @@ class ScaraSimulator:
 
         current_p = self.kinematics.get_p()
         desired_p_dot = desired_p - current_p
-        
-        q_dot = self.kinematics.get_q_dot(desired_p_dot, normalize=True)
-        w1, w2 = q_dot[0,0], q_dot[1,0]
-        self.arm.rotate(w1, w2, dt)
 
-        q1, q2 = self.arm.get_q()
-        self.kinematics.set_measurements(q1=q1, q2=q2)
+        if self.controller == "feedforward":
+            q_dot, rate = self._feedforward_q_dot(desired_p_dot, dt)
+        else:
+            q_dot = self.kinematics.get_q_dot(desired_p_dot)
+            ratios = np.abs(q_dot[:2, 0]) / self.kinematics.q_dot_max[:2, 0]
+            rate = 1.
+            if ratios.max() > 1:
+                q_dot, rate = q_dot / ratios.max(), 0.
+        return q_dot[0,0], q_dot[1,0], rate
+
+    def _feedforward_q_dot(self, error: np.ndarray, dt: float | None) -> tuple[np.ndarray, float]:
+        """Joint rates moving along error at min(joint-limited speed, max(gain * |error|, feed-forward speed)),
+        capped at |error| / dt so a step never overshoots the target. Also returns gain if the gain term is the
+        one in effect (0 otherwise)."""
+        distance = float(np.hypot(error[0, 0], error[1, 0]))
+        if distance == 0:
+            return np.zeros((3, 1)), 0.
+        direction = error / distance
+
+        # Joint rates per unit of end-effector speed along direction, and the speed at which a joint saturates
+        q_dot_unit = self.kinematics.get_q_dot(direction)
+        ratios = np.abs(q_dot_unit[:2, 0]) / self.kinematics.q_dot_max[:2, 0]
+        max_speed = 1 / ratios.max() if ratios.max() > 0 else np.inf
+
+        speed, rate = self.gain * distance, self.gain
+        if self.next_target is not None:
+            nx, ny = self.next_target
+            next_direction = np.array([nx - self.target[0], ny - self.target[1]], dtype=float)
+            norm = np.hypot(*next_direction)
+            if norm > 0:
+                straightness = float(direction[0, 0] * next_direction[0] + direction[1, 0] * next_direction[1]) / norm
+                if max_speed * straightness > speed:
+                    speed, rate = max_speed * straightness, 0.
+
+        if speed > max_speed:
+            speed, rate = max_speed, 0.
+        if dt is not None and speed > distance / dt:
+            speed, rate = distance / dt, 0.
+        return q_dot_unit * speed, rate
 
     def get_vertices(self) -> tuple[tuple[float, float], tuple[float, float]]:
         """Returns vertex positions for drawing."""
@@ -95,7 +212,7 @@ class ScaraSimulator:
         self.arm.reset(angle_1, angle_2)
         self.kinematics.set_measurements(q1=angle_1, q2=angle_2)
     
-    def target_is_achieved(self, eps: float = 0.1) -> bool:
+    def target_is_achieved(self, eps: float = TARGET_TOLERANCE) -> bool:
         """Checks if the target position is achieved within a tolerance."""
         if self.target is None:
             return True
@@ -104,3 +221,89 @@ class ScaraSimulator:
         _, effector = self.get_vertices()
         ex, ey = effector
         return abs(tx - ex) < eps and abs(ty - ey) < eps
+
+
+class BatchScaraSimulator:
+    """N independent SCARA 2D arms stepped in lockstep. Same controller as ScaraSimulator, vectorized over arms.
+
+    State lives in contiguous (N, 2) arrays: angles, targets (NaN when unset), joint speed limits and base centers.
+    """
+    def __init__(self, n: int, length_1: float | np.ndarray, length_2: float | np.ndarray,
+                 angle_1: float | np.ndarray = 0.0, angle_2: float | np.ndarray = 0.0,
+                 max_w1: float | np.ndarray = 1.0, max_w2: float | np.ndarray = 1.0,
+                 center: tuple[float, float] | np.ndarray = (0, 0)):
+        self.n = n
+        self.lengths = np.empty((n, 2))
+        self.lengths[:, 0] = length_1
+        self.lengths[:, 1] = length_2
+
+        self.max_w = np.empty((n, 2))
+        self.max_w[:, 0] = np.abs(max_w1)
+        self.max_w[:, 1] = np.abs(max_w2)
+
+        self.angles = np.empty((n, 2))
+        self.reset(angle_1, angle_2)
+
+        self.centers = np.empty((n, 2))
+        self.centers[:] = center
+        self.targets = np.full((n, 2), np.nan)
+
+    def set_targets(self, targets: np.ndarray, mask: np.ndarray = None):
+        """Sets (N, 2) target positions (or the rows selected by mask). NaN rows have no target."""
+        if mask is None:
+            self.targets[:] = targets
+        else:
+            self.targets[mask] = targets
+
+    def reset(self, angle_1: float | np.ndarray = 0.0, angle_2: float | np.ndarray = m.pi / 2):
+        """Resets the arms to given angles."""
+        self.angles[:, 0] = angle_1
+        self.angles[:, 1] = angle_2
+
+    def get_vertices(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the (N, 2) elbow and effector positions."""
+        q1 = self.angles[:, 0]
+        q12 = q1 + self.angles[:, 1]
+        elbow = self.centers + self.lengths[:, :1] * np.column_stack((np.cos(q1), np.sin(q1)))
+        effector = elbow + self.lengths[:, 1:] * np.column_stack((np.cos(q12), np.sin(q12)))
+        return elbow, effector
+
+    def targets_achieved(self, eps: float = TARGET_TOLERANCE) -> np.ndarray:
+        """(N,) mask of arms within eps (per axis) of their target, or without target."""
+        _, effector = self.get_vertices()
+        with np.errstate(invalid="ignore"):
+            close = (np.abs(self.targets - effector) < eps).all(axis=1)
+        return close | np.isnan(self.targets).any(axis=1)
+
+    def update(self, dt: float = 0.016):
+        """Moves every arm towards its target using the ScaraSimulator controller."""
+        a1, a2 = self.lengths[:, 0], self.lengths[:, 1]
+        q1 = self.angles[:, 0]
+        q12 = q1 + self.angles[:, 1]
+        s1, c1 = np.sin(q1), np.cos(q1)
+        s12, c12 = a2 * np.sin(q12), a2 * np.cos(q12)
+
+        effector = self.centers + np.column_stack((a1 * c1 + c12, a1 * s1 + s12))
+        error = self.targets - effector
+        active = ~((np.abs(error) < TARGET_TOLERANCE).all(axis=1) | np.isnan(error).any(axis=1))
+        error[~active] = 0
+
+        # Closed-form inverse of J = [[-(a1 s1 + a2 s12), -a2 s12], [a1 c1 + a2 c12, a2 c12]]
+        j00, j01 = -(a1 * s1 + s12), -s12
+        j10, j11 = a1 * c1 + c12, c12
+        det = j00 * j11 - j01 * j10
+        singular = np.abs(det) < 1e-12 * a1 * a2
+        inv_det = 1 / np.where(singular, 1, det)
+        w = np.column_stack((
+            (j11 * error[:, 0] - j01 * error[:, 1]) * inv_det,
+            (j00 * error[:, 1] - j10 * error[:, 0]) * inv_det,
+        ))
+        if singular.any():
+            J = np.stack((np.column_stack((j00, j01)), np.column_stack((j10, j11))), axis=1)[singular]
+            w[singular] = np.einsum("nij,nj->ni", np.linalg.pinv(J), error[singular])
+
+        # Scale preserving ratios, then clamp and integrate like ScaraModel.rotate
+        scale = np.maximum((np.abs(w) / self.max_w).max(axis=1, keepdims=True), 1)
+        w = np.clip(w / scale, -self.max_w, self.max_w)
+        self.angles += w * dt
+        np.remainder(self.angles, 2 * m.pi, out=self.angles)
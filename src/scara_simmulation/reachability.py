@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from src.scara_kinematics.workspace import WorkspaceTable
+from .utils import load_segment_img, fit_segments_to_workspace
+from .constants import L1, L2, CENTER, MAX_R
+
+# Points whose Jacobian condition number exceeds this are next to the fully extended (or folded) singularity
+MAX_CONDITION = 50.
+
+
+@dataclass
+class ReachabilityReport:
+    points: int
+    unreachable: int
+    ill_conditioned: int
+
+    @property
+    def ok(self) -> bool:
+        return self.unreachable == 0 and self.ill_conditioned == 0
+
+
+def check_segments(segments: list[list[list[float, float]]], table: WorkspaceTable, center: tuple[float, float] = CENTER,
+                   max_r: float = MAX_R, fit: bool = True, max_condition: float = MAX_CONDITION) -> ReachabilityReport:
+    """Checks every point of a drawing against the workspace table. With fit, segments are first placed like the
+    simulator does (fit_segments_to_workspace), otherwise they are taken as screen coordinates."""
+    if fit:
+        segments = fit_segments_to_workspace(segments, center, max_r)
+    points = np.concatenate([np.asarray(s, dtype=float).reshape(-1, 2) for s in segments]) - center
+    reachable = table.is_reachable(points)
+    well_conditioned = table.is_reachable(points, max_condition=max_condition)
+    return ReachabilityReport(
+        points=len(points),
+        unreachable=int((~reachable).sum()),
+        ill_conditioned=int((reachable & ~well_conditioned).sum()),
+    )
+
+
+def cache_dir() -> Path:
+    """Directory for generated tables: SCARA_CACHE_DIR, or scara/ in the user cache directory."""
+    if os.environ.get("SCARA_CACHE_DIR"):
+        return Path(os.environ["SCARA_CACHE_DIR"])
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "scara"
+
+
+def default_table(path: str = None, resolution: float = 1.0) -> WorkspaceTable:
+    """Table of the default arm, built once and cached at path (by default in cache_dir())."""
+    if path is None:
+        directory = cache_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = str(directory / f"workspace_{L1}_{L2}_{resolution:g}.npz")
+    return WorkspaceTable.load_or_build(path, L1, L2, resolution)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reject drawings the default SCARA arm cannot reach")
+    parser.add_argument("files", nargs="+", help="segments files")
+    parser.add_argument("--table", default=None, help="workspace table (.npz), built if missing (default: in SCARA_CACHE_DIR)")
+    parser.add_argument("--no-fit", action="store_true", help="points are screen coordinates, do not fit them")
+    parser.add_argument("--max-condition", type=float, default=MAX_CONDITION, help="largest Jacobian condition number")
+    args = parser.parse_args()
+
+    table = default_table(args.table)
+    rejected = 0
+    for path in args.files:
+        report = check_segments(load_segment_img(path), table, fit=not args.no_fit, max_condition=args.max_condition)
+        rejected += not report.ok
+        status = "ok    " if report.ok else "REJECT"
+        print(f"{status} {path}: {report.points} points, {report.unreachable} unreachable, "
+              f"{report.ill_conditioned} ill-conditioned")
+    return 1 if rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+Streams a drawing to a robot controller over a byte stream (TCP or a serial device / pty) with flow control.
+
+Protocol, little-endian. Host to device, one 16-byte frame per command: op (u8), flags (u8, bit 0 = pen down),
+seq (u16, wraps), three float32 values.
+    POINT  x, y, 0           Cartesian point in the arm base frame, reached in a straight line
+    JOINT  q1, q2, duration  joint setpoint, reached after duration seconds
+    END    0, 0, 0           end of the drawing
+Device to host, 4-byte frames: op (u8), 0, seq (u16).
+    ACK    seq               every command up to seq has been executed (cumulative)
+    ERROR  seq               seq was rejected (buffer overflow), the device stops
+
+The device executes commands from a look-ahead buffer of a fixed number of slots and acknowledges them once executed.
+The streamer keeps at most window commands unacknowledged, so with window <= buffer size the buffer never overflows
+(back-pressure), and with window * command duration above the round trip time the arm never waits for the link.
+"""
+import argparse
+import asyncio
+import math as m
+import os
+import struct
+import time
+import tty
+from dataclasses import dataclass, asdict
+from typing import Iterable
+
+import numpy as np
+
+from .utils import load_segment_img, fit_segments_to_workspace
+from .trajectory import JointTrajectory, plan_trajectory
+from .constants import L1, L2, CENTER, MAX_R, MAX_W1, MAX_W2
+
+OP_POINT, OP_JOINT, OP_END = 0x01, 0x02, 0x03
+OP_ACK, OP_ERROR = 0x10, 0x11
+FLAG_PEN_DOWN = 0x01
+
+COMMAND = struct.Struct("<BBH3f")
+REPLY = struct.Struct("<BBH")
+
+
+class LinkError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Command:
+    op: int
+    values: tuple[float, float, float] = (0., 0., 0.)
+    pen_down: bool = False
+
+    def encode(self, seq: int) -> bytes:
+        return COMMAND.pack(self.op, FLAG_PEN_DOWN if self.pen_down else 0, seq & 0xFFFF, *self.values)
+
+    @classmethod
+    def decode(cls, frame: bytes) -> tuple["Command", int]:
+        op, flags, seq, *values = COMMAND.unpack(frame)
+        return cls(op, tuple(values), bool(flags & FLAG_PEN_DOWN)), seq
+
+
+END = Command(OP_END)
+
+
+def commands_from_segments(segments: list[list[list[float, float]]], origin: tuple[float, float] = (0., 0.)) -> list[Command]:
+    """Sorted segments as POINT commands relative to origin: a pen-up move to the first point of every segment,
+    then pen-down moves through the rest."""
+    commands = []
+    for segment in segments:
+        points = np.asarray(segment, dtype=float).reshape(-1, 2) - origin
+        commands += [Command(OP_POINT, (x, y, 0.), pen_down=k > 0) for k, (x, y) in enumerate(points.tolist())]
+    return commands
+
+
+def commands_from_trajectory(trajectory: JointTrajectory, period: float = 0.02) -> list[Command]:
+    """A planned trajectory as JOINT setpoints every period seconds (plus every pen change). Each command carries
+    the pen state of the move that reaches it."""
+    t = trajectory.t
+    changes = t[1:][trajectory.pen_down[1:] != trajectory.pen_down[:-1]]
+    times = np.unique(np.concatenate((np.arange(0., trajectory.duration, period), changes, [trajectory.duration])))
+    q1 = np.interp(times, t, trajectory.q[:, 0])
+    q2 = np.interp(times, t, trajectory.q[:, 1])
+    # Pen state of the sample preceding each setpoint, i.e. during the move towards it
+    k = np.clip(np.searchsorted(t, times, side="left") - 1, 0, len(t) - 1)
+    pen = trajectory.pen_down[k]
+    durations = np.diff(times, prepend=0.)
+    return [Command(OP_JOINT, (a, b, d), pen_down=bool(p)) for a, b, d, p in zip(q1.tolist(), q2.tolist(), durations.tolist(), pen)]
+
+
+def encode_commands(commands: Iterable[Command]) -> bytes:
+    """Command stream as it goes on the wire, END included (for exporting to a file)."""
+    return b"".join(c.encode(seq) for seq, c in enumerate([*commands, END]))
+
+
+@dataclass
+class StreamStats:
+    commands: int = 0
+    bytes_sent: int = 0
+    seconds: float = 0.
+    window_waits: int = 0
+    max_in_flight: int = 0
+
+
+class CommandStreamer:
+    """Sends commands with at most window unacknowledged, waiting for acknowledgements (and for the transport to
+    drain) whenever the window is full."""
+    def __init__(self, reader: asyncio.StreamReader, writer: "asyncio.StreamWriter | PipeWriter", window: int = 32):
+        if window < 1:
+            raise ValueError("window should be at least 1")
+        self.reader = reader
+        self.writer = writer
+        self.window = window
+        self._sent = 0
+        self._acked = 0
+        self._error: Exception | None = None
+        self._changed = asyncio.Condition()
+
+    async def stream(self, commands: Iterable[Command]) -> StreamStats:
+        """Streams commands followed by END, and returns once the device has executed all of them."""
+        stats = StreamStats()
+        start = time.perf_counter()
+        acks = asyncio.create_task(self._read_replies())
+        try:
+            for command in [*commands, END]:
+                async with self._changed:
+                    if self._sent - self._acked >= self.window:
+                        stats.window_waits += 1
+                    await self._changed.wait_for(lambda: self._error or self._sent - self._acked < self.window)
+                    self._raise_error()
+                    frame = command.encode(self._sent)
+                    self._sent += 1
+                    stats.max_in_flight = max(stats.max_in_flight, self._sent - self._acked)
+                self.writer.write(frame)
+                await self.writer.drain()
+                stats.commands += 1
+                stats.bytes_sent += len(frame)
+
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._error or self._acked == self._sent)
+                self._raise_error()
+        finally:
+            acks.cancel()
+        stats.commands -= 1  # END
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    async def _read_replies(self):
+        try:
+            while True:
+                op, _, seq = REPLY.unpack(await self.reader.readexactly(REPLY.size))
+                async with self._changed:
+                    if op == OP_ACK:
+                        # Cumulative: seq is the last executed command, modulo 2^16
+                        done = (seq + 1 - self._acked) & 0xFFFF
+                        if done > self._sent - self._acked:
+                            raise LinkError(f"Acknowledgement of unsent command {seq}")
+                        self._acked += done
+                    else:
+                        raise LinkError(f"Device rejected command {seq} (op {op:#x})")
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            async with self._changed:
+                self._error = e if isinstance(e, LinkError) else LinkError(f"Link closed: {e}")
+                self._changed.notify_all()
+
+
+@dataclass
+class DeviceStats:
+    executed: int = 0
+    max_buffered: int = 0
+    # Times the arm finished a move before the next command had arrived
+    starved: int = 0
+    busy_seconds: float = 0.
+
+
+class StandInDevice:
+    """Local stand-in for the robot controller. Executes commands in real time (scaled by time_scale): POINT moves
+    at speed units per second, JOINT moves take their duration. Acknowledgements reach the host latency seconds
+    later, like over a slow link."""
+    def __init__(self, buffer_size: int = 32, speed: float = 400., time_scale: float = 1., latency: float = 0.):
+        self.buffer_size = buffer_size
+        self.speed = speed
+        self.time_scale = time_scale
+        self.latency = latency
+        self.stats = DeviceStats()
+        self.executed: list[Command] = []
+
+    async def handle(self, reader: asyncio.StreamReader, writer: "asyncio.StreamWriter | PipeWriter"):
+        """Serves one drawing: buffers frames until END, executing them concurrently."""
+        buffer: asyncio.Queue = asyncio.Queue()
+        executing = [0]
+        executor = asyncio.create_task(self._execute(buffer, writer, executing))
+        try:
+            while True:
+                command, seq = Command.decode(await reader.readexactly(COMMAND.size))
+                if buffer.qsize() + executing[0] >= self.buffer_size:
+                    writer.write(REPLY.pack(OP_ERROR, 0, seq))
+                    executor.cancel()
+                    break
+                buffer.put_nowait((command, seq))
+                self.stats.max_buffered = max(self.stats.max_buffered, buffer.qsize() + executing[0])
+                if command.op == OP_END:
+                    await executor
+                    break
+        except asyncio.IncompleteReadError:
+            executor.cancel()
+        finally:
+            await asyncio.sleep(self.latency)
+            writer.close()
+            await writer.wait_closed()
+
+    async def _execute(self, buffer: asyncio.Queue, writer: "asyncio.StreamWriter | PipeWriter", executing: list[int]):
+        loop = asyncio.get_running_loop()
+        position = None
+        while True:
+            if buffer.empty() and self.stats.executed:
+                self.stats.starved += 1
+            command, seq = await buffer.get()
+            executing[0] = 1
+
+            duration = 0.
+            if command.op == OP_POINT:
+                target = command.values[:2]
+                duration = 0. if position is None else m.dist(position, target) / self.speed
+                position = target
+            elif command.op == OP_JOINT:
+                duration = command.values[2]
+            await asyncio.sleep(duration * self.time_scale)
+            self.stats.busy_seconds += duration
+
+            self.executed.append(command)
+            self.stats.executed += 1
+            executing[0] = 0
+            loop.call_later(self.latency, writer.write, REPLY.pack(OP_ACK, 0, seq))
+            if command.op == OP_END:
+                return
+
+    async def serve_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """Starts a TCP server (port 0 picks a free port, see server.sockets[0].getsockname())."""
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_pty(self) -> tuple[str, asyncio.Task]:
+        """Serves one drawing on a new pseudo-terminal. Returns its path (open it with open_link) and the task."""
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        path = os.ttyname(slave)
+        reader, writer = await _fd_streams(master)
+
+        async def serve():
+            try:
+                await self.handle(reader, writer)
+            finally:
+                os.close(slave)
+        return path, asyncio.create_task(serve())
+
+
+class _PipeProtocol(asyncio.Protocol):
+    """Write-side flow control of a pipe transport: writes wait while its buffer is above the high-water mark."""
+    def __init__(self):
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    def pause_writing(self):
+        self.writable.clear()
+
+    def resume_writing(self):
+        self.writable.set()
+
+    def connection_lost(self, exc: Exception | None):
+        self.writable.set()
+
+
+class PipeWriter:
+    """The part of asyncio.StreamWriter used here (write, drain, close), over the pipe transports of a tty.
+    Closing it closes both the write and the read transport."""
+    def __init__(self, transport: asyncio.WriteTransport, protocol: _PipeProtocol, read_transport: asyncio.ReadTransport):
+        self.transport = transport
+        self.protocol = protocol
+        self.read_transport = read_transport
+
+    def write(self, data: bytes):
+        self.transport.write(data)
+
+    async def drain(self):
+        if self.transport.is_closing():
+            raise ConnectionResetError("Pipe closed")
+        await self.protocol.writable.wait()
+
+    def close(self):
+        self.transport.close()
+        self.read_transport.close()
+
+    async def wait_closed(self):
+        await asyncio.sleep(0)
+
+
+async def _fd_streams(fd: int) -> tuple[asyncio.StreamReader, PipeWriter]:
+    """Stream reader and writer over a file descriptor (tty or pty). The writer owns both ends."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    read_transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                                     os.fdopen(fd, "rb", buffering=0))
+    transport, protocol = await loop.connect_write_pipe(_PipeProtocol, os.fdopen(os.dup(fd), "wb", buffering=0))
+    return reader, PipeWriter(transport, protocol, read_transport)
+
+
+async def open_link(address: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter | PipeWriter]:
+    """Opens host:port over TCP, or a serial device / pty path in raw mode."""
+    if os.path.exists(address):
+        fd = os.open(address, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        tty.setraw(fd)
+        return await _fd_streams(fd)
+    host, _, port = address.rpartition(":")
+    return await asyncio.open_connection(host or "127.0.0.1", int(port))
+
+
+async def stream_to(address: str, commands: list[Command], window: int = 32) -> StreamStats:
+    reader, writer = await open_link(address)
+    try:
+        return await CommandStreamer(reader, writer, window).stream(commands)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def stream_to_stand_in(commands: list[Command], window: int = 32, pty: bool = False,
+                             **device_kwargs) -> tuple[StreamStats, DeviceStats]:
+    """Streams commands to a local StandInDevice over TCP (or a pty)."""
+    device = StandInDevice(**device_kwargs)
+    if pty:
+        path, served = await device.serve_pty()
+        stats = await stream_to(path, commands, window)
+        await served
+    else:
+        server = await device.serve_tcp()
+        host, port = server.sockets[0].getsockname()[:2]
+        async with server:
+            stats = await stream_to(f"{host}:{port}", commands, window)
+    return stats, device.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a SCARA drawing to a robot controller")
+    parser.add_argument("file", help="segments file")
+    parser.add_argument("--planned", action="store_true", help="stream a planned joint trajectory instead of points")
+    parser.add_argument("--period", type=float, default=0.02, help="joint setpoint period with --planned (s)")
+    parser.add_argument("--connect", help="host:port or serial device; default: a local stand-in device")
+    parser.add_argument("--window", type=int, default=32, help="unacknowledged commands in flight")
+    parser.add_argument("--export", help="write the command stream to this file instead of sending it")
+    parser.add_argument("--pty", action="store_true", help="reach the stand-in device through a pseudo-terminal")
+    parser.add_argument("--latency", type=float, default=0.005, help="stand-in acknowledgement latency (s)")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="stand-in execution time scale")
+    parser.add_argument("--compare", action="store_true", help="also stream with window 1 (one round trip per command)")
+    args = parser.parse_args()
+
+    segments = fit_segments_to_workspace(load_segment_img(args.file), CENTER, MAX_R)
+    if args.planned:
+        trajectory = plan_trajectory(segments, L1, L2, CENTER, max_w=(MAX_W1, MAX_W2))
+        commands = commands_from_trajectory(trajectory, args.period)
+    else:
+        commands = commands_from_segments(segments, origin=CENTER)
+
+    if args.export:
+        data = encode_commands(commands)
+        with open(args.export, "wb") as f:
+            f.write(data)
+        print(f"{len(commands)} commands ({len(data)} bytes) written to {args.export}")
+        return
+
+    if args.connect:
+        print(asdict(asyncio.run(stream_to(args.connect, commands, args.window))))
+        return
+
+    for window in ([1] if args.compare else []) + [args.window]:
+        stats, device = asyncio.run(stream_to_stand_in(commands, window, pty=args.pty, buffer_size=max(window, args.window),
+                                                       time_scale=args.time_scale, latency=args.latency))
+        print(f"window {window}: {asdict(stats)} device {asdict(device)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import math as m
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+from .models import ScaraSimulator
+from .utils import Drawer, TrajectoryDrawer
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """State of the simulation at the end of a tick, safe to read from another thread."""
+    time: float
+    steps: int
+    vertices: tuple[tuple[float, float], tuple[float, float]]
+    target: tuple[float, float] | None
+    is_drawing: bool
+    has_finished: bool
+    # End-effector positions drawn since the previous snapshot() call, None where the pen lifted
+    trace: list[tuple[float, float] | None] = field(default_factory=list)
+
+
+class SimulationRuntime:
+    """Runs a ScaraSimulator (or a Drawer / TrajectoryDrawer driving it) on a fixed-rate thread, decoupled from
+    rendering. Every tick advances the simulation by speed / rate seconds, in sub-steps of at most 1 / rate, and
+    publishes a Snapshot; a renderer reads snapshot() at its own frame rate. When a tick overruns, the schedule is
+    dropped instead of catching up in a burst (counted in overruns), so simulated time then runs slower than real time.
+
+    Anything else touching the simulator while the runtime runs (set_target, reset, ...) has to hold lock.
+    """
+    def __init__(self, simulator: ScaraSimulator, drawer: Drawer | TrajectoryDrawer = None, rate: float = 1000.,
+                 speed: float = 1., adaptive: bool = False):
+        self.simulator = simulator
+        self.drawer = drawer
+        self.rate = rate
+        self.speed = speed
+        self.adaptive = adaptive
+        self.paused = False
+
+        self.lock = threading.Lock()
+        self.time = 0.0
+        self.steps = 0
+        self.overruns = 0
+        self._trace: list[tuple[float, float] | None] = []
+        self._pen_down = False
+        self._snapshot = self._make_snapshot()
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "SimulationRuntime":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="scara-simulation", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SimulationRuntime":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def snapshot(self) -> Snapshot:
+        """Latest published state, with the trace drawn since the previous call."""
+        with self.lock:
+            snapshot, trace = self._snapshot, self._trace
+            self._trace = []
+        return replace(snapshot, trace=trace)
+
+    def tick(self, dt: float):
+        """Advances the simulation by dt seconds, in sub-steps of at most 1 / rate. Callers hold lock."""
+        if self.drawer is None:
+            self.__substeps(dt, self.simulator.update)
+            return
+        if self.drawer.has_finished():
+            return
+        if self.adaptive:
+            remaining = dt
+            while remaining > 1e-9 and not self.drawer.has_finished():
+                step = self.drawer.step(remaining)
+                remaining -= step
+                self.time += step
+                self.steps += 1
+                self.__record_trace()
+        else:
+            self.__substeps(dt, self.drawer.update)
+
+    def _run(self):
+        period = 1 / self.rate
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            next_tick += period
+            with self.lock:
+                if not self.paused:
+                    self.tick(period * self.speed)
+                self._snapshot = self._make_snapshot()
+
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                self.overruns += 1
+                next_tick = time.perf_counter()
+
+    def __substeps(self, dt: float, update):
+        n = max(1, m.ceil(dt * self.rate - 1e-9))
+        for _ in range(n):
+            update(dt / n)
+            self.time += dt / n
+            self.steps += 1
+            self.__record_trace()
+
+    def __record_trace(self):
+        if self.drawer is None:
+            return
+        if self.drawer.is_drawing():
+            self._trace.append(self.simulator.get_vertices()[1])
+            self._pen_down = True
+        elif self._pen_down:
+            self._trace.append(None)
+            self._pen_down = False
+
+    def _make_snapshot(self) -> Snapshot:
+        drawer = self.drawer
+        return Snapshot(
+            time=self.time,
+            steps=self.steps,
+            vertices=self.simulator.get_vertices(),
+            target=self.simulator.target,
+            is_drawing=drawer is not None and drawer.is_drawing(),
+            has_finished=drawer is not None and drawer.has_finished(),
+        )
@@ -0,0 +1,147 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from functools import lru_cache
+from pathlib import Path
+
+from .utils import load_segment_img
+from .headless import simulate_drawing
+
+SIMULATION_PARAMS = ("eps", "max_w1", "max_w2", "dt", "planned", "controller", "inverse")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+EXTRACTOR_DIR = str(Path(__file__).resolve().parents[1] / "segment_extractor")
+
+
+def _extractor_pipeline():
+    """Imported lazily, the pipeline pulls in OpenCV and scipy. The extractor modules import each other as top-level
+    modules (the way Streamlit and its CLI run them), so their directory is appended to sys.path, after everything
+    else, when an image is swept."""
+    if EXTRACTOR_DIR not in sys.path:
+        sys.path.append(EXTRACTOR_DIR)
+    import pipeline
+    return pipeline
+
+
+def extraction_param_names() -> tuple[str, ...]:
+    """Sweepable extractor parameters. The RDP eps is exposed as rdp_eps to not clash with the simulator eps."""
+    names = [f.name for f in fields(_extractor_pipeline().ExtractionParams)]
+    return tuple("rdp_eps" if n == "eps" else n for n in names)
+
+
+@lru_cache(maxsize=8)
+def _extract(path: str, extraction: tuple) -> list:
+    """Extraction is cached per worker process, so simulation-only combinations reuse it."""
+    pipeline = _extractor_pipeline()
+    from io_img import load_img
+
+    params = pipeline.ExtractionParams(**{("eps" if k == "rdp_eps" else k): v for k, v in extraction})
+    return pipeline.extract_segments(load_img(path), params).to_json()
+
+
+def run_case(path: str, params: dict) -> dict:
+    """Runs one combination. Never raises: failures are reported in the error column."""
+    row = dict(params)
+    start = time.perf_counter()
+    try:
+        extraction = tuple(sorted((k, v) for k, v in params.items() if k not in SIMULATION_PARAMS))
+        if Path(path).suffix.lower() in IMAGE_SUFFIXES:
+            segments = _extract(path, extraction)
+        elif extraction:
+            raise ValueError(f"Extraction parameters need an image input: {dict(extraction)}")
+        else:
+            segments = load_segment_img(path)
+
+        simulation = {k: v for k, v in params.items() if k in SIMULATION_PARAMS}
+        result = simulate_drawing(segments, **simulation)
+        row.update(
+            segments=len(segments),
+            points=sum(len(s) for s in segments),
+            drawing_time=result.total_time,
+            pen_up_time=result.pen_up_time,
+            path_length=result.pen_down_distance + result.pen_up_distance,
+            pen_up_distance=result.pen_up_distance,
+            tracking_error_mean=result.tracking_error_mean,
+            tracking_error_max=result.tracking_error_max,
+            finished=result.finished,
+            error="",
+        )
+    except Exception as e:
+        row["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    row["wall_time"] = time.perf_counter() - start
+    return row
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict]:
+    """Cartesian product of a {name: [values]} grid."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def run_sweep(path: str, grid: dict[str, list], workers: int = None) -> list[dict]:
+    """Simulates every combination of grid on a process pool. Returns one row per combination, in grid order."""
+    valid = SIMULATION_PARAMS + extraction_param_names()
+    unknown = set(grid) - set(valid)
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)}, expected some of {valid}")
+
+    cases = expand_grid(grid)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(run_case, [path] * len(cases), cases))
+
+
+def write_table(rows: list[dict], path: str):
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _parse_value(value: str):
+    if value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_grid(specs: list[str]) -> dict[str, list]:
+    """Parses ["eps=1,2", "max_w1=3,6"] into a grid."""
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if not values:
+            raise ValueError(f"Expected name=v1,v2,... got {spec!r}")
+        grid[name.strip()] = [_parse_value(v.strip()) for v in values.split(",")]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep of headless SCARA drawings on a process pool")
+    parser.add_argument("input", help="segments JSON file, or an image to run the extractor on")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help=f"parameter values to sweep. Simulator: {', '.join(SIMULATION_PARAMS)}. "
+                             "Extractor (image input): threshold_1, threshold_2, distance_threshold, chaining, rdp_eps, normalize, optimize")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="sweep.csv", help="CSV results table")
+    args = parser.parse_args()
+
+    rows = run_sweep(args.input, parse_grid(args.grid), workers=args.workers)
+    write_table(rows, args.out)
+    failed = sum(1 for r in rows if r["error"])
+    print(f"{len(rows)} runs ({failed} failed) written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
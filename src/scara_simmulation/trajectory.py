@@ -0,0 +1,167 @@
+import math as m
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.scara_kinematics.scara_kinematics import ScaraKinematics
+from .constants import MAX_W1, MAX_W2, MAX_ALPHA1, MAX_ALPHA2
+
+
+@dataclass
+class JointTrajectory:
+    """Joint-space setpoint stream sampled every dt seconds.
+
+    q holds unwrapped (q1, q2) angles. piece[k] indexes the commanded Cartesian line piece (pieces[piece[k]] is its
+    (start, end)) while the pen is down, and is -1 during pen-up moves.
+    """
+    t: np.ndarray
+    q: np.ndarray
+    pen_down: np.ndarray
+    piece: np.ndarray
+    pieces: np.ndarray
+
+    @property
+    def duration(self) -> float:
+        return float(self.t[-1]) if len(self.t) else 0.0
+
+    def sample(self, time: float) -> tuple[np.ndarray, bool, int]:
+        """Setpoint at a given time: linear interpolation of q, pen state and piece of the preceding sample."""
+        k = int(np.searchsorted(self.t, time, side="right")) - 1
+        if k < 0:
+            return self.q[0], bool(self.pen_down[0]), int(self.piece[0])
+        if k >= len(self.t) - 1:
+            return self.q[-1], bool(self.pen_down[-1]), int(self.piece[-1])
+        alpha = (time - self.t[k]) / (self.t[k + 1] - self.t[k])
+        q = self.q[k] + alpha * (self.q[k + 1] - self.q[k])
+        return q, bool(self.pen_down[k]), int(self.piece[k])
+
+
+def _densify(points: np.ndarray, resolution: float) -> tuple[np.ndarray, np.ndarray]:
+    """Splits every piece of a polyline so no step is longer than resolution. Returns the points and, for every
+    step, the index of the original piece it belongs to."""
+    steps = np.maximum(np.ceil(np.hypot(*np.diff(points, axis=0).T) / resolution).astype(int), 1)
+    owner = np.repeat(np.arange(len(steps)), steps)
+    frac = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(steps, steps)
+    dense = points[owner] + frac[:, None] * (points[owner + 1] - points[owner])
+    return np.vstack((dense, points[-1:])), owner
+
+
+def _stroke_profile(q: np.ndarray, max_w: np.ndarray, max_alpha: np.ndarray, blend_time: float):
+    """Time-optimal speed along a joint-space polyline starting and ending at rest.
+
+    Speed is measured along the joint-space path. Each piece k gets a speed cap from the joint velocity limits and an
+    acceleration limit from the joint acceleration limits. At corners the speed is limited so the jump of every joint
+    velocity stays below max_alpha * blend_time, which lets the arm blend through gentle corners at full speed
+    instead of stopping. A forward and a backward pass then make the vertex speeds reachable with the
+    acceleration limits.
+    Returns per piece: length, direction, start/end speed, peak speed, acceleration and duration.
+    """
+    delta = np.diff(q, axis=0)
+    length = np.hypot(delta[:, 0], delta[:, 1])
+    direction = delta / length[:, None]
+    abs_dir = np.maximum(np.abs(direction), 1e-12)
+    v_cap = (max_w / abs_dir).min(axis=1)
+    accel = (max_alpha / abs_dir).min(axis=1)
+
+    v = np.zeros(len(q))
+    if len(length) > 1:
+        jump = np.maximum(np.abs(np.diff(direction, axis=0)), 1e-12)
+        v_corner = (max_alpha * blend_time / jump).min(axis=1)
+        v[1:-1] = np.minimum(np.minimum(v_cap[:-1], v_cap[1:]), v_corner)
+
+    for k in range(len(length)):
+        v[k + 1] = min(v[k + 1], m.sqrt(v[k] ** 2 + 2 * accel[k] * length[k]))
+    for k in range(len(length) - 1, -1, -1):
+        v[k] = min(v[k], m.sqrt(v[k + 1] ** 2 + 2 * accel[k] * length[k]))
+
+    v0, v1 = v[:-1], v[1:]
+    peak = np.minimum(v_cap, np.sqrt((2 * accel * length + v0 ** 2 + v1 ** 2) / 2))
+    peak = np.maximum(peak, np.maximum(v0, v1))
+    d_acc = (peak ** 2 - v0 ** 2) / (2 * accel)
+    d_dec = (peak ** 2 - v1 ** 2) / (2 * accel)
+    d_cruise = np.maximum(length - d_acc - d_dec, 0)
+    duration = (peak - v0) / accel + (peak - v1) / accel + d_cruise / peak
+    return length, direction, v0, v1, peak, accel, duration
+
+
+def _sample_profile(tau: np.ndarray, v0, v1, peak, accel, length) -> np.ndarray:
+    """Distance travelled tau seconds into trapezoidal pieces (all arrays broadcast per sample)."""
+    t_acc = (peak - v0) / accel
+    d_acc = (peak ** 2 - v0 ** 2) / (2 * accel)
+    d_cruise = np.maximum(length - d_acc - (peak ** 2 - v1 ** 2) / (2 * accel), 0)
+    t_cruise = d_cruise / peak
+
+    tau_dec = np.maximum(tau - t_acc - t_cruise, 0)
+    s = np.where(
+        tau < t_acc,
+        v0 * tau + accel * tau ** 2 / 2,
+        np.where(
+            tau < t_acc + t_cruise,
+            d_acc + peak * (tau - t_acc),
+            d_acc + d_cruise + peak * tau_dec - accel * tau_dec ** 2 / 2,
+        ),
+    )
+    return np.clip(s, 0, length)
+
+
+def plan_trajectory(segments: list[list[list[float, float]]], length_1: float, length_2: float,
+                    center: tuple[float, float], q_start: tuple[float, float] = (0.0, m.pi / 2),
+                    max_w: tuple[float, float] = (MAX_W1, MAX_W2), max_alpha: tuple[float, float] = (MAX_ALPHA1, MAX_ALPHA2),
+                    blend_time: float = 0.05, resolution: float = 2.0, dt: float = 0.001) -> JointTrajectory:
+    """Plans a time-parameterized joint trajectory that draws segments (screen coordinates) in order.
+
+    Pen-down strokes are densified to resolution pixels, converted with closed-form IK (keeping the elbow branch
+    continuous) and time-parameterized under per-joint velocity and acceleration limits, blending through corners.
+    Pen-up moves are straight joint-space moves. The arm is at rest whenever the pen changes state.
+    """
+    kinematics = ScaraKinematics(length_1, length_2, np.zeros(3), q_dot_max=np.array([max_w[0], max_w[1], np.inf]))
+    max_w = np.asarray(max_w, dtype=float)
+    max_alpha = np.asarray(max_alpha, dtype=float)
+    center = np.asarray(center, dtype=float)
+
+    q_prev = np.array([q_start[0], q_start[1], 0.0])
+    pieces, strokes = [], []
+    for segment in segments:
+        points = np.asarray(segment, dtype=float).reshape(-1, 2)
+        points = points[np.r_[True, (np.diff(points, axis=0) != 0).any(axis=1)]]
+        dense, owner = _densify(points, resolution) if len(points) > 1 else (points, np.zeros(0, dtype=int))
+        p = np.column_stack((dense - center, np.zeros(len(dense))))
+        q, reachable = kinematics.get_q_path(p, q_start=q_prev)
+        if not reachable.all():
+            raise ValueError(f"{np.count_nonzero(~reachable)} points are out of reach")
+
+        strokes.append((np.vstack((q_prev[:2], q[0, :2])), False, np.full(1, -1)))
+        if len(q) > 1:
+            strokes.append((q[:, :2], True, owner + len(pieces)))
+            pieces.extend(np.stack((points[:-1], points[1:]), axis=1))
+        q_prev = q[-1]
+
+    # Time-parameterize every stroke and concatenate the pieces
+    piece_data = []
+    for q, pen, owner in strokes:
+        keep = np.r_[True, np.hypot(*np.diff(q, axis=0).T) > 1e-12]
+        if keep.sum() < 2:
+            continue
+        owner = owner[keep[1:]]
+        q = q[keep]
+        profile = _stroke_profile(q, max_w, max_alpha, blend_time)
+        piece_data.append((q[:-1], np.full(len(q) - 1, pen), owner, *profile))
+
+    if not piece_data:
+        q = q_prev[None, :2]
+        return JointTrajectory(np.zeros(1), q, np.zeros(1, dtype=bool), np.full(1, -1), np.reshape(pieces, (-1, 2, 2)))
+
+    start_q, pen, owner, length, direction, v0, v1, peak, accel, duration = (np.concatenate(x) for x in zip(*piece_data))
+    ends = np.cumsum(duration)
+    starts = ends - duration
+
+    t = np.arange(0, ends[-1], dt)
+    k = np.minimum(np.searchsorted(ends, t, side="right"), len(ends) - 1)
+    s = _sample_profile(t - starts[k], v0[k], v1[k], peak[k], accel[k], length[k])
+    samples_q = start_q[k] + s[:, None] * direction[k]
+
+    t = np.append(t, ends[-1])
+    samples_q = np.vstack((samples_q, start_q[-1] + length[-1] * direction[-1]))
+    k = np.append(k, len(ends) - 1)
+    piece = np.where(pen[k], owner[k], -1)
+    return JointTrajectory(t, samples_q, pen[k], piece, np.reshape(pieces, (-1, 2, 2)))
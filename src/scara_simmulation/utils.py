@@ -1,7 +1,17 @@
 import json
+import math as m
+
+import numpy as np
+
+from src.common.binary_format import is_binary_segment_file, iter_segments
+from src.common.instrumentation import instrumented, count
 from .models import ScaraSimulator
+from .trajectory import JointTrajectory
 
 def load_segment_img(fname: str) -> list[list[list[float, float]]]:
+    """Loads a JSON segment file, or memory-maps a binary one (segments are then (k, 2) arrays)"""
+    if is_binary_segment_file(fname):
+        return iter_segments(fname)
     with open(fname, 'r') as f:
         segments = json.load(f)
     return segments
@@ -10,11 +20,11 @@ def normalize_segments(segments: list[list[list[float, float]]], x_min: float, x
     """
     Moves a segment image into rectangle
     """
-    all_x = [p[0] for seg in segments for p in seg]
-    all_y = [p[1] for seg in segments for p in seg]
+    lengths = [len(seg) for seg in segments]
+    coords = np.concatenate([np.asarray(seg, dtype=float).reshape(-1, 2) for seg in segments])
 
-    orig_min_x, orig_max_x = min(all_x), max(all_x)
-    orig_min_y, orig_max_y = min(all_y), max(all_y)
+    orig_min_x, orig_min_y = coords.min(axis=0)
+    orig_max_x, orig_max_y = coords.max(axis=0)
 
     orig_width  = orig_max_x - orig_min_x
     orig_height = orig_max_y - orig_min_y
@@ -33,16 +43,19 @@ def normalize_segments(segments: list[list[list[float, float]]], x_min: float, x
         offset_x = x_min + (dest_width - orig_width * scale) / 2
         offset_y = y_min
 
-    normalized = []
-    for seg in segments:
-        new_seg = []
-        for x, y in seg:
-            nx = (x - orig_min_x) * scale + offset_x
-            ny = (y - orig_min_y) * scale + offset_y
-            new_seg.append([nx, ny])
-        normalized.append(new_seg)
+    normalized = (coords - [orig_min_x, orig_min_y]) * scale + [offset_x, offset_y]
+    return [seg.tolist() for seg in np.split(normalized, np.cumsum(lengths)[:-1])]
 
-    return normalized
+def fit_segments_to_workspace(segments: list[list[list[float, float]]], center: tuple[float, float], max_r: float) -> list[list[list[float, float]]]:
+    """
+    Moves a segment image into the square inscribed in the reachable circle
+    """
+    circunscribed_square = max_r / m.sqrt(2)
+    x_min = center[0] - circunscribed_square
+    x_max = center[0] + circunscribed_square
+    y_min = center[1] - circunscribed_square
+    y_max = center[1] + circunscribed_square
+    return normalize_segments(segments, x_min, x_max, y_min, y_max)
 
 class Drawer:
     def __init__(self, simulator: ScaraSimulator, segments: list[list[list[float, float]]], eps: float = 1.):
@@ -55,15 +68,14 @@ class Drawer:
         self.current_segment = 0
         self.current_point = 0
 
-        point = self.segments[self.current_segment][self.current_point]
-        self.simulator.set_target(point)
-
         self.eps = eps
+        self._set_target()
 
     def _set_next_target(self):
         if self._has_finished:
             return
         
+        count("Drawer.targets")
         self.current_point += 1
         if self.current_point == len(self.segments[self.current_segment]):
             self._is_drawing = False
@@ -76,14 +88,27 @@ class Drawer:
             self._has_finished = True
             return
         
-        point = self.segments[self.current_segment][self.current_point]
-        self.simulator.set_target(point)
+        self._set_target()
+
+    def _set_target(self):
+        """Targets the current point. The next point of the same segment is passed along, the pen lifts after the last one."""
+        points = self.segments[self.current_segment]
+        next_point = points[self.current_point + 1] if self.current_point + 1 < len(points) else None
+        self.simulator.set_target(points[self.current_point], next_point)
 
+    @instrumented("Drawer.update")
     def update(self, dt: float = 0.016):
         self.simulator.update(dt)
         if self.simulator.target_is_achieved(self.eps):
             self._set_next_target()
 
+    def step(self, max_dt: float) -> float:
+        """Adaptive update (see ScaraSimulator.step_to_target). Returns the simulated time taken."""
+        dt = self.simulator.step_to_target(max_dt, self.eps)
+        if self.simulator.target_is_achieved(self.eps):
+            self._set_next_target()
+        return dt
+
     def get_vertices(self) -> tuple[tuple[float, float], tuple[float, float]]:
         return self.simulator.get_vertices()
     
@@ -92,3 +117,55 @@ class Drawer:
     
     def is_drawing(self) -> bool:
         return self._is_drawing
+
+    def current_piece(self) -> tuple[list[float], list[float]] | None:
+        """Commanded line piece being drawn, if any."""
+        if not self._is_drawing:
+            return None
+        points = self.segments[self.current_segment]
+        return points[self.current_point - 1], points[self.current_point]
+
+class TrajectoryDrawer:
+    """Replays a planned JointTrajectory on a simulator arm. Same interface as Drawer."""
+    def __init__(self, simulator: ScaraSimulator, trajectory: JointTrajectory):
+        self.simulator = simulator
+        self.trajectory = trajectory
+        self.time = 0.0
+        self._is_drawing = False
+        self._piece = -1
+
+        self.simulator.set_target(None)
+        self._apply(0.0)
+
+    def _apply(self, time: float):
+        q, self._is_drawing, self._piece = self.trajectory.sample(time)
+        self.simulator.reset(q[0] % (2 * m.pi), q[1] % (2 * m.pi))
+
+    @instrumented("TrajectoryDrawer.update")
+    def update(self, dt: float = 0.016):
+        if self.has_finished():
+            return
+        self.time = min(self.time + dt, self.trajectory.duration)
+        self._apply(self.time)
+
+    def step(self, max_dt: float) -> float:
+        """Same as update(max_dt): the trajectory is sampled exactly, whatever the step. Returns the time taken."""
+        dt = min(max_dt, self.trajectory.duration - self.time)
+        self.update(dt)
+        return dt
+
+    def get_vertices(self) -> tuple[tuple[float, float], tuple[float, float]]:
+        return self.simulator.get_vertices()
+
+    def has_finished(self) -> bool:
+        return self.time >= self.trajectory.duration
+
+    def is_drawing(self) -> bool:
+        return self._is_drawing and not self.has_finished()
+
+    def current_piece(self) -> tuple[list[float], list[float]] | None:
+        """Commanded line piece being drawn, if any."""
+        if not self.is_drawing() or self._piece < 0:
+            return None
+        a, b = self.trajectory.pieces[self._piece]
+        return a, b
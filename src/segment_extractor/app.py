@@ -1,13 +1,32 @@
+import os
 import tempfile
 import json
 from pathlib import Path
 
+import numpy as np
 import streamlit as st
 
+from src.common import instrumentation
 from io_img import load_img
-from processing import get_border_points, points_to_segments, simplify_segments
-from visualization import plot_points, plot_segments
+from processing import CHAINING_METHODS, get_edges, chain_edges, simplify_segments, normalize_segments
+from visualization import plot_segments
 from sorting import sort_segments
+from local_search import optimize_tour
+from cache import StageCache, hash_image
+
+
+@st.cache_resource
+def get_stage_cache() -> StageCache:
+    """One cache per server. Set SEGMENT_CACHE_DIR to also keep results on disk."""
+    return StageCache(max_entries=64, disk_dir=os.environ.get("SEGMENT_CACHE_DIR"))
+
+
+def stage_caption(*stages: str):
+    """Time spent in the given instrumented stages during this run, or a note that they came from the cache."""
+    recorded = instrumentation.report()["stages"]
+    parts = [f"{s}: {recorded[s]['seconds'] * 1000:.1f} ms" for s in stages if s in recorded]
+    st.caption(", ".join(parts) if parts else "cached")
+
 
 st.set_page_config(page_title="Segment Generator", layout="wide")
 st.title("Segment Generator for SCARA drawing")
@@ -19,6 +38,8 @@ if uploaded_file:
     tmp_path.write_bytes(uploaded_file.read())
 
     img = load_img(tmp_path)
+    image_hash = hash_image(img)
+    cache = get_stage_cache()
     st.image(img, caption="Original Image", width="stretch")
 
     st.divider()
@@ -29,30 +50,64 @@ if uploaded_file:
 
     st.subheader("Ramer-Douglas-Peucker Simplification Parameters")
     dist_threshold = st.slider("Radius of consideration between points", 1, 20, 5)
+    chaining_method = st.selectbox("Chaining method", CHAINING_METHODS, index=CHAINING_METHODS.index("raster"))
     eps = st.slider("ε RDP Parameter", 0.1, 10.0, 2.0)
     normalize_json = st.checkbox("Normalize points in JSON (0-1 range)", value=True)
 
+    st.subheader("Path Ordering Parameters")
+    optimize_path = st.checkbox("Optimize pen-up travel (2-opt / Or-opt, may reverse segments)", value=False)
+    optimize_time = st.slider("Optimization time budget (s)", 0.1, 30.0, 2.0)
+    capture_profile = st.checkbox("Capture a profile of the run", value=False)
+
     if st.button("Process Image"):
+        instrumentation.reset()
+        instrumentation.enable(profile=capture_profile)
+
         st.subheader("Extracted Border")
-        border_points = get_border_points(img, t1, t2)
-        st.write(f"{len(border_points)} points")
-        fig_points = plot_points(border_points, (10, 10))
-        st.pyplot(fig_points)
+        border_key = (image_hash, t1, t2)
+        edges = cache.get_or_compute("edges", border_key, lambda: get_edges(img, t1, t2))
+        st.write(f"{np.count_nonzero(edges)} points")
+        stage_caption("processing.get_edges")
+        st.image(255 - edges, caption="Canny edges", width="stretch")
 
         st.subheader("Extracted Segments")
-        segments = points_to_segments(border_points, distance_threshold=dist_threshold)
+        segments_key = border_key + (dist_threshold, chaining_method)
+        segments = cache.get_or_compute("segments", segments_key, lambda: chain_edges(
+            edges, distance_threshold=dist_threshold, method=chaining_method))
         st.write(f"{len(segments)} segments")
+        stage_caption("processing.edges_to_segments", "processing.points_to_segments")
         fig = plot_segments(segments, (10, 10))
         st.pyplot(fig)
 
-        simple_segments = simplify_segments(segments, eps=eps, normalize=normalize_json)
-        st.write(f"{sum(len(s) for s in simple_segments)} simplified points")
+        simplified_key = segments_key + (eps,)
+        simple_segments = cache.get_or_compute("simplified", simplified_key, lambda: simplify_segments(segments, eps=eps))
+        if normalize_json:
+            simple_segments = cache.get_or_compute("normalized", simplified_key, lambda: normalize_segments(simple_segments))
+        st.write(f"{simple_segments.n_points} simplified points")
         st.write(f"{len(simple_segments)} simplified segments")
+        stage_caption("processing.simplify_segments", "processing.normalize_segments")
         fig = plot_segments(simple_segments, (10, 10))
         st.pyplot(fig)
 
-        sorted_segments = sort_segments(simple_segments)
-        json_obj = [s.to_json() for s in sorted_segments]
+        sorted_key = simplified_key + (normalize_json,)
+        sorted_segments = cache.get_or_compute("sorted", sorted_key, lambda: sort_segments(simple_segments))
+        if optimize_path:
+            result = cache.get_or_compute("optimized", sorted_key + (optimize_time,),
+                                          lambda: optimize_tour(sorted_segments, time_limit=optimize_time))
+            sorted_segments = result.apply(sorted_segments)
+            st.write(f"Pen-up travel: {result.pen_up_before:.2f} → {result.pen_up_after:.2f} "
+                     f"({result.moves} moves in {result.iterations} passes)")
+        stage_caption("sorting.sort_segments", "local_search.optimize_tour")
+        st.caption(f"Stage cache: {cache.hits} hits, {cache.disk_hits} disk hits, {cache.misses} misses")
+
+        instrumentation.disable()
+        run_report = instrumentation.report()
+        with st.expander(f"Stage timings ({run_report['wall_seconds']:.2f} s total)"):
+            st.table([{"stage": name, **stats} for name, stats in run_report["stages"].items()])
+            if run_report["profile"]:
+                st.code(run_report["profile"])
+
+        json_obj = sorted_segments.to_json()
         json_data = json.dumps(json_obj)
 
         st.download_button(
@@ -0,0 +1,82 @@
+import hashlib
+import pickle
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+
+def hash_image(img: np.ndarray) -> str:
+    """Content hash of an image (pixels and shape)."""
+    h = hashlib.sha256(str((img.shape, img.dtype.str)).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+class StageCache:
+    """Results of pipeline stages keyed by image hash plus the parameters the stage (and its inputs) depend on.
+
+    The in-memory tier keeps the max_entries most recently used results. With disk_dir, results are also pickled
+    there and reloaded on a memory miss, so they survive restarts.
+    """
+    def __init__(self, max_entries: int = 32, disk_dir: str | Path = None):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir is not None else None
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(stage: str, key: tuple) -> str:
+        return hashlib.sha256(repr((stage, key)).encode()).hexdigest()
+
+    def get_or_compute(self, stage: str, key: tuple, compute: Callable[[], Any]) -> Any:
+        """Returns the cached result of stage for key, computing (and storing) it on a miss."""
+        digest = self.make_key(stage, key)
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return self._entries[digest]
+
+        value = self._load(digest)
+        if value is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            value = compute()
+            self._store(digest, value)
+
+        self._entries[digest] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def _path(self, digest: str) -> Path:
+        return self.disk_dir / f"{digest}.pkl"
+
+    def _load(self, digest: str) -> Any:
+        if self.disk_dir is None or not self._path(digest).exists():
+            return None
+        try:
+            with open(self._path(digest), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _store(self, digest: str, value: Any):
+        if self.disk_dir is None:
+            return
+        tmp = self._path(digest).with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(self._path(digest))
+
+    def __len__(self) -> int:
+        return len(self._entries)
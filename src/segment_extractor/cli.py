@@ -0,0 +1,126 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from pathlib import Path
+
+from src.common.binary_format import SUFFIX as BINARY_SUFFIX
+from io_img import load_img, save_segment_image, save_segment_stream
+from pipeline import ExtractionParams, extract_segments
+from processing import CHAINING_METHODS
+from streaming import open_image
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".npy")
+
+
+def output_paths(image: Path, out_dir: Path, suffix: str = ".json") -> tuple[Path, Path]:
+    """Segments file and its metadata sidecar for an image."""
+    return out_dir / f"{image.stem}{suffix}", out_dir / f"{image.stem}.meta.json"
+
+
+def is_up_to_date(image: Path, out_dir: Path, params: ExtractionParams, suffix: str = ".json") -> bool:
+    """Outputs exist, are newer than the image and were produced with the same parameters."""
+    segments_path, meta_path = output_paths(image, out_dir, suffix)
+    if not (segments_path.exists() and meta_path.exists()):
+        return False
+    if segments_path.stat().st_mtime < image.stat().st_mtime:
+        return False
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return False
+    return meta.get("params") == asdict(params)
+
+
+def process_image(image: Path, out_dir: Path, params: ExtractionParams, suffix: str = ".json") -> dict:
+    """Extracts one image. Never raises: failures are reported in the returned record."""
+    record = {"image": str(image), "ok": False}
+    start = time.perf_counter()
+    try:
+        img = open_image(str(image)) if params.tile_size else load_img(str(image))
+        segments = extract_segments(img, params)
+        segments_path, meta_path = output_paths(image, out_dir, suffix)
+        if params.tile_size:
+            save_segment_stream(segments, str(segments_path))
+        else:
+            save_segment_image(segments, str(segments_path))
+        record.update(ok=True, segments=len(segments), points=segments.n_points)
+        record["seconds"] = time.perf_counter() - start
+        meta_path.write_text(json.dumps({"params": asdict(params), **record}))
+    except Exception as e:
+        record["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+        record["seconds"] = time.perf_counter() - start
+    return record
+
+
+def collect_images(patterns: list[str]) -> list[Path]:
+    images = []
+    for pattern in patterns:
+        matches = glob.glob(pattern, recursive=True) or ([pattern] if Path(pattern).exists() else [])
+        images.extend(Path(m) for m in sorted(matches) if Path(m).suffix.lower() in IMAGE_SUFFIXES)
+    return list(dict.fromkeys(images))
+
+
+def main() -> int:
+    defaults = ExtractionParams()
+    parser = argparse.ArgumentParser(description="Extract SCARA segments from many images in parallel")
+    parser.add_argument("inputs", nargs="+", help="image files or glob patterns (quote them, ** is supported)")
+    parser.add_argument("-o", "--out-dir", required=True, help="output directory for <name>.json (or .segb) files")
+    parser.add_argument("--threshold-1", type=float, default=defaults.threshold_1, help="Canny threshold 1")
+    parser.add_argument("--threshold-2", type=float, default=defaults.threshold_2, help="Canny threshold 2")
+    parser.add_argument("--distance-threshold", type=float, default=defaults.distance_threshold,
+                        help="radius of consideration between points")
+    parser.add_argument("--chaining", choices=CHAINING_METHODS, default=defaults.chaining)
+    parser.add_argument("--eps", type=float, default=defaults.eps, help="RDP epsilon")
+    parser.add_argument("--no-normalize", action="store_true", help="keep pixel coordinates")
+    parser.add_argument("--optimize", action="store_true", help="2-opt / Or-opt pen-up optimization")
+    parser.add_argument("--streaming", action="store_true",
+                        help="tiled extraction with bounded memory, for very large scans (raster chaining)")
+    parser.add_argument("--tile-size", type=int, default=1024, help="tile size of --streaming (px)")
+    parser.add_argument("--binary", action="store_true", help=f"write the binary {BINARY_SUFFIX} format instead of JSON")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="reprocess images with up to date outputs")
+    args = parser.parse_args()
+
+    params = ExtractionParams(
+        threshold_1=args.threshold_1, threshold_2=args.threshold_2,
+        distance_threshold=args.distance_threshold, chaining=args.chaining,
+        eps=args.eps, normalize=not args.no_normalize, optimize=args.optimize,
+        tile_size=args.tile_size if args.streaming else 0,
+    )
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    images = collect_images(args.inputs)
+    stems = [i.stem for i in images]
+    duplicated = {s for s in stems if stems.count(s) > 1}
+    if duplicated:
+        print(f"Images with the same name would overwrite each other: {sorted(duplicated)}", file=sys.stderr)
+        return 2
+
+    suffix = BINARY_SUFFIX if args.binary else ".json"
+    todo = [i for i in images if args.force or not is_up_to_date(i, out_dir, params, suffix)]
+    print(f"{len(images)} images, {len(images) - len(todo)} up to date, {len(todo)} to process")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers or os.cpu_count()) as pool:
+        futures = [pool.submit(process_image, image, out_dir, params, suffix) for image in todo]
+        for future in as_completed(futures):
+            record = future.result()
+            if record["ok"]:
+                print(f"ok    {record['seconds']:7.2f}s  {record['image']}  ({record['segments']} segments, {record['points']} points)")
+            else:
+                failed += 1
+                print(f"FAIL  {record['seconds']:7.2f}s  {record['image']}  {record['error']}", file=sys.stderr)
+
+    print(f"{len(todo) - failed} processed, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
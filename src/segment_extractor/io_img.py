@@ -1,9 +1,11 @@
 import json
+from typing import Iterable
 
 import cv2
 import numpy as np
 
-from models import Point, Segment
+from src.common.binary_format import SUFFIX as BINARY_SUFFIX, SegmentWriter, is_binary_segment_file, read_segments
+from models import Point, Segment, SegmentArray
 
 
 def load_img(path: str) -> np.ndarray:
@@ -13,17 +15,31 @@ def load_img(path: str) -> np.ndarray:
     return img
 
 
-def save_segment_image(segments: list[Segment], path: str):
-    for s in segments:
-        if not isinstance(s, Segment):
-            raise ValueError("Expected segment class")
+def save_segment_image(segments: list[Segment] | SegmentArray, path: str):
+    """Saves segments as JSON, or in the binary format when path ends with .segb"""
+    if str(path).endswith(BINARY_SUFFIX):
+        if not isinstance(segments, SegmentArray):
+            segments = SegmentArray.from_segments(segments, np.float64)
+        with SegmentWriter(path, segments.dtype) as writer:
+            writer.write_all(segments.coords, segments.offsets)
+        return
+
+    if isinstance(segments, SegmentArray):
+        json_obj = segments.to_json()
+    else:
+        for s in segments:
+            if not isinstance(s, Segment):
+                raise ValueError("Expected segment class")
+        json_obj = [s.to_json() for s in segments]
 
-    json_obj = [s.to_json() for s in segments]
     with open(path, "w") as f:
         json.dump(json_obj, f)
 
 
 def load_segment_image(path: str) -> list[Segment]:
+    if is_binary_segment_file(path):
+        return load_segment_array(path).to_segments()
+
     with open(path, "r") as f:
         json_obj = json.load(f)
 
@@ -33,3 +49,35 @@ def load_segment_image(path: str) -> list[Segment]:
         segments.append(Segment(points))
 
     return segments
+
+
+def load_segment_array(path: str, dtype=np.float64) -> SegmentArray:
+    """Loads segments from JSON, or memory-maps a binary file (keeping its float precision)."""
+    if is_binary_segment_file(path):
+        coords, offsets = read_segments(path)
+        return SegmentArray(coords, offsets, dtype=coords.dtype)
+
+    with open(path, "r") as f:
+        json_obj = json.load(f)
+    return SegmentArray.from_json(json_obj, dtype=dtype)
+
+
+def save_segment_stream(segments: Iterable[np.ndarray], path: str) -> int:
+    """Writes segments (JSON, or binary for .segb) one at a time, without holding them all in memory. Returns the count."""
+    count = 0
+    if str(path).endswith(BINARY_SUFFIX):
+        with SegmentWriter(path, np.float64) as writer:
+            for s in segments:
+                writer.write(s)
+                count += 1
+        return count
+
+    with open(path, "w") as f:
+        f.write("[")
+        for s in segments:
+            if count:
+                f.write(", ")
+            json.dump(np.asarray(s, dtype=np.float64).tolist(), f)
+            count += 1
+        f.write("]")
+    return count
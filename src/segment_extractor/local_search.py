@@ -0,0 +1,192 @@
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from src.common.instrumentation import instrumented
+from models import Segment, SegmentArray
+
+
+@dataclass(frozen=True)
+class TourOptimization:
+    """Result of optimize_tour. reversed[k] tells whether the segment at path[k] is drawn backwards."""
+    path: list[int]
+    reversed: list[bool]
+    pen_up_before: float
+    pen_up_after: float
+    iterations: int
+    moves: int
+
+    def apply(self, segments: list[Segment] | SegmentArray) -> list[Segment] | SegmentArray:
+        return apply_tour(segments, self.path, self.reversed)
+
+
+def _endpoints(segments: list[Segment] | SegmentArray) -> tuple[np.ndarray, np.ndarray]:
+    if isinstance(segments, SegmentArray):
+        return segments.firsts().astype(np.float64), segments.lasts().astype(np.float64)
+    firsts = np.reshape([(s.first().x, s.first().y) for s in segments], (-1, 2))
+    lasts = np.reshape([(s.last().x, s.last().y) for s in segments], (-1, 2))
+    return firsts, lasts
+
+
+def pen_up_distance(segments: list[Segment] | SegmentArray) -> float:
+    """Total travel between the end of each segment and the start of the next one."""
+    if len(segments) < 2:
+        return 0.0
+    firsts, lasts = _endpoints(segments)
+    return float(np.hypot(*(firsts[1:] - lasts[:-1]).T).sum())
+
+
+def apply_tour(segments: list[Segment] | SegmentArray, path: list[int], reversed_: list[bool]) -> list[Segment] | SegmentArray:
+    """Reorders segments following path, reversing the ones flagged."""
+    if isinstance(segments, SegmentArray):
+        return segments.take(path, reverse=reversed_)
+    return [Segment(segments[i].points[::-1]) if r else segments[i] for i, r in zip(path, reversed_)]
+
+
+def _neighbour_lists(firsts: np.ndarray, lasts: np.ndarray, n_neighbours: int) -> list[list[int]]:
+    """For every segment, the segments owning one of the endpoints closest to any of its own endpoints."""
+    n = len(firsts)
+    endpoints = np.concatenate((firsts, lasts))
+    k = min(n_neighbours + 2, len(endpoints))
+    _, idx = KDTree(endpoints).query(endpoints, k=k)
+    owners = np.reshape(idx, (len(endpoints), -1)) % n
+    neighbours = []
+    for s in range(n):
+        candidates = dict.fromkeys(owners[s].tolist() + owners[s + n].tolist())
+        candidates.pop(s, None)
+        neighbours.append(list(candidates))
+    return neighbours
+
+
+@instrumented("local_search.optimize_tour")
+def optimize_tour(segments: list[Segment] | SegmentArray, path: list[int] = None, time_limit: float = 1.0,
+                  max_iterations: int = 50, n_neighbours: int = 8, max_chain: int = 3) -> TourOptimization:
+    """Local search over an ordered set of segments to reduce pen-up travel.
+
+    Starts from path (identity by default, e.g. the output of sort_segments) and applies improving 2-opt moves
+    (reversing a block of the tour, which also flips the drawing direction of its segments) and Or-opt moves (moving a
+    chain of up to max_chain segments elsewhere, optionally reversed). Candidate moves only consider segments in the
+    n_neighbours lists. Stops when a full pass finds no improvement, after max_iterations passes or after time_limit
+    seconds (setup included).
+    """
+    deadline = time.perf_counter() + time_limit
+    n = len(segments)
+    tour = list(range(n)) if path is None else [int(i) for i in path]
+    if n < 2:
+        return TourOptimization(tour, [False] * n, 0.0, 0.0, 0, 0)
+
+    firsts, lasts = _endpoints(segments)
+    # Oriented endpoints per segment id, swapped when a segment is flipped
+    start = [tuple(p) for p in firsts.tolist()]
+    end = [tuple(p) for p in lasts.tolist()]
+    flipped = [False] * n
+    neighbours = _neighbour_lists(firsts, lasts, n_neighbours)
+    pos = [0] * n
+    for k, s in enumerate(tour):
+        pos[s] = k
+
+    def dist(p: tuple[float, float], q: tuple[float, float]) -> float:
+        return math.hypot(p[0] - q[0], p[1] - q[1])
+
+    def link(k: int) -> float:
+        """Pen-up travel from position k to position k + 1."""
+        if k < 0 or k >= n - 1:
+            return 0.0
+        return dist(end[tour[k]], start[tour[k + 1]])
+
+    def flip(s: int):
+        start[s], end[s] = end[s], start[s]
+        flipped[s] = not flipped[s]
+
+    def reverse_block(i: int, j: int):
+        block = tour[i:j + 1][::-1]
+        tour[i:j + 1] = block
+        for k, s in enumerate(block, start=i):
+            pos[s] = k
+            flip(s)
+
+    def try_two_opt(i: int) -> bool:
+        a = tour[i - 1] if i > 0 else None
+        b = tour[i]
+        candidates = neighbours[a] if a is not None else neighbours[b] + [b]
+        for c in candidates:
+            j = pos[c]
+            if j < i:
+                continue
+            d = tour[j + 1] if j < n - 1 else None
+            old = link(i - 1) + link(j)
+            new = 0.0
+            if a is not None:
+                new += dist(end[a], end[c])
+            if d is not None:
+                new += dist(start[b], start[d])
+            if new < old - 1e-9:
+                reverse_block(i, j)
+                return True
+        return False
+
+    def try_or_opt(i: int, length: int) -> bool:
+        if i + length > n:
+            return False
+        chain = tour[i:i + length]
+        first, last = chain[0], chain[-1]
+        p = tour[i - 1] if i > 0 else None
+        q = tour[i + length] if i + length < n else None
+        removed = link(i - 1) + link(i + length - 1)
+        if p is not None and q is not None:
+            removed -= dist(end[p], start[q])
+
+        for c in dict.fromkeys(neighbours[first] + neighbours[last]):
+            j = pos[c]
+            if i - 1 <= j < i + length:
+                continue
+            d = tour[j + 1] if j < n - 1 else None
+            bridge = dist(end[c], start[d]) if d is not None else 0.0
+            forward = dist(end[c], start[first]) + (dist(end[last], start[d]) if d is not None else 0.0) - bridge
+            backward = dist(end[c], end[last]) + (dist(start[first], start[d]) if d is not None else 0.0) - bridge
+            added = min(forward, backward)
+            if added < removed - 1e-9:
+                moved = chain
+                if backward < forward:
+                    moved = chain[::-1]
+                    for s in moved:
+                        flip(s)
+                # Only the segments between the chain and its new place shift, by length positions
+                if j < i:
+                    lo, hi = j + 1, i + length
+                    tour[lo:hi] = moved + tour[lo:i]
+                else:
+                    lo, hi = i, j + 1
+                    tour[lo:hi] = tour[i + length:hi] + moved
+                for k in range(lo, hi):
+                    pos[tour[k]] = k
+                return True
+        return False
+
+    pen_up_before = sum(link(k) for k in range(n - 1))
+    iterations = 0
+    moves = 0
+    improved = True
+    while improved and iterations < max_iterations and time.perf_counter() < deadline:
+        improved = False
+        iterations += 1
+        for i in range(n):
+            if time.perf_counter() >= deadline:
+                break
+            if try_two_opt(i):
+                moves += 1
+                improved = True
+                continue
+            for length in range(1, max_chain + 1):
+                if time.perf_counter() >= deadline:
+                    break
+                if try_or_opt(i, length):
+                    moves += 1
+                    improved = True
+                    break
+
+    pen_up_after = sum(link(k) for k in range(n - 1))
+    return TourOptimization(list(tour), [flipped[s] for s in tour], pen_up_before, pen_up_after, iterations, moves)
@@ -1,5 +1,7 @@
 from dataclasses import dataclass
 
+import numpy as np
+
 
 @dataclass(frozen=True)
 class Point:
@@ -29,8 +31,117 @@ class Segment:
     def to_json(self) -> tuple[tuple[float, float]]:
         return tuple(p.to_json() for p in self.points)
 
+    def to_array(self, dtype=np.float32) -> np.ndarray:
+        return np.array([(p.x, p.y) for p in self.points], dtype=dtype).reshape(-1, 2)
+
     def __len__(self) -> float:
         return len(self.points)
 
     def __iter__(self):
         return iter(self.points)
+
+
+class SegmentArray:
+    """Packed segments: an (N, 2) coordinate buffer plus (M + 1,) offsets. Segment i is coords[offsets[i]:offsets[i+1]]."""
+    def __init__(self, coords: np.ndarray, offsets: np.ndarray, dtype=np.float32):
+        self.coords = np.ascontiguousarray(coords, dtype=dtype).reshape(-1, 2)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        if self.offsets.ndim != 1 or len(self.offsets) == 0 or self.offsets[0] != 0:
+            raise ValueError("offsets should be a 1D array starting at 0")
+        if self.offsets[-1] != len(self.coords):
+            raise ValueError("offsets[-1] should match the number of points")
+
+    @classmethod
+    def empty(cls, dtype=np.float32) -> "SegmentArray":
+        return cls(np.zeros((0, 2)), np.zeros(1, dtype=np.int64), dtype=dtype)
+
+    @classmethod
+    def from_arrays(cls, arrays: list[np.ndarray], dtype=np.float32) -> "SegmentArray":
+        """Packs a list of (k, 2) arrays."""
+        if not arrays:
+            return cls.empty(dtype)
+        lengths = [len(a) for a in arrays]
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        coords = np.concatenate([np.asarray(a, dtype=dtype).reshape(-1, 2) for a in arrays])
+        return cls(coords, offsets, dtype=dtype)
+
+    @classmethod
+    def from_segments(cls, segments: list[Segment], dtype=np.float32) -> "SegmentArray":
+        return cls.from_arrays([s.to_array(dtype) for s in segments], dtype=dtype)
+
+    @classmethod
+    def from_json(cls, json_obj: list, dtype=np.float32) -> "SegmentArray":
+        return cls.from_arrays([np.asarray(s, dtype=dtype).reshape(-1, 2) for s in json_obj], dtype=dtype)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.coords.dtype
+
+    @property
+    def n_points(self) -> int:
+        return len(self.coords)
+
+    def lengths(self) -> np.ndarray:
+        """Number of points of each segment."""
+        return np.diff(self.offsets)
+
+    def firsts(self) -> np.ndarray:
+        """(M, 2) first point of each segment. Assumes no empty segments."""
+        return self.coords[self.offsets[:-1]]
+
+    def lasts(self) -> np.ndarray:
+        """(M, 2) last point of each segment. Assumes no empty segments."""
+        return self.coords[self.offsets[1:] - 1]
+
+    def segment_ids(self) -> np.ndarray:
+        """(N,) index of the segment each point belongs to."""
+        return np.repeat(np.arange(len(self)), self.lengths())
+
+    def take(self, indices: np.ndarray, reverse: np.ndarray = None) -> "SegmentArray":
+        """Reorders (or filters) segments, optionally reversing the point order of some of them."""
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.offsets[indices]
+        lengths = self.offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # Position of every output point inside its segment
+        local = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        if reverse is not None:
+            flip = np.repeat(np.asarray(reverse, dtype=bool), lengths)
+            local = np.where(flip, np.repeat(lengths, lengths) - 1 - local, local)
+        src = np.repeat(starts, lengths) + local
+        return SegmentArray(self.coords[src], offsets, dtype=self.dtype)
+
+    def to_segments(self) -> list[Segment]:
+        """Compatibility view as Point/Segment objects."""
+        return [Segment([Point(float(x), float(y)) for x, y in self[i].tolist()]) for i in range(len(self))]
+
+    def to_json(self) -> list[list[list[float]]]:
+        flat = self.coords.tolist()
+        return [flat[start:end] for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("segment index out of range")
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for start, end in zip(self.offsets[:-1], self.offsets[1:]):
+            yield self.coords[start:end]
+
+
+def points_to_array(points: list[Point], dtype=np.float32) -> np.ndarray:
+    """Packs a list of points into an (N, 2) array."""
+    return np.array([(p.x, p.y) for p in points], dtype=dtype).reshape(-1, 2)
+
+
+def array_to_points(coords: np.ndarray) -> list[Point]:
+    """Compatibility view of an (N, 2) array as Point objects."""
+    return [Point(float(x), float(y)) for x, y in np.asarray(coords).tolist()]
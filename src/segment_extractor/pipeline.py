@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from models import SegmentArray
+from processing import get_edges, chain_edges, simplify_segments, normalize_segments
+from sorting import sort_segments
+from streaming import stream_segments
+
+
+@dataclass(frozen=True)
+class ExtractionParams:
+    """Parameters of the whole extraction pipeline. Defaults match the Streamlit app."""
+    threshold_1: float = 20
+    threshold_2: float = 50
+    distance_threshold: float = 5
+    chaining: str = "raster"
+    eps: float = 2.
+    normalize: bool = True
+    optimize: bool = False
+    # Tile size of the streaming pipeline (see streaming.py), 0 processes the whole image at once
+    tile_size: int = 0
+
+
+def extract_segments(img: np.ndarray, params: ExtractionParams = ExtractionParams()) -> SegmentArray:
+    """Border detection, chaining, simplification and sorting of a grayscale image"""
+    if params.tile_size:
+        return _extract_segments_streaming(img, params)
+    edges = get_edges(img, params.threshold_1, params.threshold_2)
+    segments = chain_edges(edges, distance_threshold=params.distance_threshold, method=params.chaining)
+    simple_segments = simplify_segments(segments, eps=params.eps, normalize=params.normalize)
+    return sort_segments(simple_segments, optimize=params.optimize)
+
+
+def _extract_segments_streaming(img: np.ndarray, params: ExtractionParams) -> SegmentArray:
+    """Tiled extraction (always raster chaining). Only the simplified segments are collected, for sorting."""
+    segments = SegmentArray.from_arrays(list(stream_segments(
+        img, params.threshold_1, params.threshold_2, params.distance_threshold, params.eps,
+        tile_size=params.tile_size)), np.float64)
+    if params.normalize:
+        segments = normalize_segments(segments)
+    return sort_segments(segments, optimize=params.optimize)
@@ -2,88 +2,256 @@ from scipy.spatial import KDTree
 import numpy as np
 import cv2
 
-from models import Point, Segment
+from src.common.instrumentation import instrumented
+from models import Point, Segment, SegmentArray, points_to_array, array_to_points
 
-def get_border_points(img: np.ndarray, threshold_1: float, threshold_2: float) -> list[Point]:
-    """Extract border points from a grayscale image using Canny edge detection"""
+CHAINING_METHODS = ("kdtree", "raster")
+
+@instrumented("processing.get_edges")
+def get_edges(img: np.ndarray, threshold_1: float, threshold_2: float) -> np.ndarray:
+    """Canny edge raster of a grayscale image"""
     blurred = cv2.GaussianBlur(img, (5, 5), 0)
-    edges = cv2.Canny(blurred, threshold_1, threshold_2)
-    coords = np.column_stack(np.where(edges > 0))
-    points = [Point(float(x), float(y)) for y, x in coords]
-    return points
+    return cv2.Canny(blurred, threshold_1, threshold_2)
 
-def points_to_segments(points: list[Point], distance_threshold: float = 5) -> list[Segment]:
-    """Convert list of points to segments based on proximity using KDTree"""
-    if not points:
-        return []
+def edges_to_coords(edges: np.ndarray) -> np.ndarray:
+    """Pixels of an edge raster as an (N, 2) float32 array of (x, y)"""
+    ys, xs = np.nonzero(edges)
+    return np.column_stack((xs, ys)).astype(np.float32)
+
+@instrumented("processing.get_border_coords", items=len)
+def get_border_coords(img: np.ndarray, threshold_1: float, threshold_2: float) -> np.ndarray:
+    """Extract border points from a grayscale image using Canny edge detection, as an (N, 2) float32 array of (x, y)"""
+    return edges_to_coords(get_edges(img, threshold_1, threshold_2))
 
-    unvisited = set(points)
-    segments = []
+@instrumented("processing.get_border_points", items=len)
+def get_border_points(img: np.ndarray, threshold_1: float, threshold_2: float) -> list[Point]:
+    """Extract border points from a grayscale image using Canny edge detection"""
+    return array_to_points(get_border_coords(img, threshold_1, threshold_2))
 
-    coords = np.array([(p.x, p.y) for p in points])
-    point_map = {(p.x, p.y): p for p in points}
+def _chain_kdtree(coords: np.ndarray, distance_threshold: float) -> SegmentArray:
+    """Greedy nearest-neighbour chaining of an (N, 2) array using KDTree"""
+    visited = np.zeros(len(coords), dtype=bool)
     kdtree = KDTree(coords)
+    chains = []
 
-    while unvisited:
-        current = unvisited.pop()
-        segment_points = [current]
+    for seed in range(len(coords)):
+        if visited[seed]:
+            continue
+        visited[seed] = True
+        chain = [seed]
 
         for _ in range(2):
-            segment_points = segment_points[::-1]
+            chain.reverse()
             while True:
-                idx_neighbors = kdtree.query_ball_point([segment_points[-1].x, segment_points[-1].y], distance_threshold)
-                neighbors = [point_map[tuple(coords[i])] for i in idx_neighbors if point_map[tuple(coords[i])] in unvisited]
-                if not neighbors:
+                last = coords[chain[-1]]
+                idx_neighbors = np.asarray(kdtree.query_ball_point(last, distance_threshold), dtype=np.intp)
+                idx_neighbors = idx_neighbors[~visited[idx_neighbors]]
+                if not len(idx_neighbors):
                     break
-                next_point = min(neighbors, key=lambda q: segment_points[-1].distance(q))
-                segment_points.append(next_point)
-                unvisited.remove(next_point)
+                dists = ((coords[idx_neighbors] - last) ** 2).sum(axis=1)
+                next_idx = idx_neighbors[np.argmin(dists)]
+                chain.append(next_idx)
+                visited[next_idx] = True
 
-        segments.append(Segment(segment_points))
+        chains.append(chain)
 
-    return segments
+    return SegmentArray.from_arrays([coords[c] for c in chains], dtype=coords.dtype)
 
-def simplify_segment(segment: Segment, eps: float = 2.) -> Segment:
-    """Ramer-Douglas-Peucker algorithm implementation"""
-    
-    if len(segment) < 2:
+@instrumented("processing.edges_to_segments", items=len)
+def edges_to_segments(edges: np.ndarray, distance_threshold: float = 5) -> SegmentArray:
+    """Chain the pixels of an edge raster into segments, walking to the nearest unvisited pixel within distance_threshold.
+
+    Same greedy semantics as the KDTree walk, but neighbours are found by probing a precomputed disk of pixel offsets
+    sorted by distance, so each step costs O(1) for thin edges and the whole pass is linear in the number of pixels.
+    """
+    r = max(int(np.floor(distance_threshold)), 1)
+    h, w = edges.shape
+    width = w + 2 * r
+
+    grid = np.zeros((h + 2 * r, width), dtype=np.uint8)
+    grid[r:r + h, r:r + w] = edges > 0
+
+    dy, dx = np.mgrid[-r:r + 1, -r:r + 1]
+    d2 = dx ** 2 + dy ** 2
+    in_disk = (d2 > 0) & (d2 <= distance_threshold ** 2)
+    order = np.argsort(d2[in_disk], kind="stable")
+    disk = (dy[in_disk] * width + dx[in_disk])[order].tolist()
+
+    unvisited = bytearray(grid.tobytes())
+    chains = []
+    for seed in np.flatnonzero(grid).tolist():
+        if not unvisited[seed]:
+            continue
+        unvisited[seed] = 0
+        chain = [seed]
+
+        for _ in range(2):
+            chain.reverse()
+            current = chain[-1]
+            while True:
+                for offset in disk:
+                    if unvisited[current + offset]:
+                        current += offset
+                        break
+                else:
+                    break
+                unvisited[current] = 0
+                chain.append(current)
+
+        chains.append(chain)
+
+    if not chains:
+        return SegmentArray.empty()
+
+    flat = np.fromiter((i for c in chains for i in c), dtype=np.int64)
+    offsets = np.zeros(len(chains) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chains], out=offsets[1:])
+    coords = np.column_stack((flat % width - r, flat // width - r))
+    return SegmentArray(coords, offsets)
+
+def _rasterize(coords: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Draws (rounded) coordinates into a binary raster. Returns the raster and its (x, y) origin"""
+    pixels = np.rint(coords).astype(np.int64)
+    origin = pixels.min(axis=0)
+    pixels -= origin
+    raster = np.zeros((pixels[:, 1].max() + 1, pixels[:, 0].max() + 1), dtype=np.uint8)
+    raster[pixels[:, 1], pixels[:, 0]] = 1
+    return raster, origin
+
+def _chain_raster(coords: np.ndarray, distance_threshold: float) -> SegmentArray:
+    raster, origin = _rasterize(coords)
+    segments = edges_to_segments(raster, distance_threshold)
+    return SegmentArray(segments.coords + origin, segments.offsets, dtype=coords.dtype)
+
+@instrumented("processing.points_to_segments", items=len)
+def points_to_segments(points: list[Point] | np.ndarray, distance_threshold: float = 5, method: str = "kdtree") -> list[Segment] | SegmentArray:
+    """Convert points to segments based on proximity. An (N, 2) array input returns a SegmentArray.
+
+    method="kdtree" walks a KDTree over the points, method="raster" rounds them to pixels and uses edges_to_segments.
+    When the points come from a Canny raster, chain_edges skips the round trip through coordinates.
+    """
+    if method not in CHAINING_METHODS:
+        raise ValueError(f"Unknown chaining method: {method}")
+    chain = _chain_kdtree if method == "kdtree" else _chain_raster
+
+    if isinstance(points, np.ndarray):
+        if not len(points):
+            return SegmentArray.empty(points.dtype)
+        return chain(points, distance_threshold)
+
+    if not points:
+        return []
+    unique_points = list(dict.fromkeys(points))
+    return chain(points_to_array(unique_points, np.float64), distance_threshold).to_segments()
+
+def chain_edges(edges: np.ndarray, distance_threshold: float = 5, method: str = "raster") -> SegmentArray:
+    """Chains a Canny edge raster: method="raster" works on the raster directly, "kdtree" on its pixel coordinates."""
+    if method == "raster":
+        segments = edges_to_segments(edges, distance_threshold)
+        return SegmentArray(segments.coords, segments.offsets, dtype=np.float32)
+    return points_to_segments(edges_to_coords(edges), distance_threshold, method)
+
+def _rdp_keep_mask(coords: np.ndarray, offsets: np.ndarray, eps: float) -> np.ndarray:
+    """Ramer-Douglas-Peucker over many packed segments at once. Returns a mask of the points to keep.
+
+    Instead of recursing, every pending span (of every segment) is processed together: all perpendicular distances
+    of the span interiors are computed in one vectorized pass, and spans whose farthest point exceeds eps are split
+    into two new spans for the next pass. The farthest point of a degenerate span (start == end) is measured by its
+    distance to the start.
+    """
+    keep = np.zeros(len(coords), dtype=bool)
+    lengths = np.diff(offsets)
+    non_empty = lengths > 0
+    keep[offsets[:-1][non_empty]] = True
+    keep[offsets[1:][non_empty] - 1] = True
+
+    starts = offsets[:-1][lengths > 2]
+    ends = offsets[1:][lengths > 2] - 1
+    while len(starts):
+        counts = ends - starts - 1
+        bounds = np.zeros(len(counts), dtype=np.int64)
+        np.cumsum(counts[:-1], out=bounds[1:])
+        total = bounds[-1] + counts[-1]
+
+        span = np.repeat(np.arange(len(starts)), counts)
+        idx = np.arange(total) - bounds[span] + starts[span] + 1
+
+        a = coords[starts][span]
+        ab = coords[ends][span] - a
+        ap = coords[idx] - a
+        norm = np.hypot(ab[:, 0], ab[:, 1])
+        cross = np.abs(ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0])
+        d = np.where(norm > 0, cross / np.where(norm > 0, norm, 1), np.hypot(ap[:, 0], ap[:, 1]))
+
+        dmax = np.maximum.reduceat(d, bounds)
+        first_max = np.minimum.reduceat(np.where(d == dmax[span], np.arange(total), total), bounds)
+        split_spans = dmax > eps
+        split = idx[first_max[split_spans]]
+        keep[split] = True
+
+        new_starts = np.concatenate((starts[split_spans], split))
+        new_ends = np.concatenate((split, ends[split_spans]))
+        pending = new_ends - new_starts > 1
+        starts, ends = new_starts[pending], new_ends[pending]
+
+    return keep
+
+def _simplify_coords(coords: np.ndarray, eps: float) -> np.ndarray | None:
+    if len(coords) < 2:
+        return None
+
+    rdp_coords = coords[_rdp_keep_mask(coords, np.array([0, len(coords)]), eps)]
+    if len(rdp_coords) == 2 and ((rdp_coords[0] - rdp_coords[-1]) ** 2).sum() < eps:
         return None
+    return rdp_coords
 
-    coords = np.array([[p.x, p.y] for p in segment])
-    def _rdp(points: np.ndarray):
-        dmax = 0.0
-        index = 0
-        start, end = points[0], points[-1]
-        for i in range(1, len(points) - 1):
-            p = points[i]
-            d = np.abs(np.cross(end - start, start - p)) / np.linalg.norm(end - start)
-            if d > dmax:
-                index = i
-                dmax = d
-        if dmax > eps:
-            rec1 = _rdp(points[:index+1])
-            rec2 = _rdp(points[index:])
-            return np.vstack((rec1[:-1], rec2))
-        else:
-            return np.vstack((start, end))
-
-    rdp_coords = _rdp(coords)
-    simplified_points = [Point(float(x), float(y)) for x, y in rdp_coords]
-    simplified_segment = Segment(simplified_points)
-
-    if len(simplified_segment) == 2 and simplified_segment.first().distance(simplified_segment.last()) < eps:
+def _simplify_segment_array(segments: SegmentArray, eps: float) -> SegmentArray:
+    """Batch Ramer-Douglas-Peucker over every segment of a SegmentArray, dropping tiny 2-point results"""
+    segments = segments.take(np.flatnonzero(segments.lengths() >= 2))
+    if not len(segments):
+        return segments
+
+    coords = segments.coords.astype(np.float64)
+    keep = _rdp_keep_mask(coords, segments.offsets, eps)
+    kept_per_segment = np.add.reduceat(keep, segments.offsets[:-1])
+    offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+    np.cumsum(kept_per_segment, out=offsets[1:])
+    simplified = SegmentArray(segments.coords[keep], offsets, dtype=segments.dtype)
+
+    firsts, lasts = simplified.firsts().astype(np.float64), simplified.lasts().astype(np.float64)
+    tiny = (simplified.lengths() == 2) & (((firsts - lasts) ** 2).sum(axis=1) < eps)
+    return simplified.take(np.flatnonzero(~tiny))
+
+@instrumented("processing.simplify_segment")
+def simplify_segment(segment: Segment, eps: float = 2.) -> Segment:
+    """Ramer-Douglas-Peucker algorithm implementation"""
+    rdp_coords = _simplify_coords(segment.to_array(np.float64), eps)
+    if rdp_coords is None:
         return None
-    return simplified_segment
+    return Segment(array_to_points(rdp_coords))
     
-def simplify_segments(segments: list[Segment], eps: float = 2., normalize: bool = False) -> list[Segment]:
-    simplified_segments = [simplify_segment(s, eps) for s in segments]
-    filtered_segments = [s for s in simplified_segments if s is not None and len(s) >= 2]
+@instrumented("processing.simplify_segments", items=len)
+def simplify_segments(segments: list[Segment] | SegmentArray, eps: float = 2., normalize: bool = False) -> list[Segment] | SegmentArray:
+    if isinstance(segments, SegmentArray):
+        filtered_segments = _simplify_segment_array(segments, eps)
+    else:
+        simplified_segments = [simplify_segment(s, eps) for s in segments]
+        filtered_segments = [s for s in simplified_segments if s is not None and len(s) >= 2]
     if normalize:
         return normalize_segments(filtered_segments)
     return filtered_segments
 
-def normalize_segments(segments: list[Segment]) -> list[Segment]:
+@instrumented("processing.normalize_segments", items=len)
+def normalize_segments(segments: list[Segment] | SegmentArray) -> list[Segment] | SegmentArray:
     """Transform segments to fit within a unit square (conserving aspect ratio)"""
+    if isinstance(segments, SegmentArray):
+        if not segments.n_points:
+            return segments
+        coords = segments.coords.astype(np.float64)
+        min_xy = coords.min(axis=0)
+        w = (coords.max(axis=0) - min_xy).max()
+        return SegmentArray((coords - min_xy) / w, segments.offsets, dtype=np.float64)
+
     min_x = min(min(p.x for p in s) for s in segments)
     min_y = min(min(p.y for p in s) for s in segments)
     max_x = max(max(p.x for p in s) for s in segments)
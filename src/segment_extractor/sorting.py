@@ -1,8 +1,52 @@
-from models import Segment
+import numpy as np
+from scipy.spatial import KDTree
 
+from src.common.instrumentation import instrumented
+from models import Segment, SegmentArray
+from local_search import optimize_tour
 
-def compute_weight_matrix(segments: list[Segment]) -> list[list[float]]:
+
+class EndpointDistances:
+    """Lazy weight matrix: row i holds the squared distances from the end of segment i to the start of every segment.
+
+    Rows are computed on demand (the last one is cached), so the n x n matrix is never materialized. Spatial algorithms
+    such as kdtree_tsp use the endpoint arrays directly.
+    """
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self._row_index = None
+        self._row = None
+
+    @classmethod
+    def from_segments(cls, segments: list[Segment] | SegmentArray) -> "EndpointDistances":
+        if isinstance(segments, SegmentArray):
+            return cls(segments.firsts(), segments.lasts())
+        starts = [(s.first().x, s.first().y) for s in segments]
+        ends = [(s.last().x, s.last().y) for s in segments]
+        return cls(np.reshape(starts, (-1, 2)), np.reshape(ends, (-1, 2)))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if self._row_index != i:
+            row = ((self.starts - self.ends[i]) ** 2).sum(axis=1)
+            row[i] = 0.0
+            self._row_index, self._row = i, row
+        return self._row
+
+
+@instrumented("sorting.compute_weight_matrix")
+def compute_weight_matrix(segments: list[Segment] | SegmentArray) -> list[list[float]] | np.ndarray:
     """Computes weight matrix based on distances between segments. Simplified algorithm."""
+    if isinstance(segments, SegmentArray):
+        lasts = segments.lasts().astype(np.float64)
+        firsts = segments.firsts().astype(np.float64)
+        matrix = ((lasts[:, None, :] - firsts[None, :, :]) ** 2).sum(axis=2)
+        np.fill_diagonal(matrix, 0.0)
+        return matrix
+
     n = len(segments)
     matrix = [[0.0] * n for _ in range(n)]
     for i in range(n):
@@ -14,6 +58,7 @@ def compute_weight_matrix(segments: list[Segment]) -> list[list[float]]:
     return matrix
 
 
+@instrumented("sorting.greedy_tsp", items=len)
 def greedy_tsp(weight_matrix: tuple[tuple[int]], start: int = 0) -> list[int]:
     """Greedy solution of the Traveling Salesman Problem (TSP)"""
     n = len(weight_matrix)
@@ -23,13 +68,14 @@ def greedy_tsp(weight_matrix: tuple[tuple[int]], start: int = 0) -> list[int]:
 
     for _ in range(n - 1):
         actual = path[-1]
+        row = weight_matrix[actual]
         best_i = None
         best_score = float("inf")
 
         for i in range(n):
             if visited[i]:
                 continue
-            current_score = weight_matrix[actual][i]
+            current_score = row[i]
             if current_score < best_score:
                 best_i = i
                 best_score = current_score
@@ -40,8 +86,57 @@ def greedy_tsp(weight_matrix: tuple[tuple[int]], start: int = 0) -> list[int]:
     return path
 
 
-def sort_segments(segments: list[Segment], tsp_algorithm: callable = greedy_tsp):
-    """Sort segments to minimize travel distance using TSP algorithm"""
-    w = compute_weight_matrix(segments)
+@instrumented("sorting.kdtree_tsp", items=len)
+def kdtree_tsp(weights: EndpointDistances, start: int = 0, k: int = 8) -> list[int]:
+    """Greedy nearest-endpoint tour using a KDTree over the segment starts. O(n log n) time, O(n) memory.
+
+    Produces the same tour as greedy_tsp (up to ties). Visited starts stay in the tree until they are the majority,
+    then the tree is rebuilt over the remaining ones.
+    """
+    n = len(weights)
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    path = [start]
+
+    remaining = np.flatnonzero(~visited)
+    kdtree = KDTree(weights.starts[remaining]) if len(remaining) else None
+    stale = 0
+
+    while len(path) < n:
+        query = weights.ends[path[-1]]
+        n_neighbours = min(k, len(remaining))
+        while True:
+            _, idx = kdtree.query(query, k=n_neighbours)
+            candidates = remaining[np.atleast_1d(idx)]
+            free = ~visited[candidates]
+            if free.any():
+                best_i = candidates[np.argmax(free)]
+                break
+            n_neighbours = min(2 * n_neighbours, len(remaining))
+
+        visited[best_i] = True
+        path.append(int(best_i))
+
+        stale += 1
+        if 2 * stale > len(remaining) and len(path) < n:
+            remaining = np.flatnonzero(~visited)
+            kdtree = KDTree(weights.starts[remaining])
+            stale = 0
+
+    return path
+
+
+@instrumented("sorting.sort_segments", items=len)
+def sort_segments(segments: list[Segment] | SegmentArray, tsp_algorithm: callable = kdtree_tsp,
+                  optimize: bool = False, time_limit: float = 1.0):
+    """Sort segments to minimize travel distance using TSP algorithm.
+    With optimize, the tour is refined with optimize_tour (which may also reverse segments)."""
+    if not len(segments):
+        return segments
+    w = EndpointDistances.from_segments(segments)
     path = tsp_algorithm(w)
+    if optimize:
+        return optimize_tour(segments, path, time_limit=time_limit).apply(segments)
+    if isinstance(segments, SegmentArray):
+        return segments.take(path)
     return [segments[i] for i in path]
@@ -0,0 +1,158 @@
+from typing import Iterable, Iterator
+
+import cv2
+import numpy as np
+
+from models import SegmentArray
+from processing import get_edges, edges_to_segments, _simplify_segment_array
+
+# Extra pixels read around every tile. They cover the blur and Sobel kernels, so gradients match the whole image.
+# Canny hysteresis is not local, though: a weak edge is kept when it connects to a strong one, however far away. A weak
+# edge whose only strong seed lies beyond the margin, in another tile, is lost, so tiled edges are an approximation
+# (on a 1500x1500 scan with 256 px tiles, 39 of ~33.5k edge pixels differ, all next to tile borders).
+TILE_MARGIN = 16
+
+
+def open_image(path: str) -> np.ndarray:
+    """Grayscale image for streaming. .npy files are memory-mapped, so only the tiles being processed are read.
+    Other formats are decoded whole by OpenCV (one byte per pixel, 100 MB for 100 megapixels): only the later stages,
+    whose border points and chains cost far more per pixel, are bounded by the tile size. Convert very large scans
+    to .npy once (np.save of the grayscale image) to bound the input too."""
+    if str(path).endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(f"Error: {path}")
+    return img
+
+
+def iter_tile_edges(img: np.ndarray, threshold_1: float, threshold_2: float,
+                    tile_size: int = 1024) -> Iterator[tuple[int, int, np.ndarray]]:
+    """Canny edges tile by tile, in row-major order. Yields (x0, y0, edges) with edges covering the tile only."""
+    h, w = img.shape[:2]
+    for y0 in range(0, h, tile_size):
+        for x0 in range(0, w, tile_size):
+            y1, x1 = min(y0 + tile_size, h), min(x0 + tile_size, w)
+            top, left = max(y0 - TILE_MARGIN, 0), max(x0 - TILE_MARGIN, 0)
+            window = np.ascontiguousarray(img[top:min(y1 + TILE_MARGIN, h), left:min(x1 + TILE_MARGIN, w)])
+            edges = get_edges(window, threshold_1, threshold_2)
+            yield x0, y0, edges[y0 - top:y1 - top, x0 - left:x1 - left]
+
+
+def _join(chain: np.ndarray, chain_end: int, other: np.ndarray, other_end: int) -> np.ndarray:
+    """Concatenates two chains through the given endpoints (0 = first point, -1 = last point)."""
+    if chain_end == 0:
+        chain = chain[::-1]
+    if other_end == -1:
+        other = other[::-1]
+    return np.vstack((chain, other))
+
+
+def iter_tile_segments(tile_edges: Iterable[tuple[int, int, np.ndarray]], shape: tuple[int, int],
+                       distance_threshold: float = 5, tile_size: int = 1024) -> Iterator[np.ndarray]:
+    """Chains the edges of every tile and stitches chains across tile borders.
+
+    Chains with an endpoint within distance_threshold of a tile that has not been processed yet are kept pending;
+    when that tile is chained, its chains are joined to the closest pending endpoint within distance_threshold.
+    Every other chain is yielded as soon as it is complete, so only the pending border chains are kept in memory.
+    """
+    h, w = shape[:2]
+    n_rows = -(-h // tile_size)
+    n_cols = -(-w // tile_size)
+    pending: dict[int, np.ndarray] = {}
+    next_id = 0
+
+    def is_open(p: np.ndarray, row: int, col: int) -> bool:
+        """Whether endpoint p may still connect to a tile after (row, col) in row-major order."""
+        prow, pcol = int(p[1]) // tile_size, int(p[0]) // tile_size
+        right_open = (pcol + 1 < n_cols and (prow, pcol + 1) > (row, col)
+                      and p[0] >= (pcol + 1) * tile_size - distance_threshold)
+        down_open = (prow + 1 < n_rows and (prow + 1, pcol + 1) > (row, col)
+                     and p[1] >= (prow + 1) * tile_size - distance_threshold)
+        return right_open or down_open
+
+    def closest_pending(p: np.ndarray) -> tuple[int, int] | None:
+        best, best_d = None, distance_threshold ** 2
+        for key, chain in pending.items():
+            for end in (0, -1):
+                d = float(((chain[end] - p) ** 2).sum())
+                if d <= best_d:
+                    best, best_d = (key, end), d
+        return best
+
+    for x0, y0, edges in tile_edges:
+        row, col = y0 // tile_size, x0 // tile_size
+        segments = edges_to_segments(edges, distance_threshold)
+        offset = np.array([x0, y0], dtype=segments.dtype)
+
+        tile_chains = []
+        for local in segments:
+            chain = local + offset
+            merged = False
+            joined = True
+            while joined and pending:
+                joined = False
+                for end in (0, -1):
+                    # Only endpoints next to the top or left border can meet a chain of an earlier tile
+                    p = chain[end]
+                    if p[0] >= x0 + distance_threshold and p[1] >= y0 + distance_threshold and not merged:
+                        continue
+                    match = closest_pending(p)
+                    if match is not None:
+                        key, other_end = match
+                        chain = _join(chain, end, pending.pop(key), other_end)
+                        merged = joined = True
+                        break
+            if merged:
+                pending[next_id] = chain
+                next_id += 1
+            else:
+                tile_chains.append(chain)
+
+        for chain in tile_chains:
+            pending[next_id] = chain
+            next_id += 1
+
+        for key in list(pending):
+            chain = pending[key]
+            if not (is_open(chain[0], row, col) or is_open(chain[-1], row, col)):
+                yield pending.pop(key)
+
+    yield from pending.values()
+
+
+def iter_simplified(segments: Iterable[np.ndarray], eps: float = 2., batch_points: int = 1 << 16) -> Iterator[np.ndarray]:
+    """Ramer-Douglas-Peucker on every segment of a stream, dropping tiny ones.
+    Segments are simplified in batches of about batch_points points with the packed batch implementation."""
+    batch, n_points = [], 0
+    for segment in segments:
+        batch.append(segment)
+        n_points += len(segment)
+        if n_points >= batch_points:
+            yield from _simplify_segment_array(SegmentArray.from_arrays(batch, np.float64), eps)
+            batch, n_points = [], 0
+    if batch:
+        yield from _simplify_segment_array(SegmentArray.from_arrays(batch, np.float64), eps)
+
+
+def iter_normalized(segments: Iterable[np.ndarray], bounds: tuple[float, float, float, float]) -> Iterator[np.ndarray]:
+    """Maps a stream into the unit square. bounds = (min_x, min_y, max_x, max_y) has to be known upfront, so it is
+    the image frame rather than the extent of the segments (as normalize_segments does)."""
+    min_xy = np.array(bounds[:2], dtype=np.float64)
+    w = max(bounds[2] - bounds[0], bounds[3] - bounds[1])
+    for segment in segments:
+        yield (segment - min_xy) / w
+
+
+def stream_segments(img: np.ndarray, threshold_1: float, threshold_2: float, distance_threshold: float = 5,
+                    eps: float = 2., normalize: bool = False, tile_size: int = 1024) -> Iterator[np.ndarray]:
+    """Streaming extraction: tiled Canny, raster chaining with stitching, RDP and normalization as generators.
+    Past the input image (memory-mapped for .npy, see open_image), peak memory is bounded by the tile size plus the
+    chains crossing tile borders, not by the image size."""
+    tiles = iter_tile_edges(img, threshold_1, threshold_2, tile_size)
+    segments = iter_tile_segments(tiles, img.shape, distance_threshold, tile_size)
+    simplified = iter_simplified(segments, eps)
+    if normalize:
+        h, w = img.shape[:2]
+        return iter_normalized(simplified, (0, 0, w - 1, h - 1))
+    return simplified
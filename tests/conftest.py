@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# segment_extractor modules import each other as top-level modules (the way Streamlit and its CLI run them)
+EXTRACTOR_DIR = str(Path(__file__).resolve().parents[1] / "src" / "segment_extractor")
+if EXTRACTOR_DIR not in sys.path:
+    sys.path.append(EXTRACTOR_DIR)
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.common.binary_format import (SegmentWriter, binary_to_json, is_binary_segment_file, iter_segments,
+                                      json_to_binary, read_segments, write_segments)
+
+
+def _pack(segments: list[list[list[float]]]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.cumsum([0] + [len(s) for s in segments])
+    coords = np.array([p for s in segments for p in s], dtype=np.float64).reshape(-1, 2)
+    return coords, offsets
+
+
+SEGMENTS = [[[0., 0.], [1., 2.], [3.5, -4.]], [], [[7., 8.]], [[0.1, 0.2], [0.3, 0.4]]]
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_round_trip(tmp_path, dtype, mmap):
+    coords, offsets = _pack(SEGMENTS)
+    path = str(tmp_path / "s.segb")
+    write_segments(path, coords, offsets, dtype)
+
+    assert is_binary_segment_file(path)
+    read_coords, read_offsets = read_segments(path, mmap=mmap)
+    assert read_coords.dtype == dtype
+    np.testing.assert_array_equal(read_offsets, offsets)
+    np.testing.assert_array_equal(read_coords, coords.astype(dtype))
+
+
+def test_segments_written_one_by_one(tmp_path):
+    path = str(tmp_path / "s.segb")
+    with SegmentWriter(path, np.float64) as writer:
+        for segment in SEGMENTS:
+            writer.write(np.asarray(segment, dtype=np.float64).reshape(-1, 2))
+
+    segments = iter_segments(path)
+    assert [s.tolist() for s in segments] == SEGMENTS
+
+
+@pytest.mark.parametrize("segments", [[], [[]], [[[5., 6.]]]], ids=["no segments", "empty", "single point"])
+def test_degenerate_files(tmp_path, segments):
+    path = str(tmp_path / "s.segb")
+    write_segments(path, *_pack(segments))
+
+    coords, offsets = read_segments(path)
+    assert offsets.tolist() == np.cumsum([0] + [len(s) for s in segments]).tolist()
+    assert coords.shape == (sum(len(s) for s in segments), 2)
+    assert [s.tolist() for s in iter_segments(path)] == segments
+
+
+def test_json_conversion_is_lossless(tmp_path):
+    segments = [[[0.1, 1 / 3], [2 ** 0.5, -1e-9]], [[123456.789, 0.]]]
+    json_path, binary_path, back_path = tmp_path / "s.json", tmp_path / "s.segb", tmp_path / "back.json"
+    json_path.write_text(json.dumps(segments))
+
+    json_to_binary(str(json_path), str(binary_path))
+    binary_to_json(str(binary_path), str(back_path))
+    assert json.loads(back_path.read_text()) == segments
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text("[]" * 32)
+    assert not is_binary_segment_file(str(path))
+    with pytest.raises(ValueError):
+        read_segments(str(path))
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from cache import StageCache, hash_image
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return np.arange(self.calls)
+
+
+def test_hit_and_miss():
+    cache, compute = StageCache(), Counter()
+    first = cache.get_or_compute("edges", ("img", 20, 50), compute)
+    second = cache.get_or_compute("edges", ("img", 20, 50), compute)
+    assert compute.calls == 1 and second is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get_or_compute("edges", ("img", 20, 60), compute)
+    cache.get_or_compute("segments", ("img", 20, 50), compute)
+    assert compute.calls == 3 and cache.misses == 3 and len(cache) == 3
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache, compute = StageCache(max_entries=2), Counter()
+    cache.get_or_compute("stage", (1,), compute)
+    cache.get_or_compute("stage", (2,), compute)
+    cache.get_or_compute("stage", (1,), compute)
+    cache.get_or_compute("stage", (3,), compute)
+    assert len(cache) == 2 and compute.calls == 3
+
+    cache.get_or_compute("stage", (1,), compute)
+    assert compute.calls == 3
+    cache.get_or_compute("stage", (2,), compute)
+    assert compute.calls == 4
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    compute = Counter()
+    StageCache(disk_dir=tmp_path).get_or_compute("stage", ("key",), compute)
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+
+    cache = StageCache(disk_dir=tmp_path)
+    value = cache.get_or_compute("stage", ("key",), compute)
+    assert compute.calls == 1 and cache.disk_hits == 1 and cache.misses == 0
+    np.testing.assert_array_equal(value, [0])
+
+    cache.clear()
+    assert len(cache) == 0
+    cache.get_or_compute("stage", ("key",), compute)
+    assert compute.calls == 1 and cache.disk_hits == 2
+
+
+def test_corrupted_disk_entries_are_recomputed(tmp_path):
+    cache, compute = StageCache(disk_dir=tmp_path), Counter()
+    (tmp_path / f"{StageCache.make_key('stage', ('key',))}.pkl").write_bytes(b"not a pickle")
+    cache.get_or_compute("stage", ("key",), compute)
+    assert compute.calls == 1 and cache.misses == 1
+
+
+def test_hash_image():
+    img = np.random.default_rng(0).integers(0, 255, (40, 60), dtype=np.uint8)
+    assert hash_image(img) == hash_image(img.copy())
+    changed = img.copy()
+    changed[10, 10] ^= 1
+    assert hash_image(changed) != hash_image(img)
+    assert hash_image(img.reshape(60, 40)) != hash_image(img)
+    assert hash_image(img[:, ::2]) == hash_image(np.ascontiguousarray(img[:, ::2]))
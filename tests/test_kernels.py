@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.scara_kinematics import kernels
+from src.scara_kinematics.scara_kinematics import ScaraKinematics
+
+A1, A2 = 180., 120.
+
+
+@pytest.fixture
+def q() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    q = rng.uniform(-np.pi, np.pi, (100, 3))
+    q[:, 1] = np.where(np.abs(np.sin(q[:, 1])) < 0.1, q[:, 1] + 0.5, q[:, 1])
+    return q
+
+
+def test_kernels_match_the_hand_written_kinematics(q):
+    numeric = ScaraKinematics(A1, A2, np.zeros(3))
+    generated = ScaraKinematics(A1, A2, np.zeros(3), kernels=kernels)
+
+    np.testing.assert_allclose(generated.get_p_batch(q), numeric.get_p_batch(q), atol=1e-9)
+    np.testing.assert_allclose(generated.get_jacobian_batch(q), numeric.get_jacobian_batch(q), atol=1e-9)
+    np.testing.assert_allclose(generated.get_inverse_jacobian_batch(q), numeric.get_inverse_jacobian_batch(q),
+                               atol=1e-9)
+
+
+def test_transform_and_jacobian_are_consistent(q):
+    T = kernels.transform(q, A1, A2)
+    np.testing.assert_allclose(T[:, :3, 3], kernels.position(q, A1, A2), atol=1e-9)
+    np.testing.assert_allclose(np.linalg.det(T[:, :3, :3]), 1, atol=1e-12)
+
+    # Central finite differences of the position
+    h = 1e-6
+    J = kernels.jacobian(q, A1, A2)
+    for j in range(3):
+        step = np.zeros(3)
+        step[j] = h
+        column = (kernels.position(q + step, A1, A2) - kernels.position(q - step, A1, A2)) / (2 * h)
+        np.testing.assert_allclose(J[:, :, j], column, atol=1e-5)
+
+
+def test_kernels_at_singularities():
+    q = np.array([[0.3, 0., 0.], [1.2, np.pi, 0.]])
+    generated = ScaraKinematics(A1, A2, np.zeros(3), kernels=kernels)
+    numeric = ScaraKinematics(A1, A2, np.zeros(3))
+    np.testing.assert_allclose(generated.get_inverse_jacobian_batch(q), numeric.get_inverse_jacobian_batch(q),
+                               atol=1e-9)
+    assert generated.singular_ticks == numeric.singular_ticks == 2
+
+
+def test_rejects_kernels_of_another_chain():
+    class Other:
+        CHAIN, JOINTS, PARAMS = "Rz(q1)Tx(a1)", ("q1",), ("a1",)
+
+    with pytest.raises(ValueError):
+        ScaraKinematics(A1, A2, np.zeros(3), kernels=Other)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from local_search import optimize_tour, pen_up_distance
+from models import SegmentArray
+from sorting import sort_segments
+
+
+def _random_segments(n: int, seed: int = 0) -> SegmentArray:
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 1, (n, 2))
+    return SegmentArray.from_arrays([np.vstack((s, s + rng.normal(0, 0.05, 2))) for s in starts], np.float64)
+
+
+@pytest.mark.parametrize("n", [0, 1, 2, 5, 200])
+def test_every_segment_is_kept_and_the_tour_never_gets_longer(n):
+    segments = _random_segments(n, seed=n)
+    result = optimize_tour(segments, time_limit=10.)
+    assert sorted(result.path) == list(range(n))
+    assert len(result.reversed) == n
+    assert result.pen_up_after <= result.pen_up_before + 1e-9
+    assert result.pen_up_before == pytest.approx(pen_up_distance(segments))
+
+    optimized = result.apply(segments)
+    assert pen_up_distance(optimized) == pytest.approx(result.pen_up_after)
+    # Same segments, some of them drawn backwards
+    originals = sorted(map(str, segments.to_json()))
+    drawn = [s if not r else s[::-1] for s, r in zip(optimized.to_json(), result.reversed)]
+    assert sorted(map(str, drawn)) == originals
+
+
+def test_improves_a_greedy_tour():
+    segments = _random_segments(300)
+    greedy = sort_segments(segments)
+    result = optimize_tour(greedy, time_limit=10.)
+    assert result.moves > 0
+    assert result.pen_up_after < result.pen_up_before
+
+
+def test_starts_from_the_given_path():
+    segments = _random_segments(50)
+    path = list(range(50))[::-1]
+    result = optimize_tour(segments, path=path, max_iterations=0)
+    assert result.path == path and result.moves == 0
+    assert result.pen_up_before == pytest.approx(pen_up_distance(segments.take(path)))
+
+
+def test_lists_of_segments():
+    segments = _random_segments(30)
+    result = optimize_tour(segments.to_segments(), time_limit=10.)
+    optimized = result.apply(segments.to_segments())
+    assert pen_up_distance(optimized) == pytest.approx(result.pen_up_after)
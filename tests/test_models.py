@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from src.scara_simmulation.models import BatchScaraSimulator, ScaraSimulator, TARGET_TOLERANCE
+
+L1, L2 = 180., 150.
+CENTER = (450., 350.)
+
+
+def _scenario(n: int = 6, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    angles = np.column_stack((rng.uniform(0, 2 * np.pi, n), rng.uniform(0.3, 2.8, n)))
+    r = rng.uniform(60, 300, n)
+    theta = rng.uniform(0, 2 * np.pi, n)
+    targets = np.asarray(CENTER) + np.column_stack((r * np.cos(theta), r * np.sin(theta)))
+    max_w = rng.uniform(0.5, 3, (n, 2))
+    return angles, targets, max_w
+
+
+def test_batch_matches_scalar():
+    angles, targets, max_w = _scenario()
+    batch = BatchScaraSimulator(len(angles), L1, L2, angles[:, 0], angles[:, 1], max_w[:, 0], max_w[:, 1], CENTER)
+    batch.set_targets(targets)
+    scalars = []
+    for (a1, a2), target, (w1, w2) in zip(angles, targets, max_w):
+        sim = ScaraSimulator(L1, L2, max_w1=w1, max_w2=w2, center=CENTER)
+        sim.reset(a1, a2)
+        sim.set_target(tuple(target))
+        scalars.append(sim)
+
+    # Slow arms reach their targets after about 13 s
+    for _ in range(1500):
+        batch.update(0.01)
+        for sim in scalars:
+            sim.update(0.01)
+        _, effectors = batch.get_vertices()
+        expected = np.array([sim.get_vertices()[1] for sim in scalars])
+        np.testing.assert_allclose(effectors, expected, atol=1e-6)
+        np.testing.assert_array_equal(batch.targets_achieved(), [sim.target_is_achieved() for sim in scalars])
+    assert batch.targets_achieved().all()
+
+
+def test_same_defaults_as_scalar():
+    batch = BatchScaraSimulator(1, L1, L2, center=CENTER)
+    sim = ScaraSimulator(L1, L2, center=CENTER)
+    np.testing.assert_array_equal(batch.angles[0], sim.kinematics.q[:2, 0])
+    np.testing.assert_array_equal(batch.max_w[0], [sim.arm.max_w1, sim.arm.max_w2])
+
+    batch.reset()
+    sim.reset()
+    np.testing.assert_allclose(batch.get_vertices()[1][0], sim.get_vertices()[1])
+
+
+def test_arms_without_target_stay_still():
+    angles, targets, max_w = _scenario(4)
+    batch = BatchScaraSimulator(4, L1, L2, angles[:, 0], angles[:, 1], max_w[:, 0], max_w[:, 1], CENTER)
+    targets[1] = np.nan
+    batch.set_targets(targets)
+    before = batch.angles.copy()
+    batch.update(0.05)
+    np.testing.assert_array_equal(batch.angles[1], before[1])
+    assert not np.array_equal(batch.angles[0], before[0])
+
+
+def test_arrival_tolerance():
+    batch = BatchScaraSimulator(1, L1, L2, 0., 1., center=CENTER)
+    _, effector = batch.get_vertices()
+    batch.set_targets(effector + TARGET_TOLERANCE / 2)
+    assert batch.targets_achieved().all()
+    before = batch.angles.copy()
+    batch.update(0.1)
+    np.testing.assert_array_equal(batch.angles, before)
+
+    batch.set_targets(effector + 2 * TARGET_TOLERANCE)
+    assert not batch.targets_achieved().any()
+
+
+def test_joint_speed_limits():
+    angles, targets, max_w = _scenario(8, seed=3)
+    batch = BatchScaraSimulator(8, L1, L2, angles[:, 0], angles[:, 1], max_w[:, 0], max_w[:, 1], CENTER)
+    batch.set_targets(targets)
+    before = batch.angles.copy()
+    dt = 0.01
+    batch.update(dt)
+    moved = (batch.angles - before + np.pi) % (2 * np.pi) - np.pi
+    assert (np.abs(moved) <= max_w * dt + 1e-12).all()
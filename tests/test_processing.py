@@ -0,0 +1,126 @@
+import cv2
+import numpy as np
+import pytest
+
+from processing import (CHAINING_METHODS, _rdp_keep_mask, chain_edges, edges_to_coords, get_edges,
+                        points_to_segments)
+
+
+def _distance(p: np.ndarray, a: np.ndarray, b: np.ndarray) -> float:
+    ab, ap = b - a, p - a
+    norm = np.hypot(*ab)
+    if norm == 0:
+        return float(np.hypot(*ap))
+    return float(abs(ab[0] * ap[1] - ab[1] * ap[0]) / norm)
+
+
+def rdp_reference(points: np.ndarray, eps: float) -> list[int]:
+    """Textbook recursive Ramer-Douglas-Peucker. Returns the indices of the kept points."""
+    def rdp(lo: int, hi: int) -> list[int]:
+        dmax, index = 0.0, lo
+        for i in range(lo + 1, hi):
+            d = _distance(points[i], points[lo], points[hi])
+            if d > dmax:
+                dmax, index = d, i
+        if dmax > eps:
+            return rdp(lo, index)[:-1] + rdp(index, hi)
+        return [lo, hi]
+
+    if len(points) == 0:
+        return []
+    if len(points) == 1:
+        return [0]
+    return rdp(0, len(points) - 1)
+
+
+def _random_polylines(rng: np.random.Generator, n: int) -> list[np.ndarray]:
+    lengths = rng.integers(0, 60, size=n)
+    return [np.cumsum(rng.normal(size=(k, 2)) * rng.uniform(0.1, 5), axis=0) for k in lengths]
+
+
+def _check(segments: list[np.ndarray], eps: float):
+    offsets = np.cumsum([0] + [len(s) for s in segments])
+    coords = np.concatenate([s.reshape(-1, 2) for s in segments]) if segments else np.zeros((0, 2))
+    keep = _rdp_keep_mask(coords, offsets, eps)
+    for segment, start, end in zip(segments, offsets[:-1], offsets[1:]):
+        assert np.flatnonzero(keep[start:end]).tolist() == rdp_reference(segment, eps)
+
+
+@pytest.mark.parametrize("eps", [0.5, 2., 10.])
+def test_matches_recursive_reference(eps):
+    _check(_random_polylines(np.random.default_rng(0), 200), eps)
+
+
+def test_degenerate_segments():
+    segments = [
+        np.zeros((0, 2)),
+        np.array([[1., 1.]]),
+        np.array([[1., 1.], [2., 2.]]),
+        np.array([[0., 0.], [1., 0.], [2., 0.], [3., 0.]]),
+        # Closed loops: start == end, the farthest point is the farthest from the start
+        np.array([[0., 0.], [5., 0.], [5., 5.], [0., 5.], [0., 0.]]),
+        np.array([[2., 2.], [2., 2.], [2., 2.]]),
+        # Equally distant points: the first one is kept
+        np.array([[0., 0.], [1., 3.], [2., 3.], [3., 0.]]),
+    ]
+    _check(segments, 1.)
+
+
+def test_single_segment_without_interior():
+    keep = _rdp_keep_mask(np.array([[0., 0.], [4., 4.]]), np.array([0, 2]), 1.)
+    assert keep.tolist() == [True, True]
+
+
+def _strokes() -> np.ndarray:
+    """One-pixel strokes more than distance_threshold apart: every step of the greedy walk has a single nearest
+    pixel, so the result does not depend on how ties are broken."""
+    edges = np.zeros((120, 160), dtype=np.uint8)
+    edges[10, 5:150] = 255
+    edges[25:110, 8] = 255
+    rr = np.arange(70)
+    edges[30 + rr, 30 + rr] = 255
+    edges[115, 40:150:4] = 255
+    cv2.line(edges, (60, 20), (150, 50), 255, 1)
+    cv2.line(edges, (150, 60), (110, 90), 255, 1)
+    return edges
+
+
+@pytest.mark.parametrize("distance_threshold", [2, 5])
+def test_raster_chaining_matches_kdtree(distance_threshold):
+    edges = _strokes()
+    raster = chain_edges(edges, distance_threshold, "raster")
+    kdtree = chain_edges(edges, distance_threshold, "kdtree")
+    assert raster.dtype == kdtree.dtype
+    np.testing.assert_array_equal(raster.offsets, kdtree.offsets)
+    np.testing.assert_array_equal(raster.coords, kdtree.coords)
+
+
+@pytest.mark.parametrize("method", CHAINING_METHODS)
+def test_chaining_covers_every_pixel_once(method):
+    img = np.full((200, 200), 255, dtype=np.uint8)
+    cv2.circle(img, (80, 90), 50, 0, 2)
+    cv2.ellipse(img, (130, 120), (40, 20), 30, 0, 360, 0, 3)
+    cv2.line(img, (10, 190), (190, 10), 0, 1)
+    edges = get_edges(img, 20, 50)
+
+    segments = chain_edges(edges, 5, method)
+    pixels = segments.coords.astype(np.intp)
+    assert len(pixels) == np.count_nonzero(edges)
+    assert len(np.unique(pixels, axis=0)) == len(pixels)
+    assert edges[pixels[:, 1], pixels[:, 0]].all()
+    # Consecutive points of a chain are within distance_threshold
+    steps = np.hypot(*np.diff(segments.coords, axis=0).T)
+    inside = np.ones(len(steps), dtype=bool)
+    inside[segments.offsets[1:-1] - 1] = False
+    assert (steps[inside] <= 5).all()
+
+
+def test_raster_points_to_segments_matches_chain_edges():
+    edges = _strokes()
+    points = edges_to_coords(edges)
+    from_points = points_to_segments(points, 5, method="raster")
+    np.testing.assert_array_equal(from_points.offsets, chain_edges(edges, 5, "raster").offsets)
+    np.testing.assert_array_equal(from_points.coords, chain_edges(edges, 5, "raster").coords)
+    assert len(chain_edges(np.zeros((10, 10), dtype=np.uint8), 5, "raster")) == 0
+    with pytest.raises(ValueError):
+        points_to_segments(points, 5, method="other")
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from src.scara_simmulation.robot_link import (COMMAND, OP_ACK, OP_END, OP_ERROR, OP_JOINT, OP_POINT, REPLY, Command,
+                                              CommandStreamer, LinkError, stream_to_stand_in)
+
+
+@pytest.mark.parametrize("command, seq", [
+    (Command(OP_POINT, (1.5, -2.25, 0.), pen_down=True), 0),
+    (Command(OP_JOINT, (0.5, 1.0, 0.25)), 65535),
+    (Command(OP_END), 1234),
+])
+def test_command_round_trip(command, seq):
+    frame = command.encode(seq)
+    assert len(frame) == COMMAND.size
+    assert Command.decode(frame) == (command, seq)
+
+
+def test_sequence_numbers_wrap():
+    assert Command.decode(Command(OP_END).encode(65536 + 7))[1] == 7
+
+
+class AckingWriter:
+    """Stands for the link: every ack_every frames (and on END), acknowledges the last one received, cumulatively."""
+    def __init__(self, reader: asyncio.StreamReader, ack_every: int = 16, reply_op: int = OP_ACK, seq_offset: int = 0):
+        self.reader = reader
+        self.ack_every = ack_every
+        self.reply_op = reply_op
+        self.seq_offset = seq_offset
+        self.seqs: list[int] = []
+
+    def write(self, frame: bytes):
+        command, seq = Command.decode(frame)
+        self.seqs.append(seq)
+        if len(self.seqs) % self.ack_every == 0 or command.op == OP_END:
+            self.reader.feed_data(REPLY.pack(self.reply_op, 0, (seq + self.seq_offset) & 0xFFFF))
+
+    async def drain(self):
+        await asyncio.sleep(0)
+
+
+async def _stream(n: int, window: int = 32, **writer_kwargs):
+    reader = asyncio.StreamReader()
+    writer = AckingWriter(reader, **writer_kwargs)
+    streamer = CommandStreamer(reader, writer, window)
+    stats = await streamer.stream([Command(OP_POINT, (float(i), 0., 0.)) for i in range(n)])
+    return stats, writer
+
+
+def test_cumulative_ack_across_wrap():
+    n = 70_000
+    stats, writer = asyncio.run(_stream(n))
+    assert stats.commands == n
+    assert stats.max_in_flight <= 32
+    assert writer.seqs[65535:65538] == [65535, 0, 1]
+    assert writer.seqs[-1] == n & 0xFFFF
+
+
+def test_ack_of_unsent_command():
+    with pytest.raises(LinkError, match="unsent"):
+        asyncio.run(_stream(100, seq_offset=5))
+
+
+def test_device_error():
+    with pytest.raises(LinkError, match="rejected"):
+        asyncio.run(_stream(100, reply_op=OP_ERROR))
+
+
+def test_stand_in_device():
+    commands = [Command(OP_POINT, (float(i), float(i % 7), 0.), pen_down=i % 2 == 1) for i in range(200)]
+    stats, device_stats = asyncio.run(stream_to_stand_in(commands, window=8, buffer_size=8, time_scale=0.))
+    assert stats.commands == len(commands)
+    assert stats.max_in_flight <= 8
+    assert device_stats.executed == len(commands) + 1
+
+
+def test_stand_in_buffer_overflow():
+    commands = [Command(OP_POINT, (float(i), 0., 0.)) for i in range(50)]
+    with pytest.raises(LinkError):
+        asyncio.run(stream_to_stand_in(commands, window=16, buffer_size=4, time_scale=0.))
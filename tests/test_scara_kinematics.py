@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from src.scara_kinematics.scara_kinematics import ScaraKinematics
+
+A1, A2 = 180., 120.
+
+
+def _configurations(n: int = 50, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = rng.uniform(-np.pi, np.pi, (n, 3))
+    q[:, 2] = rng.uniform(-10, 10, n)
+    # Away from the q2 = 0 / pi singularities, where the exact inverse is ill-conditioned
+    q[:, 1] = np.where(np.abs(np.sin(q[:, 1])) < 0.1, q[:, 1] + 0.5, q[:, 1])
+    return q
+
+
+@pytest.mark.parametrize("inverse", ["exact", "damped"])
+def test_batch_matches_scalar(inverse):
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3), inverse=inverse)
+    q = _configurations()
+
+    p = kinematics.get_p_batch(q)
+    J = kinematics.get_jacobian_batch(q)
+    J_inv = kinematics.get_inverse_jacobian_batch(q)
+    for k in range(len(q)):
+        np.testing.assert_allclose(p[k], kinematics.get_p(q[k]).ravel(), atol=1e-9)
+        np.testing.assert_allclose(J[k], kinematics.get_jacobian(q[k]), atol=1e-9)
+        np.testing.assert_allclose(J_inv[k], kinematics.get_inverse_jacobian(q[k]), atol=1e-9)
+
+
+def test_batch_q_dot_matches_scalar():
+    q_dot_max = np.array([[1.], [2.], [np.inf]])
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3), q_dot_max=q_dot_max)
+    q = _configurations()
+    p_dot = np.random.default_rng(1).normal(size=q.shape) * 50
+
+    q_dot = kinematics.get_q_dot_batch(p_dot, q, normalize=True)
+    for k in range(len(q)):
+        expected = kinematics.get_q_dot(p_dot[k].reshape(3, 1), q[k].reshape(3, 1), normalize=True)
+        np.testing.assert_allclose(q_dot[k], expected.ravel(), atol=1e-9)
+    assert (np.abs(q_dot) <= q_dot_max.ravel() + 1e-12).all()
+
+
+def test_inverse_jacobian_inverts_jacobian():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    q = _configurations()
+    identity = np.einsum("nij,njk->nik", kinematics.get_inverse_jacobian_batch(q), kinematics.get_jacobian_batch(q))
+    np.testing.assert_allclose(identity, np.broadcast_to(np.eye(3), identity.shape), atol=1e-9)
+
+
+def test_exact_singularity():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    q = np.array([[0.3, 0., 1.], [0.3, np.pi, 1.]])
+    J_inv = kinematics.get_inverse_jacobian_batch(q)
+    assert np.isfinite(J_inv).all()
+    np.testing.assert_allclose(J_inv[:, :2, :2], np.linalg.pinv(kinematics.get_jacobian_batch(q)[:, :2, :2]), atol=1e-12)
+    assert kinematics.singular_ticks == 2
+    with pytest.raises(np.linalg.LinAlgError):
+        kinematics.get_inverse_jacobian_batch(q, use_pseudo=False)
+
+
+def test_rejects_bad_shapes():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    with pytest.raises(ValueError):
+        kinematics.get_p_batch(np.zeros(3))
+    with pytest.raises(ValueError):
+        kinematics.get_jacobian_batch(np.zeros((4, 2)))
+
+
+def _reachable_points(n: int = 200, seed: int = 2) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    r = rng.uniform(abs(A1 - A2) + 1, A1 + A2 - 1, n)
+    theta = rng.uniform(-np.pi, np.pi, n)
+    return np.column_stack((r * np.cos(theta), r * np.sin(theta), rng.uniform(-10, 10, n)))
+
+
+def test_closed_form_ik_round_trip():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    p = _reachable_points()
+    q_up, q_down, reachable = kinematics.get_q_from_p_batch(p)
+
+    assert reachable.all()
+    assert (q_up[:, 1] >= 0).all() and (q_down[:, 1] <= 0).all()
+    np.testing.assert_allclose(kinematics.get_p_batch(q_up), p, atol=1e-9)
+    np.testing.assert_allclose(kinematics.get_p_batch(q_down), p, atol=1e-9)
+
+
+def test_unreachable_points_get_the_closest_pose():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    p = np.array([[400., 0., 0.], [0., 30., 0.], [0., -1000., 0.]])
+    q_up, _, reachable = kinematics.get_q_from_p_batch(p)
+
+    assert not reachable.any()
+    reached = kinematics.get_p_batch(q_up)
+    # Same direction, on the boundary of the annulus
+    np.testing.assert_allclose(np.arctan2(reached[:, 1], reached[:, 0]), np.arctan2(p[:, 1], p[:, 0]), atol=1e-9)
+    np.testing.assert_allclose(np.hypot(reached[:, 0], reached[:, 1]), [A1 + A2, A1 - A2, A1 + A2], atol=1e-9)
+
+
+def test_elbow_branch_selection():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    p = np.array([150., 100., 0.])
+    q_up, reachable = kinematics.get_q_from_p(p)
+    q_down, _ = kinematics.get_q_from_p(p, elbow_up=False)
+    assert reachable and q_up[1, 0] > 0 and q_down[1, 0] < 0
+
+    # Closest branch to the previous configuration, including its 2 pi turns
+    q_prev = q_down + np.array([[4 * np.pi], [0.], [0.]]) + 0.01
+    q, _ = kinematics.get_q_from_p(p, q_prev=q_prev)
+    np.testing.assert_allclose(q[:2], q_down[:2] + np.array([[4 * np.pi], [0.]]), atol=1e-9)
+
+
+def test_path_keeps_branch_and_continuity():
+    kinematics = ScaraKinematics(A1, A2, np.zeros(3))
+    theta = np.linspace(0, 6 * np.pi, 500)
+    p = np.column_stack((200 * np.cos(theta), 200 * np.sin(theta), np.zeros(len(theta))))
+    q, reachable = kinematics.get_q_path(p, elbow_up=False)
+
+    assert reachable.all()
+    assert (q[:, 1] < 0).all()
+    assert np.abs(np.diff(q[:, :2], axis=0)).max() < 0.1
+    np.testing.assert_allclose(kinematics.get_p_batch(q), p, atol=1e-9)
+
+
+def test_damped_matches_exact_outside_the_singular_region():
+    exact = ScaraKinematics(A1, A2, np.zeros(3))
+    damped = ScaraKinematics(A1, A2, np.zeros(3), inverse="damped", manipulability_threshold=0.1)
+    q = _configurations()
+    q = q[np.abs(np.sin(q[:, 1])) > 0.1]
+
+    np.testing.assert_allclose(damped.get_inverse_jacobian_batch(q), exact.get_inverse_jacobian_batch(q), atol=1e-12)
+    assert damped.singular_ticks == 0
+
+
+def test_damped_joint_rates_stay_bounded():
+    damped = ScaraKinematics(A1, A2, np.zeros(3), inverse="damped")
+    q2 = np.concatenate((np.linspace(-0.2, 0.2, 401), np.pi + np.linspace(-0.2, 0.2, 401)))
+    q = np.column_stack((np.full(len(q2), 0.7), q2, np.zeros(len(q2))))
+    J_inv = damped.get_inverse_jacobian_batch(q)
+
+    assert np.isfinite(J_inv).all()
+    # Damped least squares: every singular value s of J gives s / (s^2 + l^2) <= 1 / (2 l), l >= 0 on the boundary
+    norms = np.linalg.norm(J_inv[:, :2, :2], ord=2, axis=(1, 2))
+    exact_norms = np.linalg.norm(np.linalg.pinv(damped.get_jacobian_batch(q)[:, :2, :2]), ord=2, axis=(1, 2))
+    assert (norms <= exact_norms + 1e-9).all()
+    at_singularity = np.isin(q2, [0., np.pi])
+    assert (norms[at_singularity] <= 1 / (2 * damped.max_damping) + 1e-12).all()
+
+
+def test_damped_is_continuous_at_the_region_boundary():
+    damped = ScaraKinematics(A1, A2, np.zeros(3), inverse="damped", manipulability_threshold=0.1)
+    boundary = np.arcsin(0.1)
+    q = np.array([[0.4, boundary - 1e-9, 0.], [0.4, boundary + 1e-9, 0.]])
+    J_inv = damped.get_inverse_jacobian_batch(q)
+    np.testing.assert_allclose(J_inv[0], J_inv[1], atol=1e-5)
+
+
+def test_damped_scalar_matches_batch_and_counts_once():
+    damped = ScaraKinematics(A1, A2, np.zeros(3), inverse="damped")
+    q = np.array([0.3, 0.02, 0.])
+    np.testing.assert_allclose(damped.get_inverse_jacobian(q), damped.get_inverse_jacobian_batch(q[None])[0], atol=1e-12)
+    assert damped.singular_ticks == 2
+
+    # Without damping the singular system falls back to the pseudo-inverse, still counted once
+    undamped = ScaraKinematics(A1, A2, np.zeros(3), inverse="damped", max_damping=0.)
+    J_inv = undamped.get_inverse_jacobian(np.array([0.3, 0., 0.]))
+    np.testing.assert_allclose(J_inv[:2, :2], np.linalg.pinv(undamped.get_jacobian(np.array([0.3, 0., 0.]))[:2, :2]),
+                               atol=1e-12)
+    assert undamped.singular_ticks == 1
+
+
+def test_unknown_inverse_mode():
+    with pytest.raises(ValueError):
+        ScaraKinematics(A1, A2, np.zeros(3), inverse="svd")
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from models import SegmentArray
+from sorting import EndpointDistances, compute_weight_matrix, greedy_tsp, kdtree_tsp, sort_segments
+
+
+def _random_segments(n: int, seed: int = 0) -> SegmentArray:
+    rng = np.random.default_rng(seed)
+    starts = rng.uniform(0, 1, (n, 2))
+    return SegmentArray.from_arrays([np.vstack((s, s + rng.normal(0, 0.02, 2))) for s in starts], np.float64)
+
+
+@pytest.mark.parametrize("n", [1, 2, 10, 300])
+@pytest.mark.parametrize("k", [1, 8])
+def test_kdtree_tsp_matches_greedy_tsp(n, k):
+    segments = _random_segments(n, seed=n)
+    weights = EndpointDistances.from_segments(segments)
+    for start in (0, n - 1):
+        assert kdtree_tsp(weights, start=start, k=k) == greedy_tsp(weights, start=start)
+
+
+def test_lazy_rows_match_the_weight_matrix():
+    segments = _random_segments(50)
+    weights = EndpointDistances.from_segments(segments)
+    matrix = compute_weight_matrix(segments)
+    for i in (0, 7, 7, 49):
+        np.testing.assert_allclose(weights[i], matrix[i])
+    assert greedy_tsp(weights) == greedy_tsp(matrix)
+
+
+def test_sort_segments_keeps_every_segment():
+    segments = _random_segments(100)
+    greedy = sort_segments(segments, tsp_algorithm=greedy_tsp)
+    tree = sort_segments(segments)
+    assert tree.to_json() == greedy.to_json()
+    assert sorted(map(str, tree.to_json())) == sorted(map(str, segments.to_json()))
+    assert len(sort_segments(SegmentArray.empty())) == 0
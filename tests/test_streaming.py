@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+import pytest
+
+from processing import edges_to_segments, get_edges, simplify_segments
+from streaming import iter_tile_edges, iter_tile_segments, open_image, stream_segments
+
+TILE = 64
+
+
+def _line_art() -> np.ndarray:
+    """High-contrast strokes crossing tile borders and corners, so Canny hysteresis is local and tiles match."""
+    img = np.full((200, 300), 255, dtype=np.uint8)
+    cv2.line(img, (10, 20), (280, 40), 0, 3)
+    cv2.line(img, (60, 10), (70, 190), 0, 3)
+    cv2.circle(img, (190, 130), 50, 0, 3)
+    cv2.rectangle(img, (100, 100), (140, 170), 0, 3)
+    return img
+
+
+def _assemble(tiles, shape) -> np.ndarray:
+    edges = np.zeros(shape, dtype=np.uint8)
+    for x0, y0, tile in tiles:
+        edges[y0:y0 + tile.shape[0], x0:x0 + tile.shape[1]] = tile
+    return edges
+
+
+def _canonical(chains) -> list[tuple]:
+    """Chains as comparable tuples, each in a fixed direction."""
+    canonical = []
+    for chain in chains:
+        points = tuple(map(tuple, np.asarray(chain).tolist()))
+        canonical.append(min(points, points[::-1]))
+    return sorted(canonical)
+
+
+@pytest.mark.parametrize("tile_size", [TILE, 100, 1024])
+def test_tiled_edges_match_the_whole_image(tile_size):
+    img = _line_art()
+    tiles = list(iter_tile_edges(img, 20, 50, tile_size))
+    assert len(tiles) == -(-200 // tile_size) * -(-300 // tile_size)
+    np.testing.assert_array_equal(_assemble(tiles, img.shape), get_edges(img, 20, 50))
+
+
+def test_stitched_chains_cover_every_edge_pixel_once():
+    img = _line_art()
+    edges = get_edges(img, 20, 50)
+    chains = list(iter_tile_segments(iter_tile_edges(img, 20, 50, TILE), img.shape, 5, TILE))
+    pixels = np.concatenate(chains).astype(np.intp)
+    assert len(pixels) == np.count_nonzero(edges)
+    assert len(np.unique(pixels, axis=0)) == len(pixels)
+    assert edges[pixels[:, 1], pixels[:, 0]].all()
+
+
+def test_strokes_split_by_tiles_are_stitched_back():
+    # Isolated one-pixel strokes leave no choice to the greedy walk, so stitching has to rebuild the exact chains
+    edges = np.zeros((200, 300), dtype=np.uint8)
+    edges[30, 5:290] = 255
+    edges[40:190, 100] = 255
+    rr = np.arange(150)
+    edges[20 + rr, 130 + rr] = 255
+    edges[180, 10:60:3] = 255
+
+    tiles = ((x0, y0, edges[y0:y0 + TILE, x0:x0 + TILE])
+             for y0 in range(0, 200, TILE) for x0 in range(0, 300, TILE))
+    stitched = list(iter_tile_segments(tiles, edges.shape, 5, TILE))
+    whole = list(edges_to_segments(edges, 5))
+    assert len(stitched) == len(whole) == 4
+    assert _canonical(stitched) == _canonical(whole)
+
+
+def test_stream_segments_match_the_batch_pipeline():
+    img = _line_art()
+    streamed = list(stream_segments(img, 20, 50, tile_size=1024))
+    batch = simplify_segments(edges_to_segments(get_edges(img, 20, 50), 5), 2.)
+    assert _canonical(streamed) == _canonical(batch)
+
+    normalized = list(stream_segments(img, 20, 50, normalize=True, tile_size=TILE))
+    coords = np.concatenate(normalized)
+    assert coords.min() >= 0 and coords.max() <= 1
+
+
+def test_open_image(tmp_path):
+    img = _line_art()
+    np.save(tmp_path / "img.npy", img)
+    mapped = open_image(str(tmp_path / "img.npy"))
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(mapped, img)
+
+    cv2.imwrite(str(tmp_path / "img.png"), img)
+    np.testing.assert_array_equal(open_image(str(tmp_path / "img.png")), img)
+    with pytest.raises(FileNotFoundError):
+        open_image(str(tmp_path / "missing.png"))
@@ -0,0 +1,97 @@
+import math as m
+
+import numpy as np
+import pytest
+
+from src.scara_kinematics.scara_kinematics import ScaraKinematics
+from src.scara_simmulation.trajectory import plan_trajectory
+
+L1, L2 = 180., 180.
+CENTER = (450., 350.)
+MAX_W = np.array([3., 2.])
+MAX_ALPHA = np.array([20., 15.])
+BLEND_TIME = 0.05
+DT = 0.001
+
+SEGMENTS = [
+    [[500., 300.], [600., 300.], [600., 400.], [520., 420.]],
+    [[300., 200.], [350., 260.]],
+    [[400., 500.], [420., 510.], [445., 505.], [470., 520.], [480., 470.]],
+]
+
+
+@pytest.fixture(scope="module")
+def trajectory():
+    return plan_trajectory(SEGMENTS, L1, L2, CENTER, max_w=tuple(MAX_W), max_alpha=tuple(MAX_ALPHA),
+                           blend_time=BLEND_TIME, dt=DT)
+
+
+def _velocities(trajectory) -> np.ndarray:
+    return np.diff(trajectory.q, axis=0) / np.diff(trajectory.t)[:, None]
+
+
+def test_joint_velocity_limits(trajectory):
+    assert (np.abs(_velocities(trajectory)) <= MAX_W * (1 + 1e-6)).all()
+
+
+def test_joint_acceleration_limits(trajectory):
+    v = _velocities(trajectory)
+    # Within pieces the acceleration is limited by max_alpha. At a corner the velocity jumps by at most
+    # max_alpha * blend_time, the change the arm can absorb while blending through it
+    jumps = np.abs(np.diff(v, axis=0))
+    assert (jumps <= MAX_ALPHA * (BLEND_TIME + 2 * DT) * (1 + 1e-6)).all()
+    smooth = jumps <= MAX_ALPHA * 2 * DT
+    assert smooth.mean() > 0.95
+
+
+def test_rest_when_the_pen_changes(trajectory):
+    v = _velocities(trajectory)
+    changes = np.flatnonzero(np.diff(trajectory.pen_down.astype(int)))
+    for k in changes:
+        assert np.abs(v[k]).max() <= MAX_ALPHA.max() * 2 * DT
+
+
+def test_pen_down_samples_follow_the_segments(trajectory):
+    kinematics = ScaraKinematics(L1, L2, np.zeros(3))
+    q = np.column_stack((trajectory.q, np.zeros(len(trajectory.q))))
+    p = kinematics.get_p_batch(q)[:, :2] + CENTER
+
+    down = trajectory.piece >= 0
+    a, b = trajectory.pieces[trajectory.piece[down], 0], trajectory.pieces[trajectory.piece[down], 1]
+    ab, ap = b - a, p[down] - a
+    t = np.clip((ab * ap).sum(axis=1) / (ab ** 2).sum(axis=1), 0, 1)
+    distance = np.hypot(*(ap - t[:, None] * ab).T)
+    # Joint-space interpolation between points densified every 2 px only deviates by a fraction of a pixel
+    assert distance.max() < 0.5
+    assert len(trajectory.pieces) == sum(len(s) - 1 for s in SEGMENTS)
+
+
+def test_starts_and_ends_at_rest_on_the_path(trajectory):
+    assert trajectory.t[0] == 0 and trajectory.duration == pytest.approx(trajectory.t[-1])
+    np.testing.assert_allclose(trajectory.q[0], (0., m.pi / 2))
+    kinematics = ScaraKinematics(L1, L2, np.zeros(3))
+    end = kinematics.get_p_batch(np.append(trajectory.q[-1], 0.)[None])[0, :2] + CENTER
+    np.testing.assert_allclose(end, SEGMENTS[-1][-1], atol=1e-6)
+    assert not trajectory.pen_down[0] and trajectory.pen_down[-1]
+
+
+def test_sample(trajectory):
+    q, pen, piece = trajectory.sample(trajectory.duration / 2)
+    k = np.searchsorted(trajectory.t, trajectory.duration / 2) - 1
+    assert pen == trajectory.pen_down[k] and piece == trajectory.piece[k]
+    assert np.all((np.minimum(trajectory.q[k], trajectory.q[k + 1]) <= q + 1e-12)
+                  & (q <= np.maximum(trajectory.q[k], trajectory.q[k + 1]) + 1e-12))
+    np.testing.assert_array_equal(trajectory.sample(-1.)[0], trajectory.q[0])
+    np.testing.assert_array_equal(trajectory.sample(trajectory.duration + 1)[0], trajectory.q[-1])
+
+
+def test_blending_is_faster_than_stopping_at_corners():
+    stroke = [[[500. + 10 * k, 300. + 3 * (k % 2)] for k in range(10)]]
+    blended = plan_trajectory(stroke, L1, L2, CENTER, blend_time=0.05)
+    stopping = plan_trajectory(stroke, L1, L2, CENTER, blend_time=0.)
+    assert blended.duration < stopping.duration
+
+
+def test_unreachable_segments():
+    with pytest.raises(ValueError):
+        plan_trajectory([[[450., 350.], [450. + 400, 350.]]], L1, L2, CENTER)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from src.scara_kinematics.scara_kinematics import ScaraKinematics
+from src.scara_kinematics.workspace import WorkspaceTable
+from src.scara_simmulation import reachability
+
+A1, A2 = 180., 120.
+RESOLUTION = 2.
+
+
+@pytest.fixture(scope="module")
+def table():
+    return WorkspaceTable.build(A1, A2, RESOLUTION)
+
+
+def _points(n: int, r_min: float, r_max: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    r = rng.uniform(r_min, r_max, n)
+    phi = rng.uniform(-np.pi, np.pi, n)
+    return np.column_stack((r * np.cos(phi), r * np.sin(phi)))
+
+
+def test_get_q_matches_closed_form_ik(table):
+    p = _points(500, A1 - A2 + 5, A1 + A2 - 5)
+    kinematics = ScaraKinematics(A1, A2, np.zeros((3, 1)))
+    q_up, _, reachable = kinematics.get_q_from_p_batch(np.column_stack((p, np.zeros(len(p)))))
+    assert reachable.all()
+
+    q = table.get_q(p)
+    wrapped = (q - q_up[:, :2] + np.pi) % (2 * np.pi) - np.pi
+    np.testing.assert_allclose(wrapped, 0, atol=1e-6)
+    reached = kinematics.get_p_batch(np.column_stack((q, np.zeros(len(q)))))[:, :2]
+    np.testing.assert_allclose(reached, p, atol=1e-6)
+
+    # The lookup alone is within a fraction of a cell
+    lookup = kinematics.get_p_batch(np.column_stack((table.lookup_q(p), np.zeros(len(p)))))[:, :2]
+    assert np.hypot(*(lookup - p).T).max() < RESOLUTION
+
+
+def test_is_reachable_is_conservative(table):
+    p = _points(2000, 0, A1 + A2 + 20, seed=1)
+    r = np.hypot(*p.T)
+    ok = table.is_reachable(p)
+    assert not ok[(r > A1 + A2) | (r < A1 - A2)].any()
+    # Up to one cell (its diagonal) is lost next to the boundaries
+    margin = RESOLUTION * np.sqrt(2)
+    assert ok[(r > A1 - A2 + margin) & (r < A1 + A2 - margin)].all()
+
+
+def test_condition(table):
+    p = _points(500, A1 - A2 + 20, A1 + A2 - 20, seed=2)
+    kinematics = ScaraKinematics(A1, A2, np.zeros((3, 1)))
+    q_up, _, _ = kinematics.get_q_from_p_batch(np.column_stack((p, np.zeros(len(p)))))
+    expected = np.linalg.cond(kinematics.get_jacobian_batch(q_up)[:, :2, :2])
+    np.testing.assert_allclose(table.get_condition(p), expected, rtol=0.05)
+
+    r = np.hypot(*p.T)
+    stretched = table.is_reachable(p, max_condition=5.) & ~table.is_reachable(p)
+    assert not stretched.any()
+    assert (table.get_condition(p)[r > A1 + A2 - 30] > table.get_condition(p)[np.abs(r - A1) < 30].max()).all()
+
+
+def test_save_and_load(table, tmp_path):
+    path = tmp_path / "table.npz"
+    table.save(str(path))
+    loaded = WorkspaceTable.load(str(path))
+    assert (loaded.a1, loaded.a2, loaded.resolution) == (A1, A2, RESOLUTION)
+    np.testing.assert_array_equal(loaded.q, table.q)
+    np.testing.assert_array_equal(loaded.reachable, table.reachable)
+
+
+def test_load_or_build_rebuilds_other_geometries(tmp_path):
+    path = str(tmp_path / "table.npz")
+    WorkspaceTable.build(A1, A2, 10.).save(path)
+    table = WorkspaceTable.load_or_build(path, A1, A2 + 10, 10.)
+    assert table.a2 == A2 + 10
+    assert WorkspaceTable.load(path).a2 == A2 + 10
+
+
+def test_default_table_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("SCARA_CACHE_DIR", str(tmp_path))
+    table = reachability.default_table(resolution=10.)
+    cached = list(tmp_path.glob("workspace_*.npz"))
+    assert len(cached) == 1
+    modified = cached[0].stat().st_mtime_ns
+    again = reachability.default_table(resolution=10.)
+    assert cached[0].stat().st_mtime_ns == modified
+    np.testing.assert_array_equal(again.q, table.q)